@@ -0,0 +1,45 @@
+# ==============================================
+# 📦 Backfill the Sales Feature Store
+# ==============================================
+# Rebuilds the sales_features table (lag history, rolling features and
+# next-week XGBoost inputs per medicine and week) from sales_data in bulk.
+# Needed once for existing databases; uploads keep it current afterwards.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/backfill_feature_store.py"
+#   python "DemandForecast/scripts/backfill_feature_store.py" --medicine-id 3 --medicine-id 7
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database import Base, SessionLocal, engine
+from app.services.feature_store import FeatureStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the sales feature store from sales data")
+    parser.add_argument('--medicine-id', type=int, action='append', default=None,
+                        help="Only rebuild these medicines (repeatable)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        written = FeatureStore.backfill(db, medicine_ids=args.medicine_id)
+        db.commit()
+        print(f"✅ Wrote {written} feature rows in {time.perf_counter() - start:.2f}s")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# ==============================================
+# 📦 Rebuild the Latest Predictions Table
+# ==============================================
+# Rebuilds latest_predictions (each medicine's newest row of predictions)
+# from the predictions history in one INSERT ... SELECT. The API fills an
+# empty table at startup and every prediction run keeps it current; this
+# is for repairing it after predictions were edited outside the API.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/backfill_latest_predictions.py"
+#   python "DemandForecast/scripts/backfill_latest_predictions.py" --medicine-id 3 --medicine-id 7
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database import Base, SessionLocal, engine
+from app.services.latest_predictions import LatestPredictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the latest prediction per medicine from the history")
+    parser.add_argument('--medicine-id', type=int, action='append', default=None,
+                        help="Only rebuild these medicines (repeatable)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        written = LatestPredictions.backfill(db, medicine_ids=args.medicine_id)
+        db.commit()
+        print(f"✅ Wrote {written} latest predictions in {time.perf_counter() - start:.2f}s")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# ==============================================
+# 📦 Rolling-Origin Backtest of the Forecasters
+# ==============================================
+# Replays the last weeks of a weekly dataset: every medicine is forecast
+# from each of --origins cutoffs (--stride weeks apart) using only the weeks
+# before the cutoff, and the forecasts are scored against what actually
+# sold. XGBoost and LSTM use the served models of the medicines the manifest
+# routes to them; SARIMAX and the statistical fallback run on every
+# medicine. All origins of a family go through the model in one batch.
+#
+# Writes per-medicine MAPE / SMAPE / bias tables and reports wall-clock
+# and per-forecast latency for each model family.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/backtest_forecasters.py" --data "DemandForecast/data/demand_prediction_weekly.xlsx"
+#   python "DemandForecast/scripts/backtest_forecasters.py" --data weekly.csv --origins 26 --horizon 4 --families xgboost,fallback
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.config import settings
+from app.services.backtest import BACKTEST_FAMILIES, run_backtest
+from app.services.prediction import PredictionService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the forecasting models")
+    parser.add_argument('--data', required=True, help="Weekly dataset (.xlsx or .csv)")
+    parser.add_argument('--model-dir', default=settings.MODEL_DIR)
+    parser.add_argument('--families', default=','.join(BACKTEST_FAMILIES),
+                        help=f"Comma separated subset of {BACKTEST_FAMILIES}")
+    parser.add_argument('--origins', type=int, default=12, help="Number of forecast origins per medicine")
+    parser.add_argument('--stride', type=int, default=1, help="Weeks between origins")
+    parser.add_argument('--horizon', type=int, default=1, help="Weeks forecast from each origin")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes for SARIMAX fits")
+    parser.add_argument('--output', default='backtest_results.csv', help="Per-medicine error table")
+    args = parser.parse_args()
+
+    families = [f.strip() for f in args.families.split(',') if f.strip()]
+    unknown = set(families) - set(BACKTEST_FAMILIES)
+    if unknown:
+        sys.exit(f"❌ Unknown families: {sorted(unknown)}")
+
+    # ------------------- 1️⃣ Load Data -------------------
+    df = pd.read_csv(args.data) if args.data.endswith('.csv') else pd.read_excel(args.data)
+    df['Year'] = df['Year'].astype(str).str.replace(',', '').astype(int)
+    print(f"✅ Loaded {len(df)} rows, {df['Product_Name'].nunique()} medicines from: {os.path.basename(args.data)}")
+
+    # ------------------- 2️⃣ Backtest -------------------
+    service = PredictionService(model_dir=args.model_dir)
+    errors, timings = run_backtest(df, service, families, n_origins=args.origins, stride=args.stride,
+                                   horizon=args.horizon, workers=args.workers)
+    if errors.empty:
+        sys.exit("❌ Nothing to backtest")
+
+    # ------------------- 3️⃣ Results -------------------
+    errors.round(3).to_csv(args.output, index=False)
+    print(f"💾 Per-medicine errors saved to: {args.output}\n")
+
+    summary = errors.groupby('family', sort=False).agg(
+        medicines=('medicine_name', 'size'),
+        median_MAPE=('MAPE', 'median'),
+        median_SMAPE=('SMAPE', 'median'),
+        mean_bias=('Bias', 'mean'),
+    )
+    print("📊 Accuracy")
+    print(summary.round(2).to_string())
+    print("\n⏱️ Timing")
+    print(timings.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
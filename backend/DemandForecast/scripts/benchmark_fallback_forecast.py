@@ -0,0 +1,80 @@
+# ==============================================
+# 📦 Benchmark: Statistical Fallback Forecasts on a Synthetic Catalog
+# ==============================================
+# Builds a synthetic weekly catalog (smooth, seasonal and intermittent
+# SKUs) and times PredictionService.forecast_fallback_batch, split into the
+# SKU x week matrix build and the vectorized scoring of all SKUs.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/benchmark_fallback_forecast.py" --skus 50000 --weeks 104
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def synthetic_catalog(n_skus: int, n_weeks: int, seed: int = 0) -> pd.DataFrame:
+    """A third each of smooth, seasonal and intermittent SKUs"""
+    rng = np.random.default_rng(seed)
+    sku = np.repeat(np.arange(n_skus), n_weeks)
+    t = np.tile(np.arange(n_weeks), n_skus)
+    base = rng.uniform(5, 200, n_skus)[sku]
+    kind = sku % 3
+    qty = base + rng.normal(0, 5, len(t))
+    qty = np.where(kind == 1, qty * (1 + 0.4 * np.sin(2 * np.pi * t / 52)), qty)
+    qty = np.where((kind == 2) & (rng.random(len(t)) < 0.8), 0, qty)
+    year = 2022 + t // 52
+    week = t % 52 + 1
+    return pd.DataFrame({
+        'Product_Name': np.array([f"SKU {i:05d}" for i in range(n_skus)], dtype=object)[sku],
+        'Week': [f"{y}-W{w:02d}" for y, w in zip(year, week)],
+        'Year': year,
+        'Week_Number': week,
+        'Total_Quantity': np.maximum(qty, 0).round().astype(int),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark statistical fallback forecasts")
+    parser.add_argument('--skus', type=int, default=50000)
+    parser.add_argument('--weeks', type=int, default=104)
+    parser.add_argument('--horizon', type=int, default=1)
+    args = parser.parse_args()
+
+    from app.services.fallback_forecast import FALLBACK_METHODS, fallback_forecast, weekly_matrix
+    from app.services.prediction import PredictionService
+
+    # ------------------- 1️⃣ Synthetic Catalog -------------------
+    df = synthetic_catalog(args.skus, args.weeks)
+    names = list(df['Product_Name'].unique())
+    print(f"✅ {args.skus} SKUs x {args.weeks} weeks ({len(df)} rows)\n")
+
+    # ------------------- 2️⃣ Timings -------------------
+    start = time.perf_counter()
+    _, Q, _ = weekly_matrix(df, names)
+    matrix_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, methods = fallback_forecast(Q, args.horizon)
+    score_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = PredictionService().forecast_fallback_batch(names, df, horizon=args.horizon)
+    total_time = time.perf_counter() - start
+
+    print(f"⏱️  SKU x week matrix: {matrix_time:.2f}s")
+    print(f"⏱️  Scoring all SKUs:  {score_time:.2f}s")
+    print(f"⏱️  forecast_fallback_batch end to end: {total_time:.2f}s ({len(results)} forecasts)")
+
+    print("\n📊 Methods chosen")
+    print(pd.Series(np.asarray(FALLBACK_METHODS)[methods]).value_counts().to_string())
+
+
+if __name__ == '__main__':
+    main()
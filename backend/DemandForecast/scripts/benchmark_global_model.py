@@ -0,0 +1,120 @@
+# ==============================================
+# 📦 Benchmark: Per-SKU XGBoost Models vs One Global Model
+# ==============================================
+# Builds a synthetic weekly catalog and serves it twice: once with a model
+# + preprocessing artifact per SKU (xgboost_<name>.json) and once with the
+# global model (xgboost_global.json + encodings). Compares files on disk,
+# resident memory and time to load every model, and warm inference
+# throughput of PredictionService.predict_xgb over the whole catalog.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/benchmark_global_model.py" --skus 3000
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from benchmark_parallel_forecast import build_model_dir, synthetic_catalog
+
+
+def rss_mb() -> float:
+    """Resident memory of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def dir_size_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 2 ** 20
+
+
+def measure(label: str, model_dir: str, names, X_rows, repeats: int):
+    from app.services.feature_engine import KNOWN_FEATURE_COLUMNS
+    from app.services.model_manifest import ModelManifest
+    from app.services.model_registry import ModelRegistry
+    from app.services.prediction import PredictionService
+
+    manifest = ModelManifest(model_dir=model_dir)
+    registry = ModelRegistry(model_dir=model_dir, max_size=2 * len(names) + 10, manifest=manifest)
+    service = PredictionService(model_dir=model_dir, registry=registry, manifest=manifest)
+
+    # First call loads every model the catalog needs
+    before = rss_mb()
+    start = time.perf_counter()
+    service.predict_xgb(names, X_rows, {}, KNOWN_FEATURE_COLUMNS)
+    load_time = time.perf_counter() - start
+    memory = rss_mb() - before
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        service.predict_xgb(names, X_rows, {}, KNOWN_FEATURE_COLUMNS)
+    elapsed = (time.perf_counter() - start) / repeats
+
+    print(f"   {label}: loaded in {load_time:.2f}s, warm pass {elapsed * 1000:.1f}ms")
+    return {
+        'mode': label,
+        'files': len(os.listdir(model_dir)),
+        'disk_mb': round(dir_size_mb(model_dir), 1),
+        'cached_objects': registry.stats()['size'],
+        'rss_delta_mb': round(memory, 1),
+        'first_call_s': round(load_time, 2),
+        'warm_pass_ms': round(elapsed * 1000, 1),
+        'skus_per_s': round(len(names) / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-SKU vs global XGBoost serving")
+    parser.add_argument('--skus', type=int, default=3000)
+    parser.add_argument('--weeks', type=int, default=104)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    from app.services.feature_engine import KNOWN_FEATURE_COLUMNS, build_feature_frame, build_next_week_features
+    from app.services.global_model import save_global_model, train_global_model
+
+    # ------------------- 1️⃣ Synthetic Catalog -------------------
+    df = synthetic_catalog(args.skus, args.weeks)
+    names = list(df['Product_Name'].unique())
+    X_rows = build_next_week_features(build_feature_frame(df)).loc[names, KNOWN_FEATURE_COLUMNS].to_numpy()
+    per_sku_dir = tempfile.mkdtemp(prefix='per_sku_models_')
+    global_dir = tempfile.mkdtemp(prefix='global_model_')
+    print(f"✅ {args.skus} SKUs x {args.weeks} weeks ({len(df)} rows)")
+
+    try:
+        # ------------------- 2️⃣ Models -------------------
+        build_model_dir(df, per_sku_dir)
+        os.remove(os.path.join(per_sku_dir, 'template.json'))
+        os.remove(os.path.join(per_sku_dir, 'template.preprocess.json'))
+
+        start = time.perf_counter()
+        model, encodings = train_global_model(df, n_estimators=100, max_depth=4)
+        save_global_model(model, encodings, global_dir)
+        print(f"⏱️  Global model trained on {encodings.metadata['n_samples']} rows "
+              f"in {time.perf_counter() - start:.1f}s\n")
+
+        # ------------------- 3️⃣ Serving -------------------
+        rows = [
+            measure('per-SKU', per_sku_dir, names, X_rows, args.repeats),
+            measure('global', global_dir, names, X_rows, args.repeats),
+        ]
+
+        print("\n📊 Results")
+        print(pd.DataFrame(rows).to_string(index=False))
+    finally:
+        shutil.rmtree(per_sku_dir, ignore_errors=True)
+        shutil.rmtree(global_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# ==============================================
+# 📦 Benchmark: Parallel XGBoost Forecasting on a Synthetic Catalog
+# ==============================================
+# Builds a synthetic weekly catalog of thousands of SKUs, gives every SKU
+# its own copy of a small XGBoost model + preprocessing artifact, and times
+# PredictionService.forecast_xgb_batch with 1..N pool workers, then the
+# per-SKU cost of the model stage alone.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/benchmark_parallel_forecast.py" --skus 3000 --workers 1,2,4,8
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def synthetic_catalog(n_skus: int, n_weeks: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    sku = np.repeat(np.arange(n_skus), n_weeks)
+    t = np.tile(np.arange(n_weeks), n_skus)
+    base = rng.uniform(10, 300, n_skus)[sku]
+    qty = np.maximum(0, base * (1 + 0.2 * np.sin(2 * np.pi * t / 52)) + rng.normal(0, 10, len(t)))
+    year = 2022 + t // 52
+    week = t % 52 + 1
+    return pd.DataFrame({
+        'Product_Name': [f"SKU {i:05d}" for i in sku],
+        'Week': [f"{y}-W{w:02d}" for y, w in zip(year, week)],
+        'Year': year,
+        'Week_Number': week,
+        'Total_Quantity': qty.round().astype(int),
+    })
+
+
+def build_model_dir(df: pd.DataFrame, model_dir: str):
+    """One small model trained on the pooled catalog, copied per SKU"""
+    from xgboost import XGBRegressor
+    from app.services.feature_engine import build_feature_frame, feature_columns
+    from app.services.preprocessing import artifact_path, fit_xgb_artifact
+
+    sample = df[df['Product_Name'].isin(df['Product_Name'].unique()[:50])]
+    features = build_feature_frame(sample)
+    feature_cols = feature_columns(features)
+    artifact = fit_xgb_artifact(features[feature_cols], feature_cols)
+    model = XGBRegressor(n_estimators=100, max_depth=4)
+    model.fit(artifact.transform(features[feature_cols].to_numpy()), features['Total_Quantity'])
+
+    template_model = os.path.join(model_dir, 'template.json')
+    template_artifact = os.path.join(model_dir, 'template.preprocess.json')
+    model.save_model(template_model)
+    artifact.save(template_artifact)
+
+    for name in df['Product_Name'].unique():
+        shutil.copyfile(template_model, os.path.join(model_dir, f"xgboost_{name}.json"))
+        shutil.copyfile(template_artifact, artifact_path(model_dir, 'xgboost', name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel forecasting")
+    parser.add_argument('--skus', type=int, default=3000)
+    parser.add_argument('--weeks', type=int, default=104)
+    parser.add_argument('--workers', default=None, help="Comma separated worker counts (default 1,2,4..cpu_count)")
+    parser.add_argument('--chunk-size', type=int, default=250)
+    args = parser.parse_args()
+
+    # Every worker must be able to keep the whole catalog cached
+    # (a model and a preprocessing artifact per SKU)
+    os.environ['MODEL_CACHE_SIZE'] = str(2 * args.skus + 10)
+
+    from app.services.feature_engine import KNOWN_FEATURE_COLUMNS, build_feature_frame, build_next_week_features
+    from app.services.forecast_pool import ForecastWorkerPool
+    from app.services.prediction import PredictionService
+
+    cpu = os.cpu_count() or 1
+    worker_counts = [int(w) for w in args.workers.split(',')] if args.workers else \
+        sorted({1, *[2 ** k for k in range(1, 8) if 2 ** k <= cpu], cpu})
+
+    # ------------------- 1️⃣ Synthetic Catalog -------------------
+    df = synthetic_catalog(args.skus, args.weeks)
+    names = list(df['Product_Name'].unique())
+    model_dir = tempfile.mkdtemp(prefix='forecast_bench_')
+    print(f"✅ {args.skus} SKUs x {args.weeks} weeks ({len(df)} rows), models in {model_dir}")
+
+    try:
+        build_model_dir(df, model_dir)
+
+        start = time.perf_counter()
+        build_next_week_features(build_feature_frame(df))
+        feature_time = time.perf_counter() - start
+        print(f"⏱️  Feature build (parent process, all SKUs): {feature_time:.2f}s\n")
+
+        # ------------------- 2️⃣ Timings -------------------
+        service = PredictionService(model_dir=model_dir)
+        rows = []
+        for workers in worker_counts:
+            pool = None
+            start = time.perf_counter()
+            if workers > 1:
+                pool = ForecastWorkerPool(model_dir=model_dir, workers=workers,
+                                          chunk_size=args.chunk_size, xgb_medicines=names)
+                # First call waits for worker start-up and model preloading
+                service.forecast_xgb_batch(names[:workers], df, pool=pool)
+            else:
+                service.forecast_xgb_batch(names, df)
+            warm_up = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = service.forecast_xgb_batch(names, df, pool=pool)
+            elapsed = time.perf_counter() - start
+            if pool is not None:
+                pool.shutdown()
+
+            rows.append({
+                'workers': workers,
+                'forecasts': len(results),
+                'warm_up_s': round(warm_up, 2),
+                'forecast_s': round(elapsed, 2),
+                'model_stage_s': round(max(elapsed - feature_time, 0.0), 2),
+                'skus_per_s': round(len(results) / elapsed, 1),
+            })
+            print(f"   workers={workers}: {elapsed:.2f}s")
+
+        table = pd.DataFrame(rows)
+        table['speedup'] = (table['model_stage_s'].iloc[0] / table['model_stage_s']).round(2)
+        print("\n📊 Results")
+        print(table.to_string(index=False))
+
+        # ------------------- 3️⃣ Inference Overhead per SKU -------------------
+        X_rows = build_next_week_features(build_feature_frame(df)).loc[names, KNOWN_FEATURE_COLUMNS].to_numpy()
+        service.predict_xgb(names, X_rows, {}, KNOWN_FEATURE_COLUMNS)
+        start = time.perf_counter()
+        service.predict_xgb(names, X_rows, {}, KNOWN_FEATURE_COLUMNS)
+        per_sku = (time.perf_counter() - start) / len(names)
+        print(f"\n⏱️  predict_xgb (models cached, one process): {per_sku * 1e6:.0f}µs per SKU")
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
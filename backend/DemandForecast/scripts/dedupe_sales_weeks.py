@@ -0,0 +1,73 @@
+# ==============================================
+# 🧹 Remove Duplicate Sales Weeks
+# ==============================================
+# The old row-by-row upload could store a medicine's week more than once.
+# The upload now merges on a unique (medicine_id, week_identifier) index,
+# and the API will not start while duplicates keep that index from being
+# created. This script writes the duplicate rows to a CSV backup, deletes
+# them (keeping the newest row of each medicine and week), reports what
+# it removed and creates the index.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/dedupe_sales_weeks.py" --dry-run
+#   python "DemandForecast/scripts/dedupe_sales_weeks.py" --backup duplicates.csv
+
+import argparse
+import csv
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database import Base, engine
+from app.services.sales_ingest import ensure_unique_sales_weeks, find_duplicate_sales_weeks, remove_duplicate_sales_weeks
+
+
+def write_backup(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def report(rows):
+    per_medicine = Counter(row['medicine_id'] for row in rows)
+    weeks = len({(row['medicine_id'], row['week_identifier']) for row in rows})
+    print(f"🔍 {len(rows)} duplicate rows in {weeks} weeks of {len(per_medicine)} medicines")
+    for medicine_id, count in per_medicine.most_common(20):
+        print(f"   medicine {medicine_id}: {count} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove duplicate (medicine, week) sales rows and add the unique index")
+    parser.add_argument('--backup', default=f"sales_data_duplicates_{datetime.now():%Y%m%d_%H%M%S}.csv",
+                        help="CSV file for the removed rows")
+    parser.add_argument('--dry-run', action='store_true', help="Only report the duplicates")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        duplicates = find_duplicate_sales_weeks(conn)
+    if not duplicates:
+        print("✅ No duplicate sales weeks")
+    else:
+        report(duplicates)
+        if args.dry_run:
+            return
+        write_backup(args.backup, duplicates)
+        print(f"💾 Backed up to {args.backup}")
+
+        removed = remove_duplicate_sales_weeks(engine)
+        print(f"🗑️ Removed {len(removed)} duplicate rows")
+
+    if args.dry_run:
+        return
+    if ensure_unique_sales_weeks(engine):
+        print("✅ Created the unique (medicine_id, week_identifier) index")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# ==============================================
+# 📦 Export LSTM Models to NumPy Weights (.npz)
+# ==============================================
+# Extracts the LSTM/Dense weights of every lstm_<medicine>.keras model into
+# lstm_<medicine>.npz, checks that the NumPy forward pass matches Keras on
+# random windows, and only then writes the file. The API prefers the .npz
+# (LSTM_NUMPY_RUNTIME) and no longer needs TensorFlow to serve it.
+#
+# Run from the backend directory (TensorFlow required):
+#   python "DemandForecast/scripts/export_lstm_npz.py"
+#   python "DemandForecast/scripts/export_lstm_npz.py" --model-dir "DemandForecast/saved models" --tolerance 1e-5
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.config import settings
+from app.services.lstm_numpy import export_keras_lstm, parity_error
+from app.services.model_manifest import MODEL_FILE_PATTERNS, ModelManifest
+from app.services.model_registry import load_keras_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Keras LSTM models to .npz weights")
+    parser.add_argument('--model-dir', default=settings.MODEL_DIR, help="Directory holding the saved models")
+    parser.add_argument('--tolerance', type=float, default=1e-5,
+                        help="Max allowed absolute difference on scaled outputs")
+    parser.add_argument('--samples', type=int, default=256, help="Random windows used for the parity check")
+    args = parser.parse_args()
+
+    manifest = ModelManifest(args.model_dir)
+    names = manifest.medicines('lstm')
+    print(f"✅ {len(names)} LSTM models in: {args.model_dir}")
+
+    exported, failed = 0, []
+    for medicine_name in names:
+        keras_path = manifest.get(medicine_name).path
+        if not keras_path.endswith('.keras'):
+            keras_path = os.path.join(args.model_dir, MODEL_FILE_PATTERNS['lstm'].format(name=medicine_name))
+        if not os.path.exists(keras_path):
+            print(f"   ⚠️ {medicine_name}: no .keras file, skipped")
+            continue
+
+        npz_path = os.path.splitext(keras_path)[0] + '.npz'
+        try:
+            keras_model = load_keras_model(keras_path)
+            numpy_model = export_keras_lstm(keras_model)
+            error = parity_error(keras_model, numpy_model, samples=args.samples)
+        except Exception as e:
+            print(f"   ❌ {medicine_name}: {e}")
+            failed.append(medicine_name)
+            continue
+
+        if error > args.tolerance:
+            print(f"   ❌ {medicine_name}: parity error {error:.2e} > {args.tolerance:.0e}, not written")
+            failed.append(medicine_name)
+            continue
+
+        numpy_model.save(npz_path)
+        exported += 1
+        print(f"   💾 {medicine_name}: {os.path.basename(npz_path)} (max abs error {error:.2e})")
+
+    print(f"\n✅ Exported {exported} models" + (f", {len(failed)} failed" if failed else ""))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
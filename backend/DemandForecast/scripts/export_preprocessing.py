@@ -0,0 +1,49 @@
+# ==============================================
+# 📦 Export Preprocessing Artifacts for Saved Models
+# ==============================================
+# Fits the scalers the serving code used to refit on every request and
+# stores them next to each model as <family>_<medicine>.preprocess.json.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/export_preprocessing.py" --data "DemandForecast/data/demand_prediction_weekly.xlsx"
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.prediction import PredictionService
+from app.services.preprocessing import export_artifacts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export scaler/feature artifacts for saved models")
+    parser.add_argument('--data', required=True, help="Weekly training dataset (.xlsx or .csv)")
+    parser.add_argument('--model-dir', default=None, help="Directory holding the saved models")
+    args = parser.parse_args()
+
+    # ------------------- 1️⃣ Load Data -------------------
+    df = pd.read_csv(args.data) if args.data.endswith('.csv') else pd.read_excel(args.data)
+    print(f"✅ Loaded {len(df)} rows from: {os.path.basename(args.data)}")
+
+    # ------------------- 2️⃣ Fit & Save -------------------
+    service = PredictionService(model_dir=args.model_dir) if args.model_dir else PredictionService()
+    # Global model medicines have no per-medicine scaler
+    xgb_medicines = service.manifest.medicines('xgboost')
+    written = export_artifacts(df, service.model_dir, xgb_medicines, service.lstm_medicines)
+
+    for medicine_name, path in written.items():
+        print(f"   💾 {medicine_name}: {path}")
+
+    missing = set(xgb_medicines + service.lstm_medicines) - set(written)
+    for medicine_name in sorted(missing):
+        print(f"   ⚠️ '{medicine_name}' not found in dataset, no artifact written")
+
+    print(f"\n✅ Exported {len(written)} preprocessing artifacts")
+
+
+if __name__ == '__main__':
+    main()
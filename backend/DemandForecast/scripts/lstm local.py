@@ -95,6 +95,9 @@ def create_multilayer_lstm_model(units=64, dropout_rate=0.0, activation='relu',
 def build_optimized_lstm():
     """
     Implement grid search as described in the methodology
+
+    Exhaustive: 7,200 trainings per SKU. search_lstm.py searches the same
+    grid by successive halving over epochs.
     """
     # Grid search parameters from Table 2
     param_grid = {
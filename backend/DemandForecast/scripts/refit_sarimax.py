@@ -0,0 +1,164 @@
+# ==============================================
+# 📦 Scheduled SARIMAX Refits
+# ==============================================
+# Serving never re-estimates SARIMAX models: each forecast filters the new
+# weeks into the medicine's saved state (sarimax_<name>.json). This script
+# is the scheduled full refit. It re-estimates the medicines whose last fit
+# is older than SARIMAX_REFIT_DAYS (all of them with --force) in parallel
+# worker processes and saves each state as it finishes. A medicine that
+# fails keeps its previous state; failures are listed at the end and
+# journaled in sarimax_refits.jsonl.
+#
+# History comes from the sales_data table unless --data is given. With
+# database history the refitted medicines are then re-forecast (a
+# prediction run with trigger "schedule") and their low stock alerts
+# recomputed, so served predictions follow the new fits; --no-forecast
+# skips that.
+#
+# Run from the backend directory (e.g. weekly from cron):
+#   python "DemandForecast/scripts/refit_sarimax.py"
+#   python "DemandForecast/scripts/refit_sarimax.py" --data weekly.csv --medicines all --force --workers 8
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.config import settings
+from app.services.fallback_forecast import weekly_matrix
+from app.services.model_manifest import MODEL_FILE_PATTERNS, ModelManifest, upsert_manifest_entries
+from app.services.sarimax_forecast import REFIT_JOURNAL, refit_due, refit_sarimax_models
+
+
+def load_history(args, medicines):
+    if args.data:
+        df = pd.read_csv(args.data) if args.data.endswith('.csv') else pd.read_excel(args.data)
+        df['Year'] = df['Year'].astype(str).str.replace(',', '').astype(int)
+        return df
+
+    from app.database import SessionLocal
+    from app.models import Medicine
+    from app.services.sales_history import SalesHistory
+
+    db = SessionLocal()
+    try:
+        if medicines is None:
+            medicines = [name for (name,) in db.query(Medicine.medicine_name).all()]
+        return SalesHistory.load(db, medicines, weeks=args.weeks)
+    finally:
+        db.close()
+
+
+def forecast_refitted(medicines):
+    """Scheduled prediction run and low stock alerts for the refitted medicines"""
+    from app.database import SessionLocal
+    from app.models import Medicine, RunTrigger
+    from app.services.alert import AlertService
+    from app.services.prediction import PredictionService
+    from app.services.sales_history import SalesHistory
+
+    db = SessionLocal()
+    try:
+        medicine_ids = [medicine_id for (medicine_id,) in db.query(Medicine.medicine_id).filter(
+            Medicine.medicine_name.in_(medicines)
+        ).all()]
+        service = PredictionService()
+        predictions = service.generate_predictions(
+            SalesHistory.load(db, medicines), db, medicine_ids=medicine_ids, trigger=RunTrigger.schedule
+        )
+        alerts = AlertService().generate_all_alerts(db, medicine_ids=medicine_ids)
+        print(f"🔮 Run {service.last_run_id}: {len(predictions)} predictions, "
+              f"{alerts['total_alerts']} alerts created")
+        for name, error in service.forecast_failures.items():
+            print(f"   ⚠️ {name}: {error}")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-estimate SARIMAX models whose last fit is too old")
+    parser.add_argument('--data', help="Weekly dataset (.xlsx or .csv); default: the sales_data table")
+    parser.add_argument('--model-dir', default=settings.MODEL_DIR)
+    parser.add_argument('--medicines', default='manifest',
+                        help='"manifest" (medicines served by SARIMAX), "all" or a comma separated list')
+    parser.add_argument('--weeks', type=int, default=settings.FORECAST_HISTORY_WEEKS,
+                        help="Weeks of stored history to fit on")
+    parser.add_argument('--max-age-days', type=float, default=settings.SARIMAX_REFIT_DAYS)
+    parser.add_argument('--force', action='store_true', help="Refit every selected medicine")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--no-forecast', action='store_true',
+                        help="Don't re-forecast the refitted medicines (always skipped with --data)")
+    args = parser.parse_args()
+
+    # ------------------- 1️⃣ Select Medicines -------------------
+    manifest = ModelManifest(args.model_dir)
+    if args.medicines == 'manifest':
+        medicines = manifest.medicines('sarimax')
+    elif args.medicines == 'all':
+        medicines = None
+    else:
+        medicines = [name.strip() for name in args.medicines.split(',') if name.strip()]
+
+    df = load_history(args, medicines)
+    if medicines is None:
+        medicines = list(df['Product_Name'].unique())
+    print(f"✅ Loaded {len(df)} rows, {df['Product_Name'].nunique()} medicines")
+
+    selected = []
+    for name in medicines:
+        family = manifest.family(name)
+        if family not in (None, 'sarimax'):
+            print(f"   ⚠️ '{name}' is served by {family}, skipped")
+        elif args.force or refit_due(args.model_dir, name, args.max_age_days):
+            selected.append(name)
+
+    # ------------------- 2️⃣ Refit -------------------
+    names, Q, last_rows = weekly_matrix(df, selected)
+    for name in selected:
+        if name not in last_rows.index:
+            print(f"   ⚠️ '{name}' has no sales history, skipped")
+    tasks = [
+        (name, Q[i], int(last_rows['Year'].iat[i]), int(last_rows['Week_Number'].iat[i]))
+        for i, name in enumerate(names)
+    ]
+    print(f"🔍 {len(tasks)} of {len(medicines)} medicines due for a full refit\n")
+    if not tasks:
+        return
+
+    os.makedirs(args.model_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    def report(name, result):
+        if result['status'] == 'fitted':
+            print(f"   💾 {name}: {result['nobs']} weeks, AIC {result['aic']}")
+
+    results = refit_sarimax_models(tasks, args.model_dir, workers=args.workers, on_result=report)
+
+    # ------------------- 3️⃣ Manifest & Report -------------------
+    fitted = [name for name, result in results.items() if result['status'] == 'fitted']
+    if upsert_manifest_entries(args.model_dir, [
+        {'medicine_name': name, 'family': 'sarimax', 'path': MODEL_FILE_PATTERNS['sarimax'].format(name=name)}
+        for name in fitted
+    ]):
+        print(f"📝 Updated model_manifest.json with {len(fitted)} models")
+
+    failed = {name: result['error'] for name, result in results.items() if result['status'] == 'failed'}
+    print(f"\n✅ {len(fitted)} refitted, {len(failed)} failed in {time.perf_counter() - start:.1f}s "
+          f"(journal: {REFIT_JOURNAL})")
+    for name, error in failed.items():
+        print(f"   ❌ {name}: {error}")
+
+    # ------------------- 4️⃣ Re-forecast -------------------
+    if fitted and not args.data and not args.no_forecast:
+        forecast_refitted(fitted)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
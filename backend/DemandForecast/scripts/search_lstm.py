@@ -0,0 +1,94 @@
+# ==============================================
+# 📦 LSTM Hyperparameter Search (Successive Halving)
+# ==============================================
+# Replaces the exhaustive GridSearchCV of "lstm local.py" (7,200 full
+# trainings per SKU). Each medicine starts with a sample of the same grid
+# (dropout x activation x batch size x optimizer), trained for a few
+# epochs; after every rung only the best 1/eta by validation MAE continue
+# with eta times the epochs. Trials run in parallel worker processes and
+# are journaled in lstm_search_trials.jsonl, so running the command again
+# (interrupted, more medicines, larger budget) only trains new trials.
+#
+# The winner per medicine is written to lstm_<name>.search.json in the
+# model directory; train_models.py trains with it when present.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/search_lstm.py" --data "DemandForecast/data/demand_prediction_weekly.xlsx"
+#   python "DemandForecast/scripts/search_lstm.py" --data weekly.csv --medicines manifest --workers 8
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.config import settings
+from app.services.lstm_search import TRIALS_FILE, TrialCache, rung_budgets, save_best_config, successive_halving
+from app.services.model_manifest import ModelManifest
+from app.services.training import lstm_training_series
+
+from train_models import select_medicines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving LSTM hyperparameter search per medicine")
+    parser.add_argument('--data', required=True, help="Weekly training dataset (.xlsx or .csv)")
+    parser.add_argument('--model-dir', default=settings.MODEL_DIR, help="Where best configs and the trial journal go")
+    parser.add_argument('--medicines', default='manifest',
+                        help='"manifest" (current LSTM medicines), "all" or a comma separated list')
+    parser.add_argument('--configs', type=int, default=81, help="Configs sampled from the grid per medicine")
+    parser.add_argument('--eta', type=int, default=3, help="Keep the best 1/eta configs after every rung")
+    parser.add_argument('--min-epochs', type=int, default=10)
+    parser.add_argument('--max-epochs', type=int, default=250)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    args = parser.parse_args()
+
+    # ------------------- 1️⃣ Load Data -------------------
+    df = pd.read_csv(args.data) if args.data.endswith('.csv') else pd.read_excel(args.data)
+    df['Year'] = df['Year'].astype(str).str.replace(',', '').astype(int)
+    medicines = select_medicines(args.medicines, 'lstm', ModelManifest(args.model_dir), df)
+    series = lstm_training_series(df, medicines)
+    print(f"✅ Loaded {len(df)} rows, searching {len(series)} medicines from: {os.path.basename(args.data)}")
+
+    budgets = rung_budgets(args.min_epochs, args.max_epochs, args.eta)
+    print(f"🔍 {args.configs} configs per medicine, rungs at {budgets} epochs\n")
+
+    # ------------------- 2️⃣ Search -------------------
+    os.makedirs(args.model_dir, exist_ok=True)
+    cache = TrialCache(os.path.join(args.model_dir, TRIALS_FILE))
+    start = time.perf_counter()
+
+    def report(rung, epochs, trials, trained):
+        print(f"   ⏱️ Rung {rung + 1}: {trials} trials at {epochs} epochs, {trials - trained} cached "
+              f"({time.perf_counter() - start:.1f}s)")
+
+    try:
+        best = successive_halving(series, cache, n_configs=args.configs, eta=args.eta,
+                                  min_epochs=args.min_epochs, max_epochs=args.max_epochs, seed=args.seed,
+                                  workers=args.workers, threads_per_worker=args.threads_per_worker,
+                                  on_rung=report)
+    finally:
+        cache.close()
+
+    # ------------------- 3️⃣ Best Configs -------------------
+    print()
+    for name, document in best.items():
+        if document['val_mae'] is None:
+            print(f"   ❌ {name}: every config failed or diverged, nothing written")
+            continue
+        save_best_config(args.model_dir, document)
+        print(f"   💾 {name}: validation MAE {document['val_mae']} with {document['params']}")
+    for name in medicines:
+        if name not in best:
+            print(f"   ⚠️ '{name}' not found in dataset (or too little history), skipped")
+
+    print(f"\n✅ Searched {len(best)} medicines in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
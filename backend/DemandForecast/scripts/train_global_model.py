@@ -0,0 +1,57 @@
+# ==============================================
+# 📦 Train the Global XGBoost Model
+# ==============================================
+# Fits one XGBoost model on the pooled features of every medicine in a
+# weekly dataset and saves it as xgboost_global.json, with the per-medicine
+# scale/category encodings in xgboost_global.encodings.json. With
+# XGB_GLOBAL_MODEL_MODE=fallback it serves medicines that have no model of
+# their own; with "prefer" it serves every medicine it was trained on.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/train_global_model.py" --data "DemandForecast/data/demand_prediction_weekly.xlsx"
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.config import settings
+from app.services.global_model import save_global_model, train_global_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train one XGBoost model across all medicines")
+    parser.add_argument('--data', required=True, help="Weekly training dataset (.xlsx or .csv), optional Category column")
+    parser.add_argument('--model-dir', default=settings.MODEL_DIR, help="Directory to save the model in")
+    parser.add_argument('--n-estimators', type=int, default=400)
+    parser.add_argument('--max-depth', type=int, default=6)
+    parser.add_argument('--learning-rate', type=float, default=0.05)
+    args = parser.parse_args()
+
+    # ------------------- 1️⃣ Load Data -------------------
+    df = pd.read_csv(args.data) if args.data.endswith('.csv') else pd.read_excel(args.data)
+    print(f"✅ Loaded {len(df)} rows, {df['Product_Name'].nunique()} medicines from: {os.path.basename(args.data)}")
+
+    # ------------------- 2️⃣ Train -------------------
+    start = time.perf_counter()
+    model, encodings = train_global_model(
+        df,
+        n_estimators=args.n_estimators,
+        max_depth=args.max_depth,
+        learning_rate=args.learning_rate,
+    )
+    print(f"⏱️  Trained on {encodings.metadata['n_samples']} rows in {time.perf_counter() - start:.1f}s")
+
+    # ------------------- 3️⃣ Save -------------------
+    path = save_global_model(model, encodings, args.model_dir)
+    print(f"💾 Model: {path}")
+    print(f"✅ Global model covers {len(encodings.medicines)} medicines "
+          f"({len(encodings.categories)} categories)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# ==============================================
+# 📦 Train Per-Medicine XGBoost / LSTM Models
+# ==============================================
+# Reads the weekly dataset once, trains one model per medicine in parallel
+# worker processes (BLAS/XGBoost/TensorFlow threads capped per worker) and
+# writes each model and its preprocessing artifact atomically into the
+# serving directory, in the files PredictionService loads. Finished
+# medicines are journaled in training_checkpoint.jsonl, so running the same
+# command again after an interruption resumes where it stopped.
+#
+# Medicine selection per family: "manifest" (the medicines currently served
+# by that family), "all" (every medicine in the dataset), "none", or a
+# comma separated list of names. LSTM medicines with a search result
+# (lstm_<name>.search.json, from search_lstm.py) train with its config.
+#
+# Run from the backend directory:
+#   python "DemandForecast/scripts/train_models.py" --data "DemandForecast/data/demand_prediction_weekly.xlsx"
+#   python "DemandForecast/scripts/train_models.py" --data weekly.csv --xgb all --lstm none --workers 8
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.config import settings
+from app.services.lstm_search import load_best_config
+from app.services.model_manifest import MODEL_FILE_PATTERNS, ModelManifest, upsert_manifest_entries
+from app.services.preprocessing import ARTIFACT_FILES
+from app.services.training import (
+    CHECKPOINT_FILE,
+    LSTM_PARAMS,
+    XGB_PARAMS,
+    TrainingCheckpoint,
+    lstm_training_series,
+    run_fingerprint,
+    train_models,
+    xgb_training_sets,
+)
+
+
+def select_medicines(choice: str, family: str, manifest: ModelManifest, df: pd.DataFrame):
+    if choice == 'none':
+        return []
+    if choice == 'all':
+        return list(df['Product_Name'].unique())
+    if choice == 'manifest':
+        return manifest.medicines(family)
+    return [name.strip() for name in choice.split(',') if name.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train per-medicine forecasting models in parallel")
+    parser.add_argument('--data', required=True, help="Weekly training dataset (.xlsx or .csv)")
+    parser.add_argument('--model-dir', default=settings.MODEL_DIR, help="Serving model directory to write into")
+    parser.add_argument('--xgb', default='manifest', help="Medicines to train XGBoost models for")
+    parser.add_argument('--lstm', default='manifest', help="Medicines to train LSTM models for")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--xgb-estimators', type=int, default=XGB_PARAMS['n_estimators'])
+    parser.add_argument('--lstm-epochs', type=int, default=LSTM_PARAMS['epochs'])
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and train everything again")
+    args = parser.parse_args()
+
+    # ------------------- 1️⃣ Load Data -------------------
+    df = pd.read_csv(args.data) if args.data.endswith('.csv') else pd.read_excel(args.data)
+    df['Year'] = df['Year'].astype(str).str.replace(',', '').astype(int)
+    print(f"✅ Loaded {len(df)} rows, {df['Product_Name'].nunique()} medicines from: {os.path.basename(args.data)}")
+
+    manifest = ModelManifest(args.model_dir)
+    xgb_medicines = select_medicines(args.xgb, 'xgboost', manifest, df)
+    lstm_medicines = select_medicines(args.lstm, 'lstm', manifest, df)
+    both = set(xgb_medicines) & set(lstm_medicines)
+    if both:
+        sys.exit(f"❌ Medicines selected for both families (serving uses one model each): {sorted(both)[:5]}")
+
+    # ------------------- 2️⃣ Training Inputs -------------------
+    params = {
+        'xgboost': {'n_estimators': args.xgb_estimators},
+        'lstm': {'epochs': args.lstm_epochs},
+    }
+    xgb_sets = xgb_training_sets(df, xgb_medicines)
+    lstm_series = lstm_training_series(df, lstm_medicines)
+    tasks = [('xgboost', name, xgb_sets[name]) for name in xgb_medicines if name in xgb_sets]
+    tasks += [('lstm', name, lstm_series[name]) for name in lstm_medicines if name in lstm_series]
+    overrides = {('lstm', name): load_best_config(args.model_dir, name) for name in lstm_series}
+    overrides = {key: config for key, config in overrides.items() if config}
+    for name in xgb_medicines + lstm_medicines:
+        if name not in xgb_sets and name not in lstm_series:
+            print(f"   ⚠️ '{name}' not found in dataset (or too little history), skipped")
+
+    os.makedirs(args.model_dir, exist_ok=True)
+    fingerprint = run_fingerprint(df, {**params, 'xgb': sorted(xgb_medicines), 'lstm': sorted(lstm_medicines),
+                                       'searched': {name: config for (_, name), config in overrides.items()}})
+    checkpoint = TrainingCheckpoint(os.path.join(args.model_dir, CHECKPOINT_FILE), fingerprint, restart=args.restart)
+    print(f"🔍 {len(tasks)} models to train ({len(xgb_sets)} XGBoost, {len(lstm_series)} LSTM, "
+          f"{len(overrides)} with a searched config), {sum(checkpoint.is_done(f, n) for f, n, _ in tasks)} already done\n")
+
+    # ------------------- 3️⃣ Train -------------------
+    start = time.perf_counter()
+
+    def report(family, medicine_name, result):
+        if result['status'] == 'trained':
+            print(f"   💾 {family} {medicine_name}: validation MAE {result['val_mae']}")
+        elif result['status'] == 'skipped':
+            print(f"   ⚠️ {family} {medicine_name}: skipped, {result['reason']}")
+        else:
+            print(f"   ❌ {family} {medicine_name}: {result['error']}")
+
+    try:
+        counts = train_models(tasks, args.model_dir, checkpoint, params, workers=args.workers,
+                              threads_per_worker=args.threads_per_worker, on_result=report,
+                              overrides=overrides)
+    finally:
+        checkpoint.close()
+
+    # ------------------- 4️⃣ Manifest -------------------
+    trained = [(family, name) for (family, name), r in checkpoint.done.items() if r['status'] == 'trained']
+    if upsert_manifest_entries(args.model_dir, [
+        {
+            'medicine_name': name,
+            'family': family,
+            'path': MODEL_FILE_PATTERNS[family].format(name=name),
+            'preprocessing': ARTIFACT_FILES[family].format(name=name),
+        }
+        for family, name in trained
+    ]):
+        print(f"📝 Updated model_manifest.json with {len(trained)} models")
+
+    print(f"\n✅ {counts['trained']} trained, {counts['skipped']} skipped, {counts['failed']} failed, "
+          f"{counts['resumed']} resumed from checkpoint in {time.perf_counter() - start:.1f}s")
+    if counts['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
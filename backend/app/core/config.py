@@ -21,6 +21,31 @@ class Settings(BaseSettings):
     
     # ML Model
     MODEL_PATH: str = "DemandForecast/forecast_model.json"
+    MODEL_DIR: str = "./DemandForecast/saved models"
+    MODEL_CACHE_SIZE: int = 256
+    MODEL_CACHE_REVALIDATE_SECONDS: float = 5.0
+    LSTM_NUMPY_RUNTIME: bool = True  # prefer exported .npz weights over .keras
+    ML_WARMUP_ON_STARTUP: bool = True  # import pandas/XGBoost in the background after startup
+    ML_WARMUP_MODELS: bool = True  # then load the manifest's models and run one dummy batch per family
+    XGB_GLOBAL_MODEL_MODE: str = "fallback"  # off / fallback (only medicines without their own model) / prefer
+    
+    # Parallel Forecasting (1 worker = forecast inside the request process)
+    FORECAST_WORKERS: int = 1
+    FORECAST_CHUNK_SIZE: int = 250
+    FORECAST_HORIZON_WEEKS: int = 8
+    FEATURE_STORE_ENABLED: bool = True
+    FORECAST_HISTORY_WEEKS: int = 104  # stored weeks merged into each upload (0 = upload only)
+    FALLBACK_FORECAST_ENABLED: bool = True  # statistical forecasts for medicines without a model
+    FALLBACK_ALPHA: float = 0.3
+    FALLBACK_HOLDOUT_WEEKS: int = 8
+    SARIMAX_REFIT_DAYS: int = 28  # full re-estimation age for refit_sarimax.py; serving only extends the state
+    FORECAST_CACHE_ENABLED: bool = True  # reuse forecasts whose inputs and model are unchanged
+    FORECAST_CACHE_SIZE: int = 10000  # medicines kept in the in-memory tier
+    
+    # Background Jobs
+    JOB_WORKERS: int = 1
+    JOB_HEARTBEAT_SECONDS: float = 30.0  # how often a process marks its queued/running jobs alive
+    JOB_LEASE_SECONDS: float = 300.0  # jobs of other hosts count as interrupted after this long without a heartbeat
     
     # Stock Calculations
     LEAD_TIME_WEEKS: int = 2
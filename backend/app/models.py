@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, Date, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DECIMAL, Date, DateTime, Float, ForeignKey, Enum, JSON, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.database import Base
@@ -37,6 +37,10 @@ class Medicine(Base):
     # Relationships
     sales_data = relationship("SalesData", back_populates="medicine", cascade="all, delete-orphan")
     predictions = relationship("Prediction", back_populates="medicine", cascade="all, delete-orphan")
+    horizon_predictions = relationship("PredictionHorizon", back_populates="medicine", cascade="all, delete-orphan")
+    sales_features = relationship("SalesFeature", back_populates="medicine", cascade="all, delete-orphan")
+    cached_forecast = relationship("ForecastCacheEntry", back_populates="medicine", uselist=False, cascade="all, delete-orphan")
+    latest_prediction = relationship("LatestPrediction", back_populates="medicine", uselist=False, cascade="all, delete-orphan")
     alerts = relationship("Alert", back_populates="medicine", cascade="all, delete-orphan")
     
     def __repr__(self):
@@ -45,6 +49,9 @@ class Medicine(Base):
 
 class SalesData(Base):
     __tablename__ = "sales_data"
+    __table_args__ = (
+        UniqueConstraint("medicine_id", "week_identifier", name="uq_sales_data_medicine_week"),
+    )
     
     sales_id = Column(Integer, primary_key=True, index=True)
     medicine_id = Column(Integer, ForeignKey("medicines.medicine_id", ondelete="CASCADE"), nullable=False)
@@ -67,6 +74,7 @@ class Prediction(Base):
     predicted_demand = Column(Integer, nullable=False)
     reorder_level = Column(Integer, nullable=False)
     prediction_date = Column(Date, default=lambda: datetime.now(timezone.utc).date(), nullable=False)
+    run_id = Column(String(36), ForeignKey("prediction_runs.run_id", ondelete="SET NULL"), nullable=True, index=True)
     
     medicine = relationship("Medicine", back_populates="predictions")
     
@@ -74,6 +82,41 @@ class Prediction(Base):
         return f"<Prediction(medicine_id={self.medicine_id}, demand={self.predicted_demand}, reorder={self.reorder_level})>"
 
 
+class LatestPrediction(Base):
+    __tablename__ = "latest_predictions"
+    
+    # One row per medicine: a copy of its newest predictions row, replaced
+    # in the same transaction; predictions keeps the full history
+    medicine_id = Column(Integer, ForeignKey("medicines.medicine_id", ondelete="CASCADE"), primary_key=True)
+    prediction_id = Column(Integer, ForeignKey("predictions.prediction_id", ondelete="CASCADE"), nullable=False)
+    predicted_demand = Column(Integer, nullable=False)
+    reorder_level = Column(Integer, nullable=False)
+    prediction_date = Column(Date, nullable=False)
+    
+    medicine = relationship("Medicine", back_populates="latest_prediction")
+    
+    def __repr__(self):
+        return f"<LatestPrediction(medicine_id={self.medicine_id}, demand={self.predicted_demand}, date={self.prediction_date})>"
+
+
+class PredictionHorizon(Base):
+    __tablename__ = "prediction_horizons"
+    
+    horizon_id = Column(Integer, primary_key=True, index=True)
+    medicine_id = Column(Integer, ForeignKey("medicines.medicine_id", ondelete="CASCADE"), nullable=False, index=True)
+    model_type = Column(String(20), nullable=False)
+    horizon_week = Column(Integer, nullable=False)  # 1 = next week
+    target_week = Column(String(10), nullable=False)  # e.g. 2025-W03
+    predicted_demand = Column(Integer, nullable=False)
+    prediction_date = Column(Date, default=lambda: datetime.now(timezone.utc).date(), nullable=False, index=True)
+    run_id = Column(String(36), ForeignKey("prediction_runs.run_id", ondelete="SET NULL"), nullable=True, index=True)
+    
+    medicine = relationship("Medicine", back_populates="horizon_predictions")
+    
+    def __repr__(self):
+        return f"<PredictionHorizon(medicine_id={self.medicine_id}, week={self.target_week}, demand={self.predicted_demand})>"
+
+
 class AlertType(enum.Enum):
     low_stock = "low_stock"
     expiry = "expiry"
@@ -91,4 +134,100 @@ class Alert(Base):
     medicine = relationship("Medicine", back_populates="alerts")
     
     def __repr__(self):
-        return f"<Alert(medicine_id={self.medicine_id}, type={self.alert_type.value})>"
\ No newline at end of file
+        return f"<Alert(medicine_id={self.medicine_id}, type={self.alert_type.value})>"
+
+
+class SalesFeature(Base):
+    __tablename__ = "sales_features"
+    __table_args__ = (
+        UniqueConstraint("medicine_id", "week_key", name="uq_sales_features_medicine_week"),
+    )
+    
+    feature_id = Column(Integer, primary_key=True, index=True)
+    medicine_id = Column(Integer, ForeignKey("medicines.medicine_id", ondelete="CASCADE"), nullable=False, index=True)
+    week_key = Column(Integer, nullable=False)  # year * 100 + week_number, for ordering
+    year = Column(Integer, nullable=False)
+    week_number = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    weeks_observed = Column(Integer, nullable=False)
+    min_quantity = Column(Integer, nullable=False)
+    max_quantity = Column(Integer, nullable=False)
+    recent_quantities = Column(JSON, nullable=False)  # last 12 weeks, this week first
+    next_features = Column(JSON, nullable=True)  # XGBoost input for the following week
+    
+    medicine = relationship("Medicine", back_populates="sales_features")
+    
+    def __repr__(self):
+        return f"<SalesFeature(medicine_id={self.medicine_id}, week={self.year}-W{self.week_number:02d})>"
+
+
+class ForecastCacheEntry(Base):
+    __tablename__ = "forecast_cache"
+    
+    cache_id = Column(Integer, primary_key=True, index=True)
+    medicine_id = Column(Integer, ForeignKey("medicines.medicine_id", ondelete="CASCADE"), nullable=False, unique=True)
+    model_type = Column(String(20), nullable=False)  # model family: xgboost / lstm
+    model_version = Column(String(128), nullable=False)  # manifest version + file mtimes
+    input_hash = Column(String(32), nullable=False)  # digest of the forecast inputs
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    
+    medicine = relationship("Medicine", back_populates="cached_forecast")
+    
+    def __repr__(self):
+        return f"<ForecastCacheEntry(medicine_id={self.medicine_id}, version={self.model_version})>"
+
+
+class JobStatus(enum.Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class ForecastJob(Base):
+    __tablename__ = "forecast_jobs"
+    
+    job_id = Column(String(36), primary_key=True)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.queued, index=True)
+    stage = Column(String(50), nullable=True)
+    source_filename = Column(String(255), nullable=True)
+    medicines_total = Column(Integer, nullable=False, default=0)
+    medicines_processed = Column(Integer, nullable=False, default=0)
+    stage_timings = Column(JSON, nullable=True)  # {stage: seconds}
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    feature_medicine_ids = Column(JSON, nullable=True)  # medicines whose feature store rows the job has yet to update
+    owner = Column(String(255), nullable=True, index=True)  # host:boot_id:pid:start_time of the process running it
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<ForecastJob(id={self.job_id}, status={self.status.value}, stage={self.stage})>"
+
+
+class RunTrigger(enum.Enum):
+    upload = "upload"
+    schedule = "schedule"
+
+
+class PredictionRun(Base):
+    __tablename__ = "prediction_runs"
+    
+    run_id = Column(String(36), primary_key=True)
+    job_id = Column(String(36), ForeignKey("forecast_jobs.job_id", ondelete="SET NULL"), nullable=True)
+    trigger = Column(Enum(RunTrigger), nullable=False, default=RunTrigger.upload)
+    sku_count = Column(Integer, nullable=False, default=0)  # medicines selected for the run
+    predictions_written = Column(Integer, nullable=False, default=0)
+    cached_forecasts = Column(Integer, nullable=False, default=0)
+    failed_forecasts = Column(Integer, nullable=False, default=0)
+    horizon_weeks = Column(Integer, nullable=False, default=1)
+    stage_timings = Column(JSON, nullable=True)  # {stage: seconds}, stages in RUN_STAGES
+    duration_seconds = Column(Float, nullable=True)
+    started_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<PredictionRun(id={self.run_id}, trigger={self.trigger.value}, skus={self.sku_count})>"
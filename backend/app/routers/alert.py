@@ -4,7 +4,7 @@ from sqlalchemy import desc, func, and_
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 from app.database import get_db
-from app.models import Alert, AlertType, Medicine, Prediction
+from app.models import Alert, AlertType, Medicine, LatestPrediction
 from app.schemas import AlertResponse, AlertCreate
 from app.services.alert import AlertService
 
@@ -101,9 +101,7 @@ async def get_all_alerts(
 
         # LOW STOCK ALERT VALIDATION
         if alert.alert_type == AlertType.low_stock:
-            latest_prediction = db.query(Prediction).filter(
-                Prediction.medicine_id == medicine.medicine_id
-            ).order_by(Prediction.prediction_date.desc()).first()
+            latest_prediction = db.get(LatestPrediction, medicine.medicine_id)
 
             if latest_prediction and medicine.current_stock <= latest_prediction.reorder_level:
                 valid_alerts.append(alert)
@@ -126,12 +124,6 @@ async def get_alert_summary(db: Session = Depends(get_db)):
     """
     today = datetime.now(timezone.utc).date()
 
-    # Get latest predictions
-    latest_predictions = db.query(
-        Prediction.medicine_id,
-        func.max(Prediction.prediction_date).label('max_date')
-    ).group_by(Prediction.medicine_id).subquery()
-
     # Get LATEST alerts per medicine per type
     latest_alerts = db.query(
         Alert.medicine_id,
@@ -150,16 +142,10 @@ async def get_alert_summary(db: Session = Depends(get_db)):
     ).join(
         Medicine, Alert.medicine_id == Medicine.medicine_id
     ).join(
-        Prediction, Alert.medicine_id == Prediction.medicine_id
-    ).join(
-        latest_predictions,
-        and_(
-            Prediction.medicine_id == latest_predictions.c.medicine_id,
-            Prediction.prediction_date == latest_predictions.c.max_date
-        )
+        LatestPrediction, Alert.medicine_id == LatestPrediction.medicine_id
     ).filter(
         Alert.alert_type == AlertType.low_stock,
-        Medicine.current_stock <= Prediction.reorder_level
+        Medicine.current_stock <= LatestPrediction.reorder_level
     ).distinct()
 
     active_low_stock = active_low_stock_query.all()
@@ -204,43 +190,25 @@ async def get_low_stock_medicines(db: Session = Depends(get_db)):
     """
     Get list of medicines with low stock
     (current_stock <= reorder_level)
-    No duplicates - uses latest predictions only
+    One row per medicine - uses latest predictions only
     """
-    latest_predictions = db.query(
-        Prediction.medicine_id,
-        func.max(Prediction.prediction_date).label('max_date')
-    ).group_by(Prediction.medicine_id).subquery()
-
     low_stock_items = db.query(
         Medicine.medicine_id,
         Medicine.medicine_name,
         Medicine.batch_no,
         Medicine.current_stock,
         Medicine.safety_stock,
-        Prediction.reorder_level,
-        Prediction.predicted_demand
-    ).join(
-        Prediction, Medicine.medicine_id == Prediction.medicine_id
+        LatestPrediction.reorder_level,
+        LatestPrediction.predicted_demand
     ).join(
-        latest_predictions,
-        and_(
-            Prediction.medicine_id == latest_predictions.c.medicine_id,
-            Prediction.prediction_date == latest_predictions.c.max_date
-        )
+        LatestPrediction, Medicine.medicine_id == LatestPrediction.medicine_id
     ).filter(
-        Medicine.current_stock <= Prediction.reorder_level
-    ).distinct().all()
+        Medicine.current_stock <= LatestPrediction.reorder_level
+    ).all()
 
-    # Use set to prevent duplicates
-    seen_medicines = set()
     low_stock_list = []
 
     for med_id, med_name, batch, current, safety, reorder, demand in low_stock_items:
-        # Skip if already processed
-        if med_id in seen_medicines:
-            continue
-        seen_medicines.add(med_id)
-        
         if current <= safety:
             severity = "Critical"
         elif current <= (reorder * 0.5):
@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.services.warmup import ml_warmup
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get("/live")
+async def liveness():
+    """The process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    503 until the startup warm-up (imports, model loading, one dummy batch
+    per model family) has finished, so load balancers only route uploads
+    to warmed workers. Reports models loaded, memory footprint and
+    warm-up duration.
+    """
+    report = ml_warmup.report()
+    # Nothing to wait for when the warm-up is switched off
+    ready = ml_warmup.ready or not settings.ML_WARMUP_ON_STARTUP
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={**report, "ready": ready},
+    )
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from sqlalchemy import desc
+from typing import List, Optional
+from app.database import get_db
+from app.models import ForecastJob, JobStatus
+from app.schemas import ForecastJobResponse
+
+router = APIRouter(prefix="/api/jobs", tags=["Background Jobs"])
+
+
+@router.get("/", response_model=List[ForecastJobResponse])
+async def get_jobs(
+    db: Session = Depends(get_db),
+    status: Optional[JobStatus] = Query(None, description="Filter by job status"),
+    limit: int = Query(20, le=200)
+):
+    """List recent forecasting jobs, newest first"""
+    query = db.query(ForecastJob)
+    if status:
+        query = query.filter(ForecastJob.status == status)
+    return query.order_by(desc(ForecastJob.created_at)).limit(limit).all()
+
+
+@router.get("/{job_id}", response_model=ForecastJobResponse)
+async def get_job(job_id: str, db: Session = Depends(get_db)):
+    """
+    Poll a forecasting job: status, current stage, medicines processed,
+    per-stage timings and, once completed, the result summary
+    """
+    job = db.query(ForecastJob).filter(ForecastJob.job_id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,13 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile, status
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, and_
+from sqlalchemy import desc, and_, or_
 from typing import List, Optional
 from app.database import get_db
-from app.models import Medicine, SalesData, Prediction
-from app.schemas import PredictionResponse
-from app.services.prediction import PredictionService
-import pandas as pd
-from io import StringIO
+from app.models import Medicine, SalesData, Prediction, PredictionHorizon, LatestPrediction, PredictionRun, RunTrigger
+from app.schemas import PredictionResponse, PredictionHorizonResponse, PredictionRunResponse
+from app.services.model_manifest import get_model_manifest
+from app.services.warmup import ml_warmup
 
 # Note: Also update schemas.py to include last_actual_quantity in MedicineResponse
 
@@ -25,26 +24,14 @@ async def get_predicted_demand(
     """
     ✅ Get ONLY the latest predicted demand values for medicines
     """
-    # Subquery to get the latest prediction date for each medicine
-    latest_subquery = db.query(
-        Prediction.medicine_id,
-        func.max(Prediction.prediction_date).label("max_date")
-    ).group_by(Prediction.medicine_id)
+    # One row per medicine, kept current by every prediction run
+    query = db.query(LatestPrediction)
     
     # Apply medicine filter if provided
     if medicine_id:
-        latest_subquery = latest_subquery.filter(Prediction.medicine_id == medicine_id)
+        query = query.filter(LatestPrediction.medicine_id == medicine_id)
     
-    latest_subquery = latest_subquery.subquery()
-
-    # Join to get only the latest predictions
-    query = db.query(Prediction).join(
-        latest_subquery,
-        and_(
-            Prediction.medicine_id == latest_subquery.c.medicine_id,
-            Prediction.prediction_date == latest_subquery.c.max_date
-        )
-    ).order_by(Prediction.medicine_id)
+    query = query.order_by(LatestPrediction.medicine_id)
 
     predictions = query.all()
     
@@ -69,41 +56,24 @@ async def get_prediction_summary_dashboard(db: Session = Depends(get_db)):
        - Demand trend analysis
     """
 
-    # Step 1: Get latest prediction_date for each medicine
-    latest_predictions = db.query(
-        Prediction.medicine_id,
-        func.max(Prediction.prediction_date).label("max_date")
-    ).group_by(Prediction.medicine_id).subquery()
-
-    # Step 2: Join to get latest prediction with medicine info
+    # Latest prediction with medicine info (one row per medicine)
     query = db.query(
         Medicine.medicine_name,
-        Prediction.predicted_demand,
-        Prediction.reorder_level,
+        LatestPrediction.predicted_demand,
+        LatestPrediction.reorder_level,
         Medicine.current_stock,
         Medicine.last_actual_quantity,
-        Prediction.prediction_date,
-        Prediction.medicine_id
+        LatestPrediction.prediction_date,
+        LatestPrediction.medicine_id
     ).join(
-        Prediction, Medicine.medicine_id == Prediction.medicine_id
-    ).join(
-        latest_predictions,
-        and_(
-            Prediction.medicine_id == latest_predictions.c.medicine_id,
-            Prediction.prediction_date == latest_predictions.c.max_date
-        )
-    ).distinct().order_by(Medicine.medicine_name)
+        LatestPrediction, Medicine.medicine_id == LatestPrediction.medicine_id
+    ).order_by(Medicine.medicine_name)
 
     results = query.all()
 
     dashboard_list = []
-    seen_medicines = set()
 
     for med_name, pred_demand, reorder, curr_stock, last_actual, pred_date, med_id in results:
-        if med_id in seen_medicines:
-            continue
-        seen_medicines.add(med_id)
-
         current = curr_stock or 0
         last = last_actual or 0
 
@@ -155,6 +125,127 @@ async def get_prediction_summary_dashboard(db: Session = Depends(get_db)):
         "predictions": dashboard_list
     }
 
+# =========================================
+# GET: Multi-Week Forecast (Latest Run Only)
+# =========================================
+@router.get("/horizon", response_model=List[PredictionHorizonResponse])
+async def get_prediction_horizon(
+    db: Session = Depends(get_db),
+    medicine_id: Optional[int] = Query(None, description="Filter by medicine ID")
+):
+    """
+    Week-by-week forecast path of each medicine's latest prediction: the
+    horizon rows written by the run that latest_predictions points at
+    """
+    query = db.query(PredictionHorizon).join(
+        LatestPrediction, LatestPrediction.medicine_id == PredictionHorizon.medicine_id
+    ).join(
+        Prediction, Prediction.prediction_id == LatestPrediction.prediction_id
+    ).filter(or_(
+        PredictionHorizon.run_id == Prediction.run_id,
+        # Rows written before prediction runs were recorded carry no run id
+        and_(Prediction.run_id.is_(None), PredictionHorizon.run_id.is_(None),
+             PredictionHorizon.prediction_date == LatestPrediction.prediction_date)
+    ))
+    
+    if medicine_id:
+        query = query.filter(LatestPrediction.medicine_id == medicine_id)
+    
+    rows = query.order_by(
+        PredictionHorizon.medicine_id, PredictionHorizon.horizon_week, desc(PredictionHorizon.horizon_id)
+    ).all()
+    
+    # Older same-day runs without run ids may repeat a week: keep the newest row
+    latest = {}
+    for row in rows:
+        latest.setdefault((row.medicine_id, row.horizon_week), row)
+    
+    if medicine_id and not latest:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No multi-week forecast found for medicine ID {medicine_id}"
+        )
+    
+    return list(latest.values())
+
+
+# =========================================
+# GET: Model Cache Statistics
+# =========================================
+@router.get("/models/cache")
+async def get_model_cache_stats():
+    """
+    Hit/miss counters of the in-memory model registry
+    """
+    from app.services.model_registry import get_model_registry
+
+    return get_model_registry().stats()
+
+
+# =========================================
+# GET: Forecast Cache Statistics
+# =========================================
+@router.get("/forecasts/cache")
+async def get_forecast_cache_stats():
+    """
+    Hit ratios of the forecast result cache (memory and database tiers)
+    """
+    from app.services.forecast_cache import forecast_cache
+
+    return forecast_cache.stats()
+
+
+# =========================================
+# GET: Model Manifest
+# =========================================
+@router.get("/models/manifest")
+async def get_models_manifest():
+    """
+    Which model family, file and version serves each medicine
+    """
+    return get_model_manifest().describe()
+
+
+# =========================================
+# GET: ML Stack Warm-up / Import Timings
+# =========================================
+@router.get("/warmup")
+async def get_warmup_status():
+    """
+    Background import status of the forecasting stack and per-module
+    import times
+    """
+    return ml_warmup.report()
+
+
+# =========================================
+# GET: Recent Prediction Runs / Stage Timings
+# =========================================
+@router.get("/runs", response_model=List[PredictionRunResponse])
+async def get_prediction_runs(
+    db: Session = Depends(get_db),
+    trigger: Optional[RunTrigger] = Query(None, description="Filter by what started the run"),
+    limit: int = Query(20, le=200)
+):
+    """
+    Recent prediction runs, newest first: trigger, SKU count and seconds
+    spent in data prep, feature build, model load, inference and DB write
+    """
+    query = db.query(PredictionRun)
+    if trigger:
+        query = query.filter(PredictionRun.trigger == trigger)
+    return query.order_by(desc(PredictionRun.started_at)).limit(limit).all()
+
+
+@router.get("/runs/{run_id}", response_model=PredictionRunResponse)
+async def get_prediction_run(run_id: str, db: Session = Depends(get_db)):
+    """One prediction run with its stage timings"""
+    run = db.get(PredictionRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail=f"Prediction run {run_id} not found")
+    return run
+
+
 # =========================================
 # GET: Prediction by Medicine (Latest Only) - UPDATED
 # =========================================
@@ -163,9 +254,7 @@ async def get_prediction_by_medicine(medicine_id: int, db: Session = Depends(get
     """
     ✅ Get ONLY the latest prediction for a specific medicine
     """
-    prediction = db.query(Prediction).filter(
-        Prediction.medicine_id == medicine_id
-    ).order_by(desc(Prediction.prediction_date)).first()
+    prediction = db.get(LatestPrediction, medicine_id)
 
     if not prediction:
         raise HTTPException(
@@ -212,7 +301,8 @@ async def clear_all_predictions(db: Session = Depends(get_db)):
             detail="No predictions found to delete"
         )
 
-    # Delete all predictions
+    # Delete all predictions (and the latest-prediction rows pointing at them)
+    db.query(LatestPrediction).delete()
     db.query(Prediction).delete()
     db.commit()
 
@@ -254,6 +344,9 @@ async def delete_prediction_by_medicine(medicine_id: int, db: Session = Depends(
         )
 
     # Delete all predictions for this medicine
+    db.query(LatestPrediction).filter(
+        LatestPrediction.medicine_id == medicine_id
+    ).delete()
     db.query(Prediction).filter(
         Prediction.medicine_id == medicine_id
     ).delete()
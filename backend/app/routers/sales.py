@@ -2,13 +2,14 @@ from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import List, Optional
-import pandas as pd
 import io
 from app.database import get_db
 from app.models import Medicine, SalesData
 from app.schemas import SalesDataResponse, SalesDataCreate
-from app.services.prediction import PredictionService
-from app.services.alert import AlertService
+from app.services.jobs import get_job_runner
+
+# pandas and the feature store (NumPy) are imported inside the endpoints
+# that use them so importing the API stays fast
 
 router = APIRouter(prefix="/api/sales", tags=["Sales Management"])
 
@@ -17,6 +18,7 @@ router = APIRouter(prefix="/api/sales", tags=["Sales Management"])
 @router.post("/upload")
 async def upload_sales_data(
     file: UploadFile = File(...),
+    full_refresh: bool = Query(False, description="Re-forecast every medicine, not only those whose sales changed"),
     db: Session = Depends(get_db)
 ):
     """
@@ -24,12 +26,18 @@ async def upload_sales_data(
     1. Insert/Update weekly sales data
     2. Reduce medicine stock
     3. Store last actual quantity from CSV
-    4. Generate predictions
-    5. Generate alerts (low stock & expiry)
+    4. Queue a background job that updates the feature store, generates
+       predictions and alerts (low stock & expiry); poll /api/jobs/{job_id}
+    
+    Only medicines whose sales rows were inserted or changed are
+    re-forecast, unless `full_refresh` is set.
     """
     if not file.filename.endswith(('.csv', '.xlsx')):
         raise HTTPException(status_code=400, detail="Only CSV or Excel files allowed")
 
+    import pandas as pd
+    from app.services.sales_ingest import SalesIngest
+
     try:
         contents = await file.read()
         df = pd.read_csv(io.BytesIO(contents)) if file.filename.endswith('.csv') else pd.read_excel(io.BytesIO(contents))
@@ -46,75 +54,36 @@ async def upload_sales_data(
         if df[['Year', 'Week_Number', 'Total_Quantity']].isnull().any().any():
             raise HTTPException(status_code=400, detail="Invalid numeric values found in file")
 
-        # Group by product and get the last (most recent) quantity for each medicine
-        df_sorted = df.sort_values(['Year', 'Week_Number'])
-        last_quantities = df_sorted.groupby('Product_Name').agg({
-            'Total_Quantity': 'last'
-        }).to_dict()['Total_Quantity']
-
-        sales_inserted, stock_updated = 0, 0
-        skipped = []
-
-        for _, row in df.iterrows():
-            product_name = str(row['Product_Name']).strip()
-
-            # Find medicine
-            medicine = db.query(Medicine).filter(Medicine.medicine_name == product_name).first()
-            if not medicine:
-                skipped.append(product_name)
-                continue
-
-            week_identifier = f"{int(row['Year'])}-W{int(row['Week_Number']):02d}"
-
-            # Check if sales data exists
-            existing = db.query(SalesData).filter(
-                SalesData.medicine_id == medicine.medicine_id,
-                SalesData.week_identifier == week_identifier
-            ).first()
-
-            if existing:
-                existing.quantity_sold = int(row['Total_Quantity'])
-            else:
-                new_sales = SalesData(
-                    medicine_id=medicine.medicine_id,
-                    quantity_sold=int(row['Total_Quantity']),
-                    week_identifier=week_identifier,
-                    year=int(row['Year']),
-                    week_number=int(row['Week_Number'])
-                )
-                db.add(new_sales)
-                sales_inserted += 1
-
-            # Update medicine stock
-            old_stock = medicine.current_stock or 0
-            medicine.current_stock = max(0, old_stock - int(row['Total_Quantity']))
-            
-            # Store last actual quantity from CSV for this medicine
-            medicine.last_actual_quantity = int(last_quantities.get(product_name, row['Total_Quantity']))
-            
-            stock_updated += 1
-
-        db.commit()
-
-        # Generate predictions
-        prediction_service = PredictionService()
-        predictions = prediction_service.generate_predictions(df, db)
-
-        # Generate alerts
-        alert_service = AlertService()
-        alerts_result = alert_service.generate_all_alerts(db)
+        # Staged and merged in a fixed number of statements, not row by row
+        result = SalesIngest.ingest(db, df)
+        inserted_ids, updated_ids = result["inserted_ids"], result["updated_ids"]
+
+        # Feature state for the touched weeks, forecasting and alerts run in
+        # the background, for the changed medicines only (stock moved for
+        # every medicine in the file). Queuing the job commits the sales
+        # with it, so a restart never loses the pending feature updates.
+        dirty_ids = inserted_ids | updated_ids
+        job = get_job_runner().submit_forecast_job(
+            db, df,
+            source_filename=file.filename,
+            medicine_ids=None if full_refresh else dirty_ids,
+            alert_medicine_ids=None if full_refresh else dirty_ids | result["stock_ids"],
+            sales_changes=result["changed_weeks"]
+        )
 
         return {
             "success": True,
-            "message": "Sales data processed successfully",
+            "message": "Sales data saved, forecasting queued",
+            "job_id": job.job_id,
+            "status_url": f"/api/jobs/{job.job_id}",
             "summary": {
-                "sales_inserted": sales_inserted,
-                "stock_updated": stock_updated,
-                "predictions_generated": len(predictions),
-                "low_stock_alerts_created": alerts_result['low_stock_alerts'],
-                "expiry_alerts_created": alerts_result['expiry_alerts'],
-                "total_alerts_created": alerts_result['total_alerts'],
-                "skipped_products": skipped
+                "sales_inserted": result["sales_inserted"],
+                "sales_updated": result["sales_updated"],
+                "stock_updated": result["stock_updated"],
+                "medicines_with_new_sales": len(inserted_ids),
+                "medicines_with_updated_sales": len(updated_ids),
+                "full_refresh": full_refresh,
+                "skipped_products": result["skipped_products"]
             }
         }
 
@@ -129,11 +98,22 @@ async def create_sales_record(
     db: Session = Depends(get_db)
 ):
     """Manually create a single sales record"""
+    from app.services.feature_store import FeatureStore
+
     medicine = db.query(Medicine).filter(Medicine.medicine_id == sales_data.medicine_id).first()
     if not medicine:
         raise HTTPException(status_code=404, detail="Medicine not found")
 
     week_identifier = f"{sales_data.year}-W{sales_data.week_number:02d}"
+    existing = db.query(SalesData.sales_id).filter(
+        SalesData.medicine_id == sales_data.medicine_id,
+        SalesData.week_identifier == week_identifier
+    ).first()
+    if existing:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Sales for {week_identifier} already recorded (sales_id {existing.sales_id}); update that record instead"
+        )
 
     new_sales = SalesData(
         medicine_id=sales_data.medicine_id,
@@ -146,6 +126,7 @@ async def create_sales_record(
 
     # Reduce stock
     medicine.current_stock = max(0, (medicine.current_stock or 0) - sales_data.quantity_sold)
+    FeatureStore.apply_sales_changes(db, [(sales_data.medicine_id, sales_data.year, sales_data.week_number)])
     db.commit()
     db.refresh(new_sales)
 
@@ -207,6 +188,8 @@ async def update_sales_record(
     db: Session = Depends(get_db)
 ):
     """Update a sales record and adjust stock"""
+    from app.services.feature_store import FeatureStore
+
     sales = db.query(SalesData).filter(SalesData.sales_id == sales_id).first()
     if not sales:
         raise HTTPException(status_code=404, detail="Sales record not found")
@@ -220,6 +203,7 @@ async def update_sales_record(
 
     sales.quantity_sold = quantity_sold
     medicine.current_stock = max(0, (medicine.current_stock or 0) - difference)
+    FeatureStore.apply_sales_changes(db, [(sales.medicine_id, sales.year, sales.week_number)])
 
     db.commit()
     db.refresh(sales)
@@ -230,6 +214,8 @@ async def update_sales_record(
 @router.delete("/{sales_id}")
 async def delete_sales_record(sales_id: int, db: Session = Depends(get_db)):
     """Delete a sales record and restore stock"""
+    from app.services.feature_store import FeatureStore
+
     sales = db.query(SalesData).filter(SalesData.sales_id == sales_id).first()
     if not sales:
         raise HTTPException(status_code=404, detail="Sales record not found")
@@ -239,6 +225,7 @@ async def delete_sales_record(sales_id: int, db: Session = Depends(get_db)):
         medicine.current_stock += sales.quantity_sold
 
     db.delete(sales)
+    FeatureStore.apply_sales_changes(db, [(sales.medicine_id, sales.year, sales.week_number)])
     db.commit()
 
     return {"message": "Sales record deleted successfully", "sales_id": sales_id}
@@ -124,6 +124,19 @@ class PredictionResponse(BaseModel):
         from_attributes = True
 
 
+class PredictionHorizonResponse(BaseModel):
+    horizon_id: int
+    medicine_id: int
+    model_type: str
+    horizon_week: int
+    target_week: str
+    predicted_demand: int
+    prediction_date: date
+
+    class Config:
+        from_attributes = True
+
+
 class PredictionSummary(BaseModel):
     Product: str
     Last_Actual_Week: str
@@ -139,6 +152,56 @@ class SalesUploadResponse(BaseModel):
     summary: Dict
 
 
+class JobStatusEnum(str, Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class ForecastJobResponse(BaseModel):
+    job_id: str
+    status: JobStatusEnum
+    stage: Optional[str] = None
+    source_filename: Optional[str] = None
+    medicines_total: int
+    medicines_processed: int
+    stage_timings: Optional[Dict[str, float]] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    owner: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RunTriggerEnum(str, Enum):
+    upload = "upload"
+    schedule = "schedule"
+
+
+class PredictionRunResponse(BaseModel):
+    run_id: str
+    job_id: Optional[str] = None
+    trigger: RunTriggerEnum
+    sku_count: int
+    predictions_written: int
+    cached_forecasts: int
+    failed_forecasts: int
+    horizon_weeks: int
+    stage_timings: Optional[Dict[str, float]] = None
+    duration_seconds: Optional[float] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # ==============================
 # ALERT SCHEMAS
 # ==============================
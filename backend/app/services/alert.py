@@ -1,42 +1,34 @@
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
-from app.models import Alert, AlertType, Medicine, Prediction
-from sqlalchemy import func, and_
+from typing import Iterable, Optional
+from app.models import Alert, AlertType, Medicine, LatestPrediction
+from sqlalchemy import func, and_, true
 
 class AlertService:
     
     @staticmethod
-    def check_and_create_low_stock_alerts(db: Session):
+    def check_and_create_low_stock_alerts(db: Session, medicine_ids: Optional[Iterable[int]] = None):
         """
-        Check all medicines and create low stock alerts
-        where current_stock <= reorder_level
+        Check all medicines (or only `medicine_ids`) and create low stock
+        alerts where current_stock <= reorder_level
         
         FIXED: Deletes old alerts for the same medicine before creating new ones
         """
         
-        # Get latest predictions with reorder levels
-        latest_predictions = db.query(
-            Prediction.medicine_id,
-            func.max(Prediction.prediction_date).label('max_date')
-        ).group_by(Prediction.medicine_id).subquery()
-        
-        # Find medicines with low stock (using Medicine.current_stock directly)
+        # Find medicines with low stock against their latest reorder level
         low_stock_medicines = db.query(
             Medicine.medicine_id,
             Medicine.medicine_name,
             Medicine.current_stock,
-            Prediction.reorder_level
-        ).join(
-            Prediction, Medicine.medicine_id == Prediction.medicine_id
+            LatestPrediction.reorder_level
         ).join(
-            latest_predictions,
-            and_(
-                Prediction.medicine_id == latest_predictions.c.medicine_id,
-                Prediction.prediction_date == latest_predictions.c.max_date
-            )
+            LatestPrediction, Medicine.medicine_id == LatestPrediction.medicine_id
         ).filter(
-            Medicine.current_stock <= Prediction.reorder_level
-        ).distinct().all()
+            Medicine.current_stock <= LatestPrediction.reorder_level
+        )
+        if medicine_ids is not None:
+            low_stock_medicines = low_stock_medicines.filter(LatestPrediction.medicine_id.in_(list(medicine_ids)))
+        low_stock_medicines = low_stock_medicines.all()
         
         alerts_created = 0
         
@@ -67,10 +59,11 @@ class AlertService:
     
 
     @staticmethod
-    def check_and_create_expiry_alerts(db: Session, days_threshold: int = 30):
+    def check_and_create_expiry_alerts(db: Session, days_threshold: int = 30,
+                                       medicine_ids: Optional[Iterable[int]] = None):
         """
-        Check medicines expiring within the threshold (default 30 days)
-        and create expiry alerts
+        Check medicines (all, or only `medicine_ids`) expiring within the
+        threshold (default 30 days) and create expiry alerts
         
         FIXED: Deletes old alerts for the same medicine before creating new ones
         """
@@ -86,7 +79,10 @@ class AlertService:
         ).filter(
             Medicine.expiry_date <= threshold_date,
             Medicine.expiry_date >= today
-        ).distinct().all()
+        )
+        if medicine_ids is not None:
+            expiring_medicines = expiring_medicines.filter(Medicine.medicine_id.in_(list(medicine_ids)))
+        expiring_medicines = expiring_medicines.distinct().all()
         
         alerts_created = 0
         
@@ -119,34 +115,26 @@ class AlertService:
     
     
     @staticmethod
-    def cleanup_resolved_alerts(db: Session):
+    def cleanup_resolved_alerts(db: Session, medicine_ids: Optional[Iterable[int]] = None):
         """
         Remove alerts that are no longer valid:
-        - Low stock alerts where stock is now above reorder level
-        - Expiry alerts for medicines that have expired or are beyond 30 days
+        - Low stock alerts where stock is now above reorder level (of all
+          medicines, or only `medicine_ids`)
+        - Expiry alerts for medicines that have expired or are beyond 30
+          days (always all medicines; expiry moves with the date, not sales)
         """
+        scope = Alert.medicine_id.in_(list(medicine_ids)) if medicine_ids is not None else true()
         today = datetime.now(timezone.utc).date()
         
-        # Get latest predictions
-        latest_predictions = db.query(
-            Prediction.medicine_id,
-            func.max(Prediction.prediction_date).label('max_date')
-        ).group_by(Prediction.medicine_id).subquery()
-        
         # Find low stock alerts that should be removed (stock is now adequate)
         resolved_low_stock = db.query(Alert.alert_id).join(
             Medicine, Alert.medicine_id == Medicine.medicine_id
         ).join(
-            Prediction, Alert.medicine_id == Prediction.medicine_id
-        ).join(
-            latest_predictions,
-            and_(
-                Prediction.medicine_id == latest_predictions.c.medicine_id,
-                Prediction.prediction_date == latest_predictions.c.max_date
-            )
+            LatestPrediction, Alert.medicine_id == LatestPrediction.medicine_id
         ).filter(
+            scope,
             Alert.alert_type == AlertType.low_stock,
-            Medicine.current_stock > Prediction.reorder_level
+            Medicine.current_stock > LatestPrediction.reorder_level
         ).all()
         
         # Find expiry alerts that should be removed (expired or > 30 days away)
@@ -168,16 +156,19 @@ class AlertService:
 
     
     @staticmethod
-    def remove_duplicate_alerts(db: Session):
+    def remove_duplicate_alerts(db: Session, medicine_ids: Optional[Iterable[int]] = None):
         """
-        Remove duplicate alerts, keeping only the most recent one for each medicine+type
+        Remove duplicate alerts, keeping only the most recent one for each
+        medicine+type (of all medicines, or only `medicine_ids`)
         """
+        scope = Alert.medicine_id.in_(list(medicine_ids)) if medicine_ids is not None else true()
+        
         # Get the latest alert for each medicine-type combination
         latest_alerts = db.query(
             Alert.medicine_id,
             Alert.alert_type,
             func.max(Alert.alert_date).label('max_date')
-        ).group_by(Alert.medicine_id, Alert.alert_type).subquery()
+        ).filter(scope).group_by(Alert.medicine_id, Alert.alert_type).subquery()
         
         # Get IDs of alerts to keep
         keep_ids = db.query(Alert.alert_id).join(
@@ -194,6 +185,7 @@ class AlertService:
         # Delete duplicates
         if keep_ids_list:
             deleted = db.query(Alert).filter(
+                scope,
                 Alert.alert_id.notin_(keep_ids_list)
             ).delete(synchronize_session=False)
             db.commit()
@@ -203,21 +195,28 @@ class AlertService:
 
     
     @staticmethod
-    def generate_all_alerts(db: Session):
+    def generate_all_alerts(db: Session, medicine_ids: Optional[Iterable[int]] = None):
         """
         Generate both low stock and expiry alerts
         
         IMPROVED: Now includes cleanup steps to prevent duplicates
+        With `medicine_ids` only those medicines' low stock alerts are
+        recomputed (e.g. after an upload that touched a few of them);
+        expiry depends on the date, so expiry alerts always cover every
+        medicine.
         """
+        if medicine_ids is not None:
+            medicine_ids = list(medicine_ids)
+        
         # Step 1: Remove any existing duplicates
-        duplicates_removed = AlertService.remove_duplicate_alerts(db)
+        duplicates_removed = AlertService.remove_duplicate_alerts(db, medicine_ids)
         
         # Step 2: Generate new alerts (old ones are deleted automatically)
-        low_stock_alerts = AlertService.check_and_create_low_stock_alerts(db)
+        low_stock_alerts = AlertService.check_and_create_low_stock_alerts(db, medicine_ids)
         expiry_alerts = AlertService.check_and_create_expiry_alerts(db)
         
         # Step 3: Clean up resolved alerts
-        resolved_removed = AlertService.cleanup_resolved_alerts(db)
+        resolved_removed = AlertService.cleanup_resolved_alerts(db, medicine_ids)
         
         # Step 4: Verify all alerts were created correctly
         today = datetime.now(timezone.utc).date()
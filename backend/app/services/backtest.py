@@ -0,0 +1,261 @@
+import multiprocessing
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.fallback_forecast import SEASON_LENGTH, fallback_forecast, weekly_matrix
+from app.services.feature_engine import KNOWN_FEATURE_COLUMNS, LagRingBuffer, next_week, step_features
+from app.services.lstm_inference import lstm_batch_runner
+from app.services.lstm_numpy import NumpyLSTMModel, numpy_lstm_runner
+from app.services.sarimax_forecast import SARIMAX_MIN_WEEKS, extend_sarimax, fit_sarimax
+
+
+BACKTEST_FAMILIES = ['xgboost', 'lstm', 'sarimax', 'fallback']
+
+# 12 lags plus the week they predict; rows with less history are not scored
+MIN_HISTORY_WEEKS = 13
+
+
+def rolling_origins(width: int, horizon: int, n_origins: int, stride: int, min_weeks: int) -> np.ndarray:
+    """
+    Forecast origins (column index of the first forecast week) of a
+    right-aligned weekly matrix: the last one leaves exactly `horizon`
+    weeks to score, earlier ones step back by `stride` weeks
+    """
+    last = width - horizon
+    origins = last - stride * np.arange(n_origins)[::-1]
+    return origins[origins >= min_weeks]
+
+
+def origin_windows(Q: np.ndarray, origins: np.ndarray, history: int, horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (n, origins, history) views of the weeks before every origin and
+    (n, origins, horizon) views of the weeks it forecasts, taken with
+    stride tricks from the same matrix without copying it.
+    """
+    before = np.lib.stride_tricks.sliding_window_view(Q, history, axis=1)[:, origins - history]
+    after = np.lib.stride_tricks.sliding_window_view(Q, horizon, axis=1)[:, origins]
+    return before, after
+
+
+def _target_weeks(last_rows: pd.DataFrame, width: int, origins: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(n, origins) year and week of each origin's first forecast week, 52 weeks a year as in `next_week`"""
+    last = last_rows['Year'].to_numpy(dtype=int) * 52 + last_rows['Week_Number'].to_numpy(dtype=int) - 1
+    index = last[:, None] + (origins - (width - 1))[None, :]
+    return index // 52, index % 52 + 1
+
+
+def _backtest_xgb(service, names: List[str], history: np.ndarray, year: np.ndarray, week: np.ndarray,
+                  horizon: int) -> np.ndarray:
+    """Recursive forecasts for every (medicine, origin) row with one `predict_xgb` call per step"""
+    n, n_origins, _ = history.shape
+    rows = history.reshape(n * n_origins, -1)
+    buffer = LagRingBuffer(rows[:, ::-1][:, :12], np.minimum((~np.isnan(rows)).sum(axis=1), 12))
+    row_names = np.repeat(np.asarray(names, dtype=object), n_origins).tolist()
+    year, week = year.ravel(), week.ravel()
+
+    preds = np.full((n * n_origins, horizon), np.nan)
+    for step in range(horizon):
+        preds[:, step] = service.predict_xgb(row_names, step_features(buffer, year, week), {}, KNOWN_FEATURE_COLUMNS)
+        buffer.push(preds[:, step])
+        year, week = next_week(year, week)
+    return preds.reshape(n, n_origins, horizon)
+
+
+def _backtest_lstm(service, names: List[str], history: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Recursive forecasts for every (medicine, origin) row: each model gets
+    all its origins as one batch, one runner call per step
+    """
+    n, n_origins, _ = history.shape
+    preds = np.full((n, n_origins, horizon), np.nan)
+
+    models, artifacts = {}, {}
+    for medicine_name in names:
+        try:
+            models[medicine_name] = service.registry.get('lstm', medicine_name)
+        except Exception as e:
+            print(f"❌ LSTM model not found for '{medicine_name}': {e}")
+            continue
+        artifacts[medicine_name] = service.load_preprocessing('lstm', medicine_name)
+
+    flat = history.reshape(n, -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        scale, offset = service._lstm_scaling(names, {m: artifacts.get(m) for m in names},
+                                              np.nanmin(flat, axis=1), np.nanmax(flat, axis=1))
+    window_sizes = np.array([service._lstm_window_size(artifacts.get(m)) for m in names])
+    max_steps = int(window_sizes.max())
+
+    rows = np.nan_to_num(history.reshape(n * n_origins, -1)[:, ::-1][:, :max_steps], nan=0.0)
+    buffer = LagRingBuffer(rows, np.full(n * n_origins, max_steps))
+    for step in range(horizon):
+        windows = buffer.oldest_first().reshape(n, n_origins, max_steps)
+        scaled = {
+            name: (windows[i, :, max_steps - window_sizes[i]:] * scale[i] + offset[i])[..., None]
+            for i, name in enumerate(names)
+            if name in models
+        }
+        numpy_windows = {m: w for m, w in scaled.items() if isinstance(models[m], NumpyLSTMModel)}
+        keras_windows = {m: w for m, w in scaled.items() if m not in numpy_windows}
+        next_scaled = numpy_lstm_runner.predict(models, numpy_windows) if numpy_windows else {}
+        if keras_windows:
+            next_scaled.update(lstm_batch_runner.predict(models, keras_windows))
+
+        for i, medicine_name in enumerate(names):
+            if medicine_name in next_scaled:
+                preds[i, :, step] = (np.asarray(next_scaled[medicine_name], dtype=float) - offset[i]) / scale[i]
+        buffer.push(np.nan_to_num(preds[:, :, step].ravel(), nan=0.0))
+    return preds
+
+
+def sarimax_origin_forecasts(series: np.ndarray, origins: np.ndarray, horizon: int) -> Tuple[np.ndarray, Optional[str]]:
+    """
+    SARIMAX forecasts of one medicine from every origin.
+
+    Parameters are estimated once on the weeks before the first origin;
+    later origins extend the fitted state with the weeks in between
+    instead of refitting, as served forecasts do between scheduled
+    refits. Returns ((origins, horizon) forecasts, error).
+    """
+    forecasts = np.full((len(origins), horizon), np.nan)
+    start = int(np.argmax(~np.isnan(series)))
+    if origins[0] - start < SARIMAX_MIN_WEEKS:
+        return forecasts, f"{max(origins[0] - start, 0)} weeks before the first origin, need {SARIMAX_MIN_WEEKS}"
+
+    try:
+        # Week labels don't matter here, only the number of weeks between origins
+        state = fit_sarimax(series[start:origins[0]], 0, 1)
+        position = origins[0]
+        for k, origin in enumerate(origins):
+            forecasts[k], state = extend_sarimax(state, series[position:origin], horizon)
+            position = origin
+    except Exception as e:
+        return forecasts, f"{type(e).__name__}: {e}"
+    return forecasts, None
+
+
+def _backtest_sarimax(Q: np.ndarray, origins: np.ndarray, horizon: int, workers: int):
+    if workers <= 1:
+        results = [sarimax_origin_forecasts(series, origins, horizon) for series in Q]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(sarimax_origin_forecasts, Q, repeat(origins), repeat(horizon),
+                                        chunksize=max(1, len(Q) // (workers * 4))))
+    errors = [error for _, error in results]
+    return np.stack([forecasts for forecasts, _ in results]), errors
+
+
+def error_table(family: str, names: List[str], actual: np.ndarray, forecast: np.ndarray,
+                valid: np.ndarray) -> pd.DataFrame:
+    """
+    Per-medicine MAE, MAPE, SMAPE and bias (forecast - actual) over all
+    scored origins and horizon steps. MAPE skips zero-sales weeks; SMAPE
+    counts a zero forecast of a zero week as exact.
+    """
+    mask = valid[:, :, None] & ~np.isnan(actual) & ~np.isnan(forecast)
+    a = np.where(mask, actual, 0.0)
+    f = np.where(mask, forecast, 0.0)
+    error = f - a
+    count = mask.sum(axis=(1, 2))
+    nonzero = mask & (a != 0)
+    denominator = np.abs(a) + np.abs(f)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.where(nonzero, np.abs(error) / np.abs(a), 0.0)
+        sape = np.where(mask & (denominator > 0), 2 * np.abs(error) / denominator, 0.0)
+        table = pd.DataFrame({
+            'family': family,
+            'medicine_name': names,
+            'forecasts': count,
+            'MAE': np.abs(error).sum(axis=(1, 2)) / count,
+            'MAPE': 100 * ape.sum(axis=(1, 2)) / nonzero.sum(axis=(1, 2)),
+            'SMAPE': 100 * sape.sum(axis=(1, 2)) / count,
+            'Bias': error.sum(axis=(1, 2)) / count,
+        })
+    return table
+
+
+def run_backtest(df: pd.DataFrame, service, families: List[str] = BACKTEST_FAMILIES, n_origins: int = 12,
+                 stride: int = 1, horizon: int = 1, history: int = SEASON_LENGTH + 8,
+                 workers: int = 1) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Rolling-origin backtest of the forecasters on a weekly upload-format
+    frame.
+
+    Every medicine is forecast from `n_origins` origins, `stride` weeks
+    apart, ending `horizon` weeks before its last week; each forecaster
+    only sees the weeks before the origin (`history` of them for the
+    XGBoost, LSTM and fallback paths, which run all medicines and origins
+    in one batch per step). XGBoost and LSTM cover the medicines the
+    manifest routes to them; SARIMAX and the fallback cover every medicine.
+
+    Returns (per-medicine error table, per-family timing table).
+    """
+    names, Q, last_rows = weekly_matrix(df, df['Product_Name'].unique())
+    if not names:
+        return pd.DataFrame(), pd.DataFrame()
+    width = Q.shape[1]
+    origins = rolling_origins(width, horizon, n_origins, stride, MIN_HISTORY_WEEKS)
+    if not len(origins):
+        raise ValueError(f"{width} weeks of data leave no origin with {MIN_HISTORY_WEEKS} weeks of history")
+    history = int(min(history, origins[0]))
+
+    before, actual = origin_windows(Q, origins, history, horizon)
+    valid = (~np.isnan(before)).sum(axis=2) >= MIN_HISTORY_WEEKS
+    year, week = _target_weeks(last_rows, width, origins)
+    position = {name: i for i, name in enumerate(names)}
+
+    members = {
+        'xgboost': [n for n in service.xgb_medicines if n in position and not service.needs_legacy_scaler(n)],
+        'lstm': [n for n in service.lstm_medicines if n in position],
+        'sarimax': names,
+        'fallback': names,
+    }
+    skipped = [n for n in service.xgb_medicines if n in position and service.needs_legacy_scaler(n)]
+    if 'xgboost' in families and skipped:
+        print(f"⚠️ {len(skipped)} XGBoost medicines without a preprocessing artifact not backtested")
+
+    tables, timings = [], []
+    for family in families:
+        family_names = members[family]
+        if not family_names:
+            continue
+        rows = np.array([position[n] for n in family_names])
+        failed = 0
+
+        start = time.perf_counter()
+        if family == 'xgboost':
+            forecast = _backtest_xgb(service, family_names, before[rows], year[rows], week[rows], horizon)
+        elif family == 'lstm':
+            forecast = _backtest_lstm(service, family_names, before[rows], horizon)
+        elif family == 'sarimax':
+            forecast, errors = _backtest_sarimax(Q[rows], origins, horizon, workers)
+            failed = sum(error is not None for error in errors)
+            for medicine_name, error in zip(family_names, errors):
+                if error is not None:
+                    print(f"⚠️ SARIMAX backtest failed for '{medicine_name}': {error}")
+        else:
+            n = len(rows)
+            forecast = fallback_forecast(before[rows].reshape(n * len(origins), history), horizon)[0]
+            forecast = forecast.reshape(n, len(origins), horizon)
+        elapsed = time.perf_counter() - start
+
+        forecasts = len(rows) * len(origins) * horizon
+        tables.append(error_table(family, family_names, actual[rows], forecast, valid[rows]))
+        timings.append({
+            'family': family,
+            'medicines': len(rows),
+            'origins': len(origins),
+            'forecasts': forecasts,
+            'failed': failed,
+            'wall_s': round(elapsed, 3),
+            'ms_per_forecast': round(1000 * elapsed / forecasts, 4),
+        })
+
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(), pd.DataFrame(timings)
@@ -0,0 +1,157 @@
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.sarimax_forecast import week_index
+
+
+# Bump when the methods or their selection change, so cached forecasts expire
+FALLBACK_VERSION = '2'
+
+FALLBACK_METHODS = ['SeasonalNaive', 'EWMA', 'Croston']
+SEASON_LENGTH = 52
+
+
+def fallback_version() -> str:
+    """
+    Forecast cache version of fallback forecasts: the methods' version and
+    the settings they run with, so changing either expires cached ones
+    """
+    return f"fallback:{FALLBACK_VERSION}:alpha={settings.FALLBACK_ALPHA:g}:holdout={settings.FALLBACK_HOLDOUT_WEEKS}"
+
+
+def weekly_matrix(df: pd.DataFrame, medicine_names: List[str]):
+    """
+    SKU x week quantity matrix of an upload-format frame.
+
+    Columns are consecutive calendar weeks (52 a year, see `week_index`)
+    from the frame's first to its last week, so column distances are real
+    week distances whichever products share the batch. Each product's
+    weeks run from its first to its last observation with missing weeks
+    counted as zero sales, right-aligned so the last column is every
+    product's own last week (NaN before its first week). Returns (names,
+    matrix, last_rows) with last_rows indexed by Product_Name (Year,
+    Week_Number, Total_Quantity).
+    """
+    part = df[df['Product_Name'].isin(medicine_names)]
+    if part.empty:
+        return [], np.empty((0, 0)), pd.DataFrame(columns=['Year', 'Week_Number', 'Total_Quantity'])
+
+    row, names = pd.factorize(part['Product_Name'])
+    index = week_index(part['Year'].to_numpy(), part['Week_Number'].to_numpy())
+    start = index.min()
+    col = index - start
+    n, width = len(names), int(index.max() - start) + 1
+
+    # Weekly sums and observed weeks per product in one bincount each
+    cell = row * width + col
+    grid = np.bincount(cell, weights=part['Total_Quantity'].to_numpy(dtype=float), minlength=n * width).reshape(n, width)
+    seen = np.bincount(cell, minlength=n * width).reshape(n, width) > 0
+    first = seen.argmax(axis=1)
+    last = (width - 1) - seen[:, ::-1].argmax(axis=1)
+
+    # Shift each row so its last week lands in the final column
+    shift = (width - 1) - last
+    source = np.arange(width)[None, :] - shift[:, None]
+    matrix = grid[np.arange(n)[:, None], np.clip(source, 0, width - 1)]
+    matrix[source < first[:, None]] = np.nan
+
+    last_year, last_week = np.divmod(start + last, 52)
+    last_rows = pd.DataFrame({
+        'Year': last_year,
+        'Week_Number': last_week + 1,
+        'Total_Quantity': grid[np.arange(n), last],
+    }, index=pd.Index(names, name='Product_Name'))
+    return list(names), matrix, last_rows
+
+
+def _ewma(Q: np.ndarray, alpha: float, keep: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Final level of an EWMA per row, plus its one-step-ahead fitted values
+    for the last `keep` weeks
+    """
+    n, width = Q.shape
+    fitted = np.full((n, keep), np.nan)
+    level = np.full(n, np.nan)
+    for t in range(width):
+        if t >= width - keep:
+            fitted[:, t - (width - keep)] = level
+        y = Q[:, t]
+        smoothed = np.where(np.isnan(level), y, level + alpha * (y - level))
+        level = np.where(np.isnan(y), level, smoothed)
+    return fitted, level
+
+
+def _croston(Q: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Croston's method: demand size and inter-demand interval smoothed
+    separately, forecast = size / interval (zero before any demand).
+    """
+    n, width = Q.shape
+    size = np.full(n, np.nan)
+    interval = np.full(n, np.nan)
+    since = np.zeros(n)
+    for t in range(width):
+        y = Q[:, t]
+        since += ~np.isnan(y)
+        demand = y > 0
+        size = np.where(demand, np.where(np.isnan(size), y, size + alpha * (y - size)), size)
+        interval = np.where(demand, np.where(np.isnan(interval), since, interval + alpha * (since - interval)), interval)
+        since = np.where(demand, 0.0, since)
+    forecast = np.where(np.isnan(size), 0.0, size / interval)
+    return np.where(np.isnan(Q).all(axis=1), np.nan, forecast)
+
+
+def fallback_forecast(Q: np.ndarray, horizon: int = 1, alpha: float = settings.FALLBACK_ALPHA,
+                      holdout: int = settings.FALLBACK_HOLDOUT_WEEKS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Forecast every row of a right-aligned SKU x week matrix (see
+    `weekly_matrix`) with seasonal naive, EWMA or Croston.
+
+    Intermittent rows (average inter-demand interval above 1.32 weeks, the
+    usual Syntetos-Boylan cut-off) use Croston. Others use whichever of
+    seasonal naive and EWMA had the lower mean absolute error on its
+    one-step-ahead forecasts over the last `holdout` weeks; rows too short
+    to score use EWMA. Returns (forecasts (n, horizon), method index into
+    FALLBACK_METHODS per row). Rows without any observation are NaN.
+    """
+    n, width = Q.shape
+    horizon = max(1, horizon)
+    if n == 0:
+        return np.empty((0, horizon)), np.empty(0, dtype=int)
+
+    keep = min(holdout, width)
+    actual = Q[:, width - keep:]
+    seasonal_fitted = np.full((n, keep), np.nan)
+    if width - keep >= SEASON_LENGTH:
+        seasonal_fitted = Q[:, width - keep - SEASON_LENGTH:width - SEASON_LENGTH]
+    ewma_fitted, ewma_level = _ewma(Q, alpha, keep)
+    croston_level = _croston(Q, alpha)
+
+    # Holdout MAE per method; a method missing any holdout value can't win
+    scores = np.stack([
+        np.abs(fitted - actual).mean(axis=1)
+        for fitted in (seasonal_fitted, ewma_fitted)
+    ])
+    scores = np.where(np.isnan(scores), np.inf, scores)
+    method = np.argmin(scores, axis=0)
+    method[np.isinf(scores.min(axis=0))] = FALLBACK_METHODS.index('EWMA')
+
+    observed = (~np.isnan(Q)).sum(axis=1)
+    demands = (Q > 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        intermittent = observed / demands > 1.32
+    method[intermittent] = FALLBACK_METHODS.index('Croston')
+
+    steps = np.arange(horizon)
+    seasonal = np.full((n, horizon), np.nan)
+    if width >= SEASON_LENGTH:
+        seasonal = Q[:, width - SEASON_LENGTH + steps % SEASON_LENGTH]
+    forecasts = np.stack([
+        seasonal,
+        np.repeat(ewma_level[:, None], horizon, axis=1),
+        np.repeat(croston_level[:, None], horizon, axis=1),
+    ])[method, np.arange(n)]
+    return np.maximum(forecasts, 0.0), method
@@ -0,0 +1,194 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+CALENDAR_COLUMNS = ['Month', 'Quarter', 'Is_Year_Start', 'Is_Year_End', 'Sin_Week', 'Cos_Week']
+LAG_COLUMNS = [f'lag_{lag}' for lag in range(1, 13)]
+
+# (column, window, statistic) in the order the models were trained with
+ROLLING_FEATURES = [
+    ('rolling_mean_3', 3, 'mean'),
+    ('rolling_mean_5', 5, 'mean'),
+    ('rolling_mean_6', 6, 'mean'),
+    ('rolling_std_6', 6, 'std'),
+    ('rolling_mean_8', 8, 'mean'),
+    ('rolling_std_4', 4, 'std'),
+]
+ROLLING_COLUMNS = [name for name, _, _ in ROLLING_FEATURES]
+
+ENGINEERED_COLUMNS = CALENDAR_COLUMNS + LAG_COLUMNS + ROLLING_COLUMNS
+NON_FEATURE_COLUMNS = ['Total_Quantity', 'Week', 'Product_Name']
+KNOWN_FEATURE_COLUMNS = ['Year', 'Week_Number'] + ENGINEERED_COLUMNS
+
+
+def convert_week_to_datetime(series: pd.Series) -> pd.Series:
+    """Convert Week strings like '2024-W31' to datetime (Mon of that ISO week)."""
+    return pd.to_datetime(series + '-1', format='%Y-W%W-%w', errors='coerce')
+
+
+def calendar_features(week_number: np.ndarray) -> dict:
+    """Calendar features for an array of week numbers"""
+    week_number = np.asarray(week_number)
+    month = np.minimum(np.ceil(week_number / 4.33).astype(int), 12)
+    return {
+        'Month': month,
+        'Quarter': ((month - 1) // 3 + 1).astype(int),
+        'Is_Year_Start': (week_number <= 4).astype(int),
+        'Is_Year_End': (week_number >= 48).astype(int),
+        'Sin_Week': np.sin(2 * np.pi * week_number / 52),
+        'Cos_Week': np.cos(2 * np.pi * week_number / 52),
+    }
+
+
+def next_week(year: np.ndarray, week_number: np.ndarray):
+    """Vectorized (year, week) of the following week, wrapping after week 52"""
+    year = np.asarray(year).astype(int)
+    week = np.asarray(week_number).astype(int) + 1
+    wrap = week > 52
+    return np.where(wrap, year + 1, year), np.where(wrap, week - 52, week)
+
+
+def feature_columns(features: pd.DataFrame) -> List[str]:
+    """Model input columns of a feature frame, in upload column order"""
+    return [c for c in features.columns
+            if c not in NON_FEATURE_COLUMNS and c in KNOWN_FEATURE_COLUMNS]
+
+
+def build_feature_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calendar, lag and rolling features for every product in one pass.
+
+    Equivalent to filtering each product, sorting by Week and building the
+    features one medicine at a time, but computed with grouped shifts and
+    rolling windows over the whole upload. Rows without a full 12-week
+    history are dropped, as in the per-medicine path.
+    """
+    frame = df.sort_values(['Product_Name', 'Week'], kind='mergesort').reset_index(drop=True)
+    frame['Week'] = convert_week_to_datetime(frame['Week'])
+
+    for name, values in calendar_features(frame['Week_Number'].to_numpy()).items():
+        frame[name] = values
+
+    quantity = frame.groupby('Product_Name', sort=False)['Total_Quantity']
+    for lag in range(1, 13):
+        frame[f'lag_{lag}'] = quantity.shift(lag)
+
+    previous = frame['lag_1'].groupby(frame['Product_Name'], sort=False)
+    for name, window, stat in ROLLING_FEATURES:
+        rolled = getattr(previous.rolling(window=window), stat)()
+        frame[name] = rolled.reset_index(level=0, drop=True)
+
+    return frame.dropna().reset_index(drop=True)
+
+
+def _windowed_stat(history: np.ndarray, counts: np.ndarray, window: int, stat: str) -> np.ndarray:
+    """
+    Mean or sample std over the first `window` entries of each history row.
+
+    Rows holding fewer than `window` values fall back to all of them, and
+    std is 0.0 with fewer than two values, matching the recursive forecast
+    helpers used at training time.
+    """
+    out = np.zeros(len(history))
+    for count in np.unique(counts):
+        rows = counts == count
+        k = min(int(count), window)
+        if stat == 'mean':
+            if k > 0:
+                out[rows] = history[rows, :k].mean(axis=1)
+        elif count >= 2:
+            out[rows] = history[rows, :k].std(axis=1, ddof=1)
+    return out
+
+
+class LagRingBuffer:
+    """
+    Fixed-size history of recent quantities for many SKUs.
+
+    Row i holds SKU i's last `size` values; all SKUs advance together, so
+    one shared head marks the most recent column and `push` overwrites the
+    oldest column in place instead of shifting or concatenating arrays.
+    """
+
+    def __init__(self, history: np.ndarray, counts: np.ndarray):
+        # history: (n, size), most recent first, NaN where no value exists yet
+        self.values = np.array(history, dtype=float)
+        self.counts = np.array(counts, dtype=int)
+        self.size = self.values.shape[1]
+        self.head = 0
+
+    def push(self, latest: np.ndarray):
+        """Record the next value of every SKU"""
+        self.head = (self.head - 1) % self.size
+        self.values[:, self.head] = latest
+        np.minimum(self.counts + 1, self.size, out=self.counts)
+
+    def latest_first(self) -> np.ndarray:
+        """(n, size) view ordered from most recent to oldest"""
+        order = (self.head + np.arange(self.size)) % self.size
+        return self.values[:, order]
+
+    def oldest_first(self) -> np.ndarray:
+        """(n, size) view ordered from oldest to most recent"""
+        return self.latest_first()[:, ::-1]
+
+
+def recent_history(features: pd.DataFrame, size: int = 12):
+    """
+    Last `size` quantities of every product in a ring buffer, plus each
+    product's last observed row (indexed by Product_Name).
+    """
+    grouped = features.groupby('Product_Name', sort=False)
+    products = features['Product_Name'].unique().tolist()
+
+    # Most recent first, NaN-padded
+    tail = grouped.tail(size)
+    position = tail.groupby('Product_Name', sort=False).cumcount(ascending=False).to_numpy()
+    row = pd.Index(products).get_indexer(tail['Product_Name'])
+    history = np.full((len(products), size), np.nan)
+    history[row, position] = tail['Total_Quantity'].astype(float).to_numpy()
+    counts = np.bincount(row, minlength=len(products))
+
+    last = grouped.tail(1).set_index('Product_Name').reindex(products)
+    return LagRingBuffer(history, counts), last
+
+
+def step_features(buffer: LagRingBuffer, year: np.ndarray, week_number: np.ndarray) -> np.ndarray:
+    """
+    Model input matrix (KNOWN_FEATURE_COLUMNS order) for the week
+    following the values currently held in `buffer`.
+    """
+    history = buffer.latest_first()
+    columns = {'Year': year, 'Week_Number': week_number, **calendar_features(week_number)}
+    for lag in range(1, 13):
+        columns[f'lag_{lag}'] = np.nan_to_num(history[:, lag - 1], nan=0.0)
+    for name, window, stat in ROLLING_FEATURES:
+        columns[name] = _windowed_stat(history, buffer.counts, window, stat)
+    return np.column_stack([np.asarray(columns[c], dtype=float) for c in KNOWN_FEATURE_COLUMNS])
+
+
+def build_next_week_features(features: pd.DataFrame) -> pd.DataFrame:
+    """
+    Model input row for the week after each product's last observation.
+
+    `features` is the output of `build_feature_frame`. Returns one row per
+    product, indexed by Product_Name, holding the feature columns plus the
+    last observed Year / Week_Number / Total_Quantity.
+    """
+    if features.empty:
+        return pd.DataFrame(columns=KNOWN_FEATURE_COLUMNS + ['Last_Year', 'Last_Week_Number', 'Last_Quantity'])
+
+    buffer, last = recent_history(features)
+    year, week = next_week(last['Year'].to_numpy(), last['Week_Number'].to_numpy())
+
+    out = pd.DataFrame(
+        step_features(buffer, year, week),
+        index=pd.Index(last.index, name='Product_Name'),
+        columns=KNOWN_FEATURE_COLUMNS
+    )
+    out['Last_Year'] = last['Year'].to_numpy()
+    out['Last_Week_Number'] = last['Week_Number'].to_numpy()
+    out['Last_Quantity'] = last['Total_Quantity'].to_numpy()
+    return out
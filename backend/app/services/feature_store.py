@@ -0,0 +1,295 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.models import Medicine, SalesData, SalesFeature
+from app.services.feature_engine import LagRingBuffer, next_week, step_features
+
+
+HISTORY_SIZE = 12
+
+# Medicines with more changed weeks than this are rebuilt with `backfill`
+# instead of being replayed one week at a time
+REPLAY_MAX_WEEKS = 8
+
+
+def week_key(year: int, week_number: int) -> int:
+    """Sortable integer key for an ISO-style (year, week) pair"""
+    return int(year) * 100 + int(week_number)
+
+
+def serving_buffer(recent: np.ndarray, weeks_observed: np.ndarray) -> LagRingBuffer:
+    """
+    Lag ring buffer the upload path would build from the same history.
+
+    `build_feature_frame` drops a product's first 12 weeks (their lags are
+    incomplete), so only the weeks after those count towards the lag and
+    rolling features of the next week.
+    """
+    effective = np.clip(np.asarray(weeks_observed) - HISTORY_SIZE, 0, HISTORY_SIZE)
+    history = np.array(recent, dtype=float)
+    history[np.arange(HISTORY_SIZE)[None, :] >= effective[:, None]] = np.nan
+    return LagRingBuffer(history, effective)
+
+
+def next_features(recent: np.ndarray, weeks_observed: np.ndarray,
+                  year: np.ndarray, week_number: np.ndarray) -> np.ndarray:
+    """
+    XGBoost input rows (KNOWN_FEATURE_COLUMNS order) for the week after each
+    state; NaN rows where fewer than 13 weeks have been observed.
+    """
+    weeks_observed = np.asarray(weeks_observed)
+    next_year, next_week_number = next_week(year, week_number)
+    X = step_features(serving_buffer(recent, weeks_observed), next_year, next_week_number)
+    X[weeks_observed <= HISTORY_SIZE] = np.nan
+    return X
+
+
+class FeatureStore:
+    """
+    Per-medicine, per-week feature state kept in the `sales_features` table.
+
+    Each row holds the week's quantity, the last 12 quantities and the
+    XGBoost input vector for the following week, so a forecast reads one
+    row per medicine instead of recomputing lags and rolling windows from
+    the raw history. New weeks are applied by advancing the previous row's
+    state; edits to older weeks replay the medicine from that week on.
+    """
+
+    @staticmethod
+    def _advance(state: Optional[dict], year: int, week_number: int, quantity: int) -> dict:
+        """State after observing one more week (constant work per week)"""
+        if state is None:
+            recent = [quantity] + [None] * (HISTORY_SIZE - 1)
+            weeks_observed, min_qty, max_qty = 1, quantity, quantity
+        else:
+            recent = [quantity] + state['recent_quantities'][:HISTORY_SIZE - 1]
+            weeks_observed = state['weeks_observed'] + 1
+            min_qty = min(state['min_quantity'], quantity)
+            max_qty = max(state['max_quantity'], quantity)
+
+        history = np.array([[np.nan if q is None else q for q in recent]], dtype=float)
+        features = next_features(history, np.array([weeks_observed]), np.array([year]), np.array([week_number]))[0]
+
+        return {
+            'week_key': week_key(year, week_number),
+            'year': year,
+            'week_number': week_number,
+            'quantity': quantity,
+            'weeks_observed': weeks_observed,
+            'min_quantity': min_qty,
+            'max_quantity': max_qty,
+            'recent_quantities': recent,
+            'next_features': None if np.isnan(features).any() else features.tolist(),
+        }
+
+    @staticmethod
+    def apply_sales_changes(db: Session, changes: Iterable[Tuple[int, int, int]]) -> int:
+        """
+        Bring the store up to date after SalesData rows were inserted,
+        updated or deleted.
+
+        `changes` holds (medicine_id, year, week_number) of every touched
+        week. For each medicine the state just before its earliest touched
+        week is read and the weeks from there on are replayed; a plain
+        append therefore costs one step per new week. Medicines without
+        store rows yet, or with more than REPLAY_MAX_WEEKS touched weeks,
+        are rebuilt together with the vectorized `backfill` instead.
+        Returns the number of store rows written. The caller commits.
+        """
+        # Session autoflush is off; the replay must see the pending rows
+        db.flush()
+
+        earliest: Dict[int, int] = {}
+        touched: Dict[int, set] = {}
+        for medicine_id, year, week_number in changes:
+            key = week_key(year, week_number)
+            earliest[medicine_id] = min(key, earliest.get(medicine_id, key))
+            touched.setdefault(medicine_id, set()).add(key)
+        if not earliest:
+            return 0
+
+        stored = {
+            medicine_id for (medicine_id,) in db.query(SalesFeature.medicine_id).filter(
+                SalesFeature.medicine_id.in_(list(earliest))
+            ).distinct()
+        }
+        rebuild = [
+            medicine_id for medicine_id in earliest
+            if medicine_id not in stored or len(touched[medicine_id]) > REPLAY_MAX_WEEKS
+        ]
+        written = FeatureStore.backfill(db, rebuild) if rebuild else 0
+        for medicine_id in rebuild:
+            del earliest[medicine_id]
+
+        for medicine_id, from_key in earliest.items():
+            previous = db.query(SalesFeature).filter(
+                SalesFeature.medicine_id == medicine_id,
+                SalesFeature.week_key < from_key
+            ).order_by(SalesFeature.week_key.desc()).first()
+
+            state = None
+            if previous is not None:
+                state = {
+                    'recent_quantities': list(previous.recent_quantities),
+                    'weeks_observed': previous.weeks_observed,
+                    'min_quantity': previous.min_quantity,
+                    'max_quantity': previous.max_quantity,
+                }
+
+            from_year, from_week = divmod(from_key, 100)
+            weeks = db.query(
+                SalesData.year,
+                SalesData.week_number,
+                func.sum(SalesData.quantity_sold)
+            ).filter(
+                SalesData.medicine_id == medicine_id,
+                or_(
+                    SalesData.year > from_year,
+                    and_(SalesData.year == from_year, SalesData.week_number >= from_week)
+                )
+            ).group_by(SalesData.year, SalesData.week_number).order_by(
+                SalesData.year, SalesData.week_number
+            ).all()
+
+            db.query(SalesFeature).filter(
+                SalesFeature.medicine_id == medicine_id,
+                SalesFeature.week_key >= from_key
+            ).delete(synchronize_session=False)
+
+            rows = []
+            for year, week_number, quantity in weeks:
+                state = FeatureStore._advance(state, int(year), int(week_number), int(quantity))
+                rows.append({'medicine_id': medicine_id, **state})
+
+            if rows:
+                db.bulk_insert_mappings(SalesFeature, rows)
+            written += len(rows)
+
+        return written
+
+    @staticmethod
+    def backfill(db: Session, medicine_ids: Optional[List[int]] = None) -> int:
+        """
+        Rebuild the store from SalesData in bulk.
+
+        All weeks are computed together with grouped shifts instead of
+        stepping one week at a time. Returns the number of rows written.
+        The caller commits.
+        """
+        db.flush()
+        query = db.query(
+            SalesData.medicine_id,
+            SalesData.year,
+            SalesData.week_number,
+            func.sum(SalesData.quantity_sold).label('quantity')
+        )
+        if medicine_ids is not None:
+            query = query.filter(SalesData.medicine_id.in_(medicine_ids))
+        sales = pd.DataFrame(
+            query.group_by(SalesData.medicine_id, SalesData.year, SalesData.week_number).all(),
+            columns=['medicine_id', 'year', 'week_number', 'quantity']
+        )
+
+        delete = db.query(SalesFeature)
+        if medicine_ids is not None:
+            delete = delete.filter(SalesFeature.medicine_id.in_(medicine_ids))
+        delete.delete(synchronize_session=False)
+
+        if sales.empty:
+            return 0
+
+        sales = sales.sort_values(['medicine_id', 'year', 'week_number']).reset_index(drop=True)
+        grouped = sales.groupby('medicine_id', sort=False)['quantity']
+
+        # Column k holds the quantity k weeks back, this week first
+        recent = np.column_stack([
+            grouped.shift(k).to_numpy(dtype=float) for k in range(HISTORY_SIZE)
+        ])
+        weeks_observed = sales.groupby('medicine_id', sort=False).cumcount().to_numpy() + 1
+        features = next_features(
+            recent, weeks_observed,
+            sales['year'].to_numpy(), sales['week_number'].to_numpy()
+        )
+        ready = ~np.isnan(features).any(axis=1)
+
+        rows = [
+            {
+                'medicine_id': int(medicine_id),
+                'week_key': week_key(year, week_number),
+                'year': int(year),
+                'week_number': int(week_number),
+                'quantity': int(quantity),
+                'weeks_observed': int(observed),
+                'min_quantity': int(min_qty),
+                'max_quantity': int(max_qty),
+                'recent_quantities': [None if np.isnan(q) else int(q) for q in recent_row],
+                'next_features': features_row.tolist() if is_ready else None,
+            }
+            for medicine_id, year, week_number, quantity, observed, min_qty, max_qty, recent_row, features_row, is_ready
+            in zip(
+                sales['medicine_id'], sales['year'], sales['week_number'], sales['quantity'],
+                weeks_observed, grouped.cummin(), grouped.cummax(), recent, features, ready
+            )
+        ]
+        db.bulk_insert_mappings(SalesFeature, rows)
+        return len(rows)
+
+    @staticmethod
+    def latest(db: Session, medicine_names: List[str]) -> pd.DataFrame:
+        """
+        Most recent store row of each medicine, indexed by medicine name.
+
+        Columns: Year, Week_Number, Total_Quantity, weeks_observed,
+        min_quantity, max_quantity, recent_quantities, next_features.
+        """
+        columns = ['Year', 'Week_Number', 'Total_Quantity', 'weeks_observed',
+                   'min_quantity', 'max_quantity', 'recent_quantities', 'next_features']
+        if not medicine_names:
+            return pd.DataFrame(columns=columns)
+
+        latest_key = db.query(
+            SalesFeature.medicine_id,
+            func.max(SalesFeature.week_key).label('max_key')
+        ).join(
+            Medicine, Medicine.medicine_id == SalesFeature.medicine_id
+        ).filter(
+            Medicine.medicine_name.in_(medicine_names)
+        ).group_by(SalesFeature.medicine_id).subquery()
+
+        rows = db.query(
+            Medicine.medicine_name,
+            SalesFeature.year,
+            SalesFeature.week_number,
+            SalesFeature.quantity,
+            SalesFeature.weeks_observed,
+            SalesFeature.min_quantity,
+            SalesFeature.max_quantity,
+            SalesFeature.recent_quantities,
+            SalesFeature.next_features
+        ).join(
+            SalesFeature, Medicine.medicine_id == SalesFeature.medicine_id
+        ).join(
+            latest_key,
+            and_(
+                SalesFeature.medicine_id == latest_key.c.medicine_id,
+                SalesFeature.week_key == latest_key.c.max_key
+            )
+        ).all()
+
+        return pd.DataFrame(
+            [row[1:] for row in rows],
+            index=pd.Index([row[0] for row in rows], name='Product_Name'),
+            columns=columns
+        )
+
+
+def recent_matrix(recent_quantities: Iterable[list]) -> np.ndarray:
+    """(n, 12) float matrix from stored recent_quantities lists, NaN for gaps"""
+    return np.array(
+        [[np.nan if q is None else q for q in row] for row in recent_quantities],
+        dtype=float
+    ).reshape(-1, HISTORY_SIZE)
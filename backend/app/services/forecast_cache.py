@@ -0,0 +1,177 @@
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import ForecastCacheEntry, Medicine
+
+
+# Upload columns a forecast reads
+HISTORY_COLUMNS = ['Week', 'Year', 'Week_Number', 'Total_Quantity']
+
+
+class ForecastKey(NamedTuple):
+    model_type: str
+    model_version: str
+    input_hash: str
+
+
+def history_digests(df: pd.DataFrame, medicine_names: List[str]) -> Dict[str, str]:
+    """
+    Digest of each medicine's rows in an uploaded sales frame.
+
+    Rows are hashed in one vectorized pass and sorted, so the digest does
+    not depend on row order in the file.
+    """
+    part = df[df['Product_Name'].isin(medicine_names)]
+    if part.empty:
+        return {}
+
+    row_hashes = pd.util.hash_pandas_object(part[HISTORY_COLUMNS], index=False).to_numpy()
+    frame = pd.DataFrame({'name': part['Product_Name'].to_numpy(), 'hash': row_hashes})
+    frame = frame.sort_values(['name', 'hash'])
+    names, starts = np.unique(frame['name'].to_numpy(), return_index=True)
+    hashes = frame['hash'].to_numpy()
+    ends = list(starts[1:]) + [len(hashes)]
+    return {
+        name: hashlib.blake2b(hashes[start:end].tobytes(), digest_size=16).hexdigest()
+        for name, start, end in zip(names, starts, ends)
+    }
+
+
+def store_digests(rows: pd.DataFrame) -> Dict[str, str]:
+    """Digest of each medicine's latest feature store state (rows from `FeatureStore.latest`)"""
+    digests = {}
+    for name, row in rows.iterrows():
+        state = json.dumps([
+            int(row['Year']), int(row['Week_Number']), int(row['Total_Quantity']),
+            int(row['weeks_observed']), int(row['min_quantity']), int(row['max_quantity']),
+            row['recent_quantities'],
+        ])
+        digests[name] = hashlib.blake2b(state.encode(), digest_size=16).hexdigest()
+    return digests
+
+
+def input_hash(*parts: Any) -> str:
+    return hashlib.blake2b('|'.join(str(p) for p in parts).encode(), digest_size=16).hexdigest()
+
+
+class ForecastCache:
+    """
+    Cache of forecast results keyed by (model family, model version, input hash).
+
+    Each medicine has one slot: the key and result of its last forecast.
+    A lookup hits only when all three parts match, so a retrained model
+    (new version) or changed sales history (new hash) expires the slot.
+    The first tier is an in-process LRU dict; the second is the
+    `forecast_cache` table, which survives restarts and is shared by
+    every worker process.
+    """
+
+    def __init__(self, max_size: int = settings.FORECAST_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[ForecastKey, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _remember(self, medicine_name: str, key: ForecastKey, result: dict):
+        with self._lock:
+            self._entries[medicine_name] = (key, result)
+            self._entries.move_to_end(medicine_name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def lookup(self, db: Session, keys: Dict[str, ForecastKey]) -> Dict[str, dict]:
+        """Cached results for the medicines whose key matches, checking memory then the database"""
+        found = {}
+        pending = []
+        with self._lock:
+            for medicine_name, key in keys.items():
+                entry = self._entries.get(medicine_name)
+                if entry is not None and entry[0] == key:
+                    self._entries.move_to_end(medicine_name)
+                    found[medicine_name] = copy.deepcopy(entry[1])
+                    self.memory_hits += 1
+                else:
+                    pending.append(medicine_name)
+
+        if pending:
+            rows = db.query(Medicine.medicine_name, ForecastCacheEntry).join(
+                ForecastCacheEntry, Medicine.medicine_id == ForecastCacheEntry.medicine_id
+            ).filter(Medicine.medicine_name.in_(pending)).all()
+
+            for medicine_name, row in rows:
+                key = ForecastKey(row.model_type, row.model_version, row.input_hash)
+                if key == keys[medicine_name]:
+                    self._remember(medicine_name, key, row.result)
+                    found[medicine_name] = copy.deepcopy(row.result)
+                    self.db_hits += 1
+                else:
+                    self.expired += 1
+
+        self.misses += len(keys) - len(found)
+        return found
+
+    def store(self, db: Session, entries: Dict[str, Tuple[int, ForecastKey, dict]]):
+        """
+        Save fresh results; `entries` maps medicine name to
+        (medicine_id, key, result). The caller commits.
+        """
+        if not entries:
+            return
+
+        for medicine_name, (_, key, result) in entries.items():
+            self._remember(medicine_name, key, copy.deepcopy(result))
+
+        medicine_ids = [medicine_id for medicine_id, _, _ in entries.values()]
+        db.query(ForecastCacheEntry).filter(
+            ForecastCacheEntry.medicine_id.in_(medicine_ids)
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(ForecastCacheEntry, [
+            {
+                'medicine_id': medicine_id,
+                'model_type': key.model_type,
+                'model_version': key.model_version,
+                'input_hash': key.input_hash,
+                'result': result,
+            }
+            for medicine_id, key, result in entries.values()
+        ])
+
+    def invalidate(self, db: Optional[Session] = None) -> int:
+        """Drop every cached forecast (and the database tier when a session is given)"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+        if db is not None:
+            dropped = max(dropped, db.query(ForecastCacheEntry).delete(synchronize_session=False))
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per tier"""
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_ratio': round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else None,
+                'memory_hit_ratio': round(self.memory_hits / lookups, 4) if lookups else None,
+            }
+
+
+forecast_cache = ForecastCache()
@@ -0,0 +1,170 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+# Per-process service, created by the pool initializer
+_worker_service = None
+
+
+def _init_worker(model_dir: str, xgb_medicines: List[str], lstm_medicines: List[str]):
+    """Pool initializer: one thread per worker, models loaded and LSTM graphs traced up front"""
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = '1'
+
+    global _worker_service
+    from app.services.prediction import PredictionService
+
+    _worker_service = PredictionService(model_dir=model_dir)
+    registry = _worker_service.registry
+    for model_type, names in (('xgboost', xgb_medicines), ('lstm', lstm_medicines)):
+        for medicine_name in names[:registry.max_size]:
+            # Global model medicines share one model, loaded on first use
+            if _worker_service.manifest.family(medicine_name) != model_type:
+                continue
+            # A bad artifact must not fail the initializer, which would break the pool
+            try:
+                registry.get(model_type, medicine_name)
+                registry.get(f'{model_type}_preprocessing', medicine_name)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ Forecast worker could not preload {model_type} model for '{medicine_name}': "
+                      f"{type(e).__name__}: {e}")
+
+    # Chunks reach whichever worker is free, so each traces its own graphs
+    from app.services.warmup import warm_lstm
+
+    try:
+        warm_lstm(_worker_service, _worker_service, [
+            n for n in lstm_medicines[:registry.max_size] if _worker_service.manifest.family(n) == 'lstm'
+        ])
+    except Exception as e:
+        print(f"⚠️ Forecast worker could not warm up LSTM models: {type(e).__name__}: {e}")
+
+
+def _predict_xgb_chunk(names, X_rows, legacy_train, feature_cols):
+    return _worker_service.predict_xgb(names, X_rows, legacy_train, feature_cols)
+
+
+def _predict_lstm_chunk(names, last_qty, window_sizes, scale, offset):
+    return _worker_service.predict_lstm(names, last_qty, window_sizes, scale, offset)
+
+
+class ForecastWorkerPool:
+    """
+    Process pool that runs the model stage of the forecast for chunks of medicines.
+
+    The parent process builds features for the whole upload and sends each
+    worker only NumPy arrays for its chunk; predictions come back as arrays
+    and are assembled in the original order.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = settings.MODEL_DIR,
+        workers: int = settings.FORECAST_WORKERS,
+        chunk_size: int = settings.FORECAST_CHUNK_SIZE,
+        xgb_medicines: Optional[List[str]] = None,
+        lstm_medicines: Optional[List[str]] = None
+    ):
+        self.model_dir = model_dir
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # fork would copy a possibly initialized TensorFlow runtime
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(model_dir, list(xgb_medicines or []), list(lstm_medicines or []))
+        )
+
+        # Set once a worker died (or its initializer failed); the executor accepts no more work
+        self.broken = False
+
+    def _chunks(self, n: int):
+        # At least one chunk per worker so small catalogs still spread out
+        size = max(1, min(self.chunk_size, -(-n // self.workers)))
+        return [slice(start, min(start + size, n)) for start in range(0, n, size)]
+
+    def _run(self, fn, calls) -> np.ndarray:
+        """
+        Run `fn` once per argument tuple and concatenate the results in
+        order. A broken pool marks itself broken, is dropped as the shared
+        pool (the next `get_forecast_pool` starts a new one) and re-raises.
+        """
+        try:
+            futures = [self.executor.submit(fn, *args) for args in calls]
+            return np.concatenate([f.result() for f in futures]) if futures else np.empty(0)
+        except BrokenProcessPool:
+            self.broken = True
+            discard_forecast_pool(self)
+            raise
+
+    def predict_xgb(self, names, X_rows: np.ndarray, legacy_train: Dict[str, np.ndarray], feature_cols) -> np.ndarray:
+        calls = []
+        for chunk in self._chunks(len(names)):
+            chunk_names = names[chunk]
+            chunk_train = {n: legacy_train[n] for n in chunk_names if n in legacy_train}
+            calls.append((chunk_names, X_rows[chunk], chunk_train, feature_cols))
+        return self._run(_predict_xgb_chunk, calls)
+
+    def predict_lstm(self, names, last_qty: np.ndarray, window_sizes: np.ndarray,
+                     scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+        return self._run(_predict_lstm_chunk, [
+            (names[chunk], last_qty[chunk], window_sizes[chunk], scale[chunk], offset[chunk])
+            for chunk in self._chunks(len(names))
+        ])
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+_pool: Optional[ForecastWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_forecast_pool(model_dir: str, xgb_medicines: List[str], lstm_medicines: List[str]) -> Optional[ForecastWorkerPool]:
+    """
+    Shared worker pool, or None when parallel forecasting is disabled
+    (FORECAST_WORKERS <= 1). A pool that broke was discarded, so a new one
+    is started.
+    """
+    global _pool
+    if settings.FORECAST_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is not None and _pool.model_dir != model_dir:
+            _pool.executor.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ForecastWorkerPool(
+                model_dir=model_dir,
+                xgb_medicines=xgb_medicines,
+                lstm_medicines=lstm_medicines
+            )
+        return _pool
+
+
+def discard_forecast_pool(pool: ForecastWorkerPool):
+    """Stop using a broken pool; still-running workers are not waited for"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_forecast_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,176 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.feature_engine import (
+    CALENDAR_COLUMNS,
+    KNOWN_FEATURE_COLUMNS,
+    LAG_COLUMNS,
+    ROLLING_COLUMNS,
+    build_feature_frame,
+)
+from app.services.model_manifest import MODEL_FILE_PATTERNS, GLOBAL_MODEL_FAMILY, global_encodings_path
+from app.services.preprocessing import atomic_write
+
+
+# Quantity-valued inputs, divided by each medicine's scale so one model fits all
+SCALED_COLUMNS = LAG_COLUMNS + ROLLING_COLUMNS
+ENCODING_COLUMNS = ['sku_log_scale', 'sku_cv', 'sku_category']
+GLOBAL_FEATURE_COLUMNS = ['Week_Number'] + CALENDAR_COLUMNS + SCALED_COLUMNS + ENCODING_COLUMNS
+
+UNKNOWN_CATEGORY = 'unknown'
+
+
+class GlobalModelEncodings:
+    """
+    Per-medicine encodings of the global XGBoost model.
+
+    Every medicine the model was trained on has a scale (mean weekly
+    quantity), a coefficient of variation and a category code. Inputs
+    and target are divided by the scale, so SKUs selling 5 or 5,000 units
+    a week share one model; the encodings let it still tell them apart.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(
+        self,
+        medicines: Dict[str, Dict[str, Any]],
+        categories: List[str],
+        feature_columns: List[str] = GLOBAL_FEATURE_COLUMNS,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.medicines = medicines
+        self.categories = list(categories)
+        self.feature_columns = list(feature_columns)
+        self.metadata = metadata or {}
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, categories: Optional[Dict[str, str]] = None) -> "GlobalModelEncodings":
+        """
+        Encodings from a weekly upload-format frame. `categories` maps
+        medicine name to category; a `Category` column is used otherwise.
+        """
+        weekly = df.groupby(['Product_Name', 'Year', 'Week_Number'], sort=False)['Total_Quantity'].sum()
+        stats = weekly.groupby(level='Product_Name', sort=False).agg(['mean', 'std']).fillna(0.0)
+        if categories is None and 'Category' in df.columns:
+            categories = df.groupby('Product_Name', sort=False)['Category'].first().astype(str).to_dict()
+        categories = categories or {}
+
+        names = list(stats.index)
+        category_names = sorted({categories.get(n, UNKNOWN_CATEGORY) for n in names} | {UNKNOWN_CATEGORY})
+        codes = {c: i for i, c in enumerate(category_names)}
+
+        scale = np.maximum(stats['mean'].to_numpy(dtype=float), 1.0)
+        cv = stats['std'].to_numpy(dtype=float) / scale
+        return cls(
+            medicines={
+                name: {'scale': float(scale[i]), 'cv': float(cv[i]),
+                       'category': codes[categories.get(name, UNKNOWN_CATEGORY)]}
+                for i, name in enumerate(names)
+            },
+            categories=category_names,
+        )
+
+    def lookup(self, medicine_names) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(scale, cv, category code) arrays; NaN scale for medicines the model has not seen"""
+        unknown = {'scale': np.nan, 'cv': np.nan, 'category': self.categories.index(UNKNOWN_CATEGORY)}
+        rows = [self.medicines.get(name, unknown) for name in medicine_names]
+        return (
+            np.array([r['scale'] for r in rows], dtype=float),
+            np.array([r['cv'] for r in rows], dtype=float),
+            np.array([r['category'] for r in rows], dtype=float),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format_version': self.FORMAT_VERSION,
+            'feature_columns': self.feature_columns,
+            'categories': self.categories,
+            'medicines': self.medicines,
+            'metadata': self.metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GlobalModelEncodings":
+        if data.get('format_version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported global model encodings format: {data.get('format_version')}")
+        return cls(
+            medicines=data['medicines'],
+            categories=data['categories'],
+            feature_columns=data['feature_columns'],
+            metadata=data.get('metadata'),
+        )
+
+    def save(self, path: str):
+        """Write the encodings atomically so readers never see a partial file"""
+        atomic_write(path, lambda tmp_path: _dump_json(self.to_dict(), tmp_path))
+
+    @classmethod
+    def load(cls, path: str) -> "GlobalModelEncodings":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def _dump_json(data: Dict[str, Any], path: str):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+
+def global_features(X_rows: np.ndarray, scale: np.ndarray, cv: np.ndarray, category: np.ndarray) -> np.ndarray:
+    """
+    Global model input matrix (GLOBAL_FEATURE_COLUMNS order) from feature
+    rows in KNOWN_FEATURE_COLUMNS order and each row's encodings.
+    """
+    X_rows = np.asarray(X_rows, dtype=float)
+    columns = {c: X_rows[:, i] for i, c in enumerate(KNOWN_FEATURE_COLUMNS)}
+    for c in SCALED_COLUMNS:
+        columns[c] = columns[c] / scale
+    columns['sku_log_scale'] = np.log(scale)
+    columns['sku_cv'] = cv
+    columns['sku_category'] = category
+    return np.column_stack([np.asarray(columns[c], dtype=np.float32) for c in GLOBAL_FEATURE_COLUMNS])
+
+
+def train_global_model(df: pd.DataFrame, categories: Optional[Dict[str, str]] = None, **params):
+    """
+    Fit one XGBRegressor on the pooled features of every medicine in `df`.
+
+    The target is next week's quantity divided by the medicine's scale.
+    Returns (model, encodings); save both with `save_global_model`.
+    """
+    from xgboost import XGBRegressor
+
+    encodings = GlobalModelEncodings.fit(df, categories)
+    features = build_feature_frame(df[['Product_Name', 'Week', 'Year', 'Week_Number', 'Total_Quantity']])
+    scale, cv, category = encodings.lookup(features['Product_Name'])
+    X = global_features(features[KNOWN_FEATURE_COLUMNS].to_numpy(dtype=float), scale, cv, category)
+    y = features['Total_Quantity'].to_numpy(dtype=float) / scale
+
+    params = {'n_estimators': 400, 'max_depth': 6, 'learning_rate': 0.05, 'subsample': 0.8,
+              'colsample_bytree': 0.8, 'tree_method': 'hist', **params}
+    model = XGBRegressor(**params)
+    model.fit(X, y)
+
+    encodings.metadata = {
+        'n_samples': int(len(X)),
+        'n_medicines': len(encodings.medicines),
+        'params': {k: v for k, v in params.items() if isinstance(v, (int, float, str, bool))},
+    }
+    return model, encodings
+
+
+def save_global_model(model, encodings: GlobalModelEncodings, model_dir: str,
+                      file_name: str = MODEL_FILE_PATTERNS[GLOBAL_MODEL_FAMILY]) -> str:
+    """
+    Write the model and its encodings into `model_dir`; encodings go
+    first, so a reader that sees the new model also sees its encodings.
+    Returns the model path.
+    """
+    path = os.path.join(model_dir, file_name)
+    encodings.save(global_encodings_path(path))
+    atomic_write(path, model.save_model)
+    return path
@@ -0,0 +1,303 @@
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models import ForecastJob, JobStatus, RunTrigger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+ACTIVE_STATUSES = [JobStatus.queued, JobStatus.running]
+
+
+def _boot_id() -> str:
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def _process_start(pid: int) -> Optional[str]:
+    """Start time of a live process in clock ticks since boot (Linux), else None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def process_owner(pid: Optional[int] = None) -> str:
+    """
+    Job owner id of a process: host, kernel boot, pid and start time, so a
+    later process reusing the pid (after a restart, or in a new container
+    on the same host) does not pass for it
+    """
+    pid = pid or os.getpid()
+    return f"{socket.gethostname()}:{_boot_id()}:{pid}:{_process_start(pid) or ''}"
+
+
+def owner_alive(owner: Optional[str]) -> Optional[bool]:
+    """
+    Whether the process that owns a job still runs: True/False when it ran
+    on this host, None when that can't be told here (another host, no
+    owner recorded, no /proc) and the job's heartbeat has to decide
+    """
+    if not owner:
+        return None
+    try:
+        host, boot_id, pid, start = owner.rsplit(':', 3)
+    except ValueError:
+        return None
+    if host != socket.gethostname() or not boot_id or not start:
+        return None
+    if boot_id != _boot_id():
+        return False
+    return _process_start(int(pid)) == start
+
+
+class JobRunner:
+    """
+    In-process background runner for forecasting jobs.
+
+    Jobs are persisted in the `forecast_jobs` table so their progress can be
+    polled from any request; the work itself runs on a small thread pool
+    with its own DB sessions, so no external broker is needed.
+    """
+
+    def __init__(self, max_workers: int = settings.JOB_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="forecast-job")
+        # Concurrent jobs must not replay the same medicines' feature rows at once
+        self.feature_lock = threading.Lock()
+
+        # Jobs are tagged with this process so other API workers sharing the
+        # table leave them alone; a heartbeat keeps them visibly alive
+        self.owner = process_owner()
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="forecast-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        """Refresh this process's active jobs and fail jobs whose owner is gone"""
+        while not self._stopped.wait(settings.JOB_HEARTBEAT_SECONDS):
+            db = SessionLocal()
+            try:
+                db.query(ForecastJob).filter(
+                    ForecastJob.owner == self.owner,
+                    ForecastJob.status.in_(ACTIVE_STATUSES)
+                ).update({ForecastJob.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False)
+                db.commit()
+                self.fail_interrupted_jobs(db)
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Job heartbeat failed: {e}")
+            finally:
+                db.close()
+
+    @staticmethod
+    def _update_job(job_id: str, **fields):
+        """Persist job fields in a short session of their own"""
+        db = SessionLocal()
+        try:
+            job = db.query(ForecastJob).filter(ForecastJob.job_id == job_id).first()
+            if job:
+                for key, value in fields.items():
+                    setattr(job, key, value)
+                db.commit()
+        finally:
+            db.close()
+
+    def submit_forecast_job(
+        self,
+        db: Session,
+        df: "pd.DataFrame",
+        source_filename: Optional[str] = None,
+        medicine_ids: Optional[Iterable[int]] = None,
+        alert_medicine_ids: Optional[Iterable[int]] = None,
+        trigger: RunTrigger = RunTrigger.upload,
+        sales_changes: Optional[Iterable[Tuple[int, int, int]]] = None
+    ) -> ForecastJob:
+        """
+        Create a queued job and schedule forecasting + alert generation for it.
+
+        `medicine_ids` limits forecasting and `alert_medicine_ids` limits
+        alert generation to those medicines; None means all of them.
+        `trigger` is recorded on the job's prediction run. `sales_changes`
+        are (medicine_id, year, week_number) weeks the job applies to the
+        feature store before forecasting; the medicines are recorded on the
+        job so a restart in between can rebuild them.
+        """
+        sales_changes = list(sales_changes or [])
+        job = ForecastJob(
+            job_id=str(uuid.uuid4()),
+            status=JobStatus.queued,
+            stage="queued",
+            source_filename=source_filename,
+            stage_timings={},
+            feature_medicine_ids=sorted({change[0] for change in sales_changes}) or None,
+            owner=self.owner,
+            heartbeat_at=datetime.now(timezone.utc)
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self.executor.submit(
+            self._run_forecast_job, job.job_id, df,
+            None if medicine_ids is None else set(medicine_ids),
+            None if alert_medicine_ids is None else set(alert_medicine_ids),
+            trigger, sales_changes
+        )
+        return job
+
+    def _run_forecast_job(self, job_id: str, df: "pd.DataFrame", medicine_ids: Optional[set] = None,
+                          alert_medicine_ids: Optional[set] = None, trigger: RunTrigger = RunTrigger.upload,
+                          sales_changes: Optional[list] = None):
+        from app.services.prediction import PredictionService
+        from app.services.alert import AlertService
+        from app.services.feature_store import FeatureStore
+
+        timings = {}
+        self._update_job(
+            job_id,
+            status=JobStatus.running,
+            stage="features" if sales_changes else "forecasting",
+            started_at=datetime.now(timezone.utc)
+        )
+
+        db = SessionLocal()
+        try:
+            # Stage 1: lag/rolling feature state for the uploaded weeks
+            if sales_changes:
+                start = time.perf_counter()
+                with self.feature_lock:
+                    FeatureStore.apply_sales_changes(db, sales_changes)
+                    db.query(ForecastJob).filter(ForecastJob.job_id == job_id).update(
+                        {ForecastJob.feature_medicine_ids: None}, synchronize_session=False
+                    )
+                    db.commit()
+                timings["features"] = round(time.perf_counter() - start, 3)
+                self._update_job(job_id, stage="forecasting", stage_timings=dict(timings))
+
+            # Stage 2: predictions
+            start = time.perf_counter()
+            prediction_service = PredictionService()
+
+            def report_progress(processed: int, total: int):
+                self._update_job(job_id, medicines_processed=processed, medicines_total=total)
+
+            predictions = prediction_service.generate_predictions(
+                df, db, progress_callback=report_progress, medicine_ids=medicine_ids,
+                trigger=trigger, job_id=job_id
+            )
+            timings["forecasting"] = round(time.perf_counter() - start, 3)
+            self._update_job(job_id, stage="alerts", stage_timings=dict(timings))
+
+            # Stage 3: alerts
+            start = time.perf_counter()
+            alerts_result = AlertService().generate_all_alerts(db, medicine_ids=alert_medicine_ids)
+            timings["alerts"] = round(time.perf_counter() - start, 3)
+
+            self._update_job(
+                job_id,
+                status=JobStatus.completed,
+                stage="done",
+                stage_timings=dict(timings),
+                finished_at=datetime.now(timezone.utc),
+                result={
+                    "run_id": prediction_service.last_run_id,
+                    "mode": "full" if medicine_ids is None else "incremental",
+                    "medicines_changed": None if medicine_ids is None else len(medicine_ids),
+                    "predictions_generated": len(predictions),
+                    "low_stock_alerts_created": alerts_result['low_stock_alerts'],
+                    "expiry_alerts_created": alerts_result['expiry_alerts'],
+                    "total_alerts_created": alerts_result['total_alerts'],
+                    "forecast_failures": prediction_service.forecast_failures,
+                }
+            )
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Forecast job {job_id} failed: {e}")
+            traceback.print_exc()
+            self._update_job(
+                job_id,
+                status=JobStatus.failed,
+                stage_timings=dict(timings),
+                error=str(e),
+                finished_at=datetime.now(timezone.utc)
+            )
+        finally:
+            db.close()
+
+    @staticmethod
+    def fail_interrupted_jobs(db: Session, lease_seconds: float = settings.JOB_LEASE_SECONDS) -> int:
+        """
+        Mark queued/running jobs whose process is gone as failed, and
+        rebuild the feature store rows of medicines whose uploaded weeks
+        those jobs never applied.
+
+        A job's owner is checked directly when it ran on this host; jobs
+        of other hosts (or without an owner) are taken as interrupted once
+        their last heartbeat is older than `lease_seconds`. Jobs of other
+        live API workers sharing the table are left alone.
+        """
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=lease_seconds)
+        pending = set()
+        count = 0
+        for job_id, owner, heartbeat_at, created_at, medicine_ids in db.query(
+            ForecastJob.job_id, ForecastJob.owner, ForecastJob.heartbeat_at,
+            ForecastJob.created_at, ForecastJob.feature_medicine_ids
+        ).filter(ForecastJob.status.in_(ACTIVE_STATUSES)).all():
+            alive = owner_alive(owner)
+            if alive is None:
+                alive = (heartbeat_at or created_at).replace(tzinfo=None) >= cutoff
+            if alive:
+                continue
+
+            # Conditional on the status, so concurrent reapers fail a job once
+            failed = db.query(ForecastJob).filter(
+                ForecastJob.job_id == job_id,
+                ForecastJob.status.in_(ACTIVE_STATUSES)
+            ).update({
+                ForecastJob.status: JobStatus.failed,
+                ForecastJob.error: "Interrupted: the process running it stopped",
+                ForecastJob.feature_medicine_ids: None,
+                ForecastJob.finished_at: datetime.now(timezone.utc)
+            }, synchronize_session=False)
+            count += failed
+            if failed and medicine_ids:
+                pending.update(medicine_ids)
+
+        if pending:
+            from app.services.feature_store import FeatureStore
+            FeatureStore.backfill(db, sorted(pending))
+        db.commit()
+        return count
+
+    def shutdown(self):
+        self._stopped.set()
+        self.executor.shutdown(wait=True)
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Process-wide job runner, created on first use"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -0,0 +1,83 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import desc, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import LatestPrediction, Prediction
+
+
+LATEST_COLUMNS = ['medicine_id', 'prediction_id', 'predicted_demand', 'reorder_level', 'prediction_date']
+
+
+class LatestPredictions:
+    """
+    Maintains `latest_predictions`: each medicine's newest prediction.
+
+    Read paths join it on the medicine primary key instead of rebuilding a
+    max(prediction_date) subquery over the predictions history (and
+    deduplicating rows that tie on the date). Every write to `predictions`
+    replaces the medicine's row in the same transaction.
+    """
+
+    @staticmethod
+    def upsert(db: Session, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Make `rows` (predictions column values, including prediction_id)
+        the latest rows of their medicines. The caller commits.
+        """
+        rows = {
+            row['medicine_id']: {column: row[column] for column in LATEST_COLUMNS}
+            for row in rows
+        }
+        if not rows:
+            return 0
+
+        db.query(LatestPrediction).filter(
+            LatestPrediction.medicine_id.in_(list(rows))
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(LatestPrediction, list(rows.values()))
+        return len(rows)
+
+    @staticmethod
+    def backfill(db: Session, medicine_ids: Optional[List[int]] = None) -> int:
+        """
+        Rebuild the table from the predictions history in one
+        INSERT ... SELECT: the newest date per medicine, the highest id on
+        ties. Returns the number of rows written. The caller commits.
+        """
+        db.flush()
+        rank = func.row_number().over(
+            partition_by=Prediction.medicine_id,
+            order_by=(desc(Prediction.prediction_date), desc(Prediction.prediction_id))
+        ).label('rank')
+        ranked = select(
+            Prediction.medicine_id,
+            Prediction.prediction_id,
+            Prediction.predicted_demand,
+            Prediction.reorder_level,
+            Prediction.prediction_date,
+            rank
+        )
+        delete = db.query(LatestPrediction)
+        if medicine_ids is not None:
+            ranked = ranked.where(Prediction.medicine_id.in_(medicine_ids))
+            delete = delete.filter(LatestPrediction.medicine_id.in_(medicine_ids))
+        delete.delete(synchronize_session=False)
+
+        ranked = ranked.subquery()
+        result = db.execute(insert(LatestPrediction).from_select(
+            LATEST_COLUMNS,
+            select(*(ranked.c[c] for c in LATEST_COLUMNS)).where(ranked.c.rank == 1)
+        ))
+        return result.rowcount
+
+    @staticmethod
+    def backfill_if_empty(db: Session) -> int:
+        """Fill the table once for databases that have predictions from before it existed"""
+        if db.query(LatestPrediction.medicine_id).first() is not None:
+            return 0
+        if db.query(Prediction.prediction_id).first() is None:
+            return 0
+        written = LatestPredictions.backfill(db)
+        db.commit()
+        return written
@@ -0,0 +1,205 @@
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+def architecture_signature(model) -> Tuple:
+    """
+    Hashable description of a Keras model's layer stack.
+
+    Models with the same signature accept the same input shape and can be
+    traced into one graph together.
+    """
+    layers = []
+    for layer in model.layers:
+        config = layer.get_config()
+        layers.append((
+            layer.__class__.__name__,
+            config.get('units'),
+            config.get('activation'),
+            config.get('recurrent_activation'),
+            config.get('return_sequences'),
+        ))
+    return (tuple(model.input_shape[1:]), tuple(layers))
+
+
+def _tf_activations():
+    import tensorflow as tf
+
+    return {
+        'linear': lambda x: x,
+        None: lambda x: x,
+        'relu': tf.nn.relu,
+        'tanh': tf.tanh,
+        'sigmoid': tf.sigmoid,
+        # Keras 3 definition: relu6(x + 3) / 6
+        'hard_sigmoid': lambda x: tf.clip_by_value(x / 6.0 + 0.5, 0.0, 1.0),
+    }
+
+
+def tf_forward(layers: List[Dict[str, Any]], weights: List[Dict[str, Any]], x):
+    """
+    TensorFlow version of `lstm_numpy.forward`: `n` models of one
+    architecture evaluated together from weights stacked on a leading
+    model axis, `x` shaped (n, batch, time_steps, features). The number of
+    time steps must be static.
+    """
+    import tensorflow as tf
+
+    activations = _tf_activations()
+    for spec, w in zip(layers, weights):
+        if spec['type'] == 'LSTM':
+            units = spec['units']
+            activation = activations[spec['activation']]
+            recurrent_activation = activations[spec['recurrent_activation']]
+            n, batch = tf.shape(x)[0], tf.shape(x)[1]
+            steps = x.shape[2]
+            h = tf.zeros(tf.stack([n, batch, units]), dtype=x.dtype)
+            c = tf.zeros_like(h)
+            # Input projection for all time steps in one matmul
+            projected = tf.matmul(tf.reshape(x, tf.stack([n, batch * steps, -1])), w['kernel'])
+            projected = tf.reshape(projected, tf.stack([n, batch, steps, 4 * units]))
+            projected += w['bias'][:, None, None, :]
+            outputs = []
+            for t in range(steps):
+                z = projected[:, :, t, :] + tf.matmul(h, w['recurrent_kernel'])
+                i = recurrent_activation(z[..., :units])
+                f = recurrent_activation(z[..., units:2 * units])
+                g = activation(z[..., 2 * units:3 * units])
+                o = recurrent_activation(z[..., 3 * units:])
+                c = f * c + i * g
+                h = o * activation(c)
+                if spec['return_sequences']:
+                    outputs.append(h)
+            x = tf.stack(outputs, axis=2) if spec['return_sequences'] else h
+        elif spec['type'] == 'Dense':
+            x = activations[spec['activation']](tf.matmul(x, w['kernel']) + w['bias'][:, None, :])
+        else:
+            raise ValueError(f"Unsupported layer type: {spec['type']}")
+    return x
+
+
+class LSTMBatchRunner:
+    """
+    Runs many LSTM models with a single graph dispatch per architecture.
+
+    Keras `predict` pays a fixed cost per call (dataset construction,
+    callbacks, graph dispatch). Here each Keras model's LSTM/Dense weights
+    are extracted once (`export_keras_lstm`) and every model of an
+    architecture runs in one `tf.function`, traced once per
+    `architecture_signature` with the stacked weights and windows passed
+    in as tensors. Which medicines are in a call, and in what order, does
+    not cause retracing. Models with layers the export does not cover run
+    through their own `tf.function`, traced once per model.
+    """
+
+    def __init__(self, max_functions: int = 16):
+        from app.services.lstm_numpy import NumpyLSTMRunner
+
+        self.max_functions = max_functions
+        self._functions: "OrderedDict[Tuple, Any]" = OrderedDict()
+        # Per Keras model: its exported weights, or None when unsupported;
+        # dropped with the model when the registry evicts or reloads it
+        self._exported: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+        self._model_functions: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+        # Stacks the exported weights per group, cached like the NumPy runner's
+        self._stacker = NumpyLSTMRunner(max_groups=max_functions)
+        self._lock = threading.Lock()
+
+    def _export(self, model):
+        from app.services.lstm_numpy import export_keras_lstm
+
+        with self._lock:
+            if model in self._exported:
+                return self._exported[model]
+        try:
+            exported = export_keras_lstm(model)
+            if any(dim is None for dim in exported.input_shape):
+                exported = None
+        except ValueError:
+            exported = None
+        with self._lock:
+            self._exported[model] = exported
+        return exported
+
+    def _group_function(self, signature: Tuple, layers: List[Dict[str, Any]], weights: List[Dict[str, np.ndarray]]):
+        import tensorflow as tf
+
+        with self._lock:
+            fn = self._functions.get(signature)
+            if fn is not None:
+                self._functions.move_to_end(signature)
+                return fn
+
+        time_steps, features = signature[0]
+        input_signature = [
+            [{name: tf.TensorSpec((None,) + value.shape[1:], tf.float32) for name, value in w.items()}
+             for w in weights],
+            tf.TensorSpec((None, None, time_steps, features), tf.float32),
+        ]
+
+        @tf.function(input_signature=input_signature)
+        def run(stacked, x):
+            return tf_forward(layers, stacked, x)
+
+        with self._lock:
+            self._functions[signature] = run
+            while len(self._functions) > self.max_functions:
+                self._functions.popitem(last=False)
+        return run
+
+    def _model_function(self, model):
+        import tensorflow as tf
+
+        with self._lock:
+            fn = self._model_functions.get(model)
+        if fn is None:
+            fn = tf.function(lambda x: model(x, training=False), reduce_retracing=True)
+            with self._lock:
+                self._model_functions[model] = fn
+        return fn
+
+    def predict(self, models: Dict[str, Any], windows: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Evaluate each model on its own windows.
+
+        `windows[name]` has shape (batch, time_steps, features); the result
+        for each name is a 1-D array of length batch.
+        """
+        groups: Dict[Tuple, List[str]] = {}
+        unsupported: List[str] = []
+        for name in windows:
+            if self._export(models[name]) is None:
+                unsupported.append(name)
+                continue
+            key = (architecture_signature(models[name]), np.shape(windows[name])[0])
+            groups.setdefault(key, []).append(name)
+
+        outputs: Dict[str, np.ndarray] = {}
+        for (signature, _), names in groups.items():
+            exported = tuple(self._export(models[n]) for n in names)
+            stacked = self._stacker._stacked_weights(exported)
+            x = np.stack([np.asarray(windows[n], dtype=np.float32) for n in names])
+            result = np.asarray(self._group_function(signature, exported[0].layers, stacked)(stacked, x))
+            for name, values in zip(names, result):
+                outputs[name] = values[:, 0]
+
+        for name in unsupported:
+            x = np.asarray(windows[name], dtype=np.float32)
+            outputs[name] = np.asarray(self._model_function(models[name])(x)).reshape(len(x), -1)[:, 0]
+        return outputs
+
+
+def minmax_params(data_min: np.ndarray, data_max: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-SKU (scale, offset) matching sklearn's MinMaxScaler with feature_range=(0, 1)"""
+    data_range = data_max - data_min
+    data_range = np.where(data_range == 0, 1.0, data_range)
+    scale = 1.0 / data_range
+    offset = -data_min * scale
+    return scale, offset
+
+
+lstm_batch_runner = LSTMBatchRunner()
@@ -0,0 +1,250 @@
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+# Layers without weights that are identity functions at inference time
+PASSTHROUGH_LAYERS = ('Dropout', 'InputLayer', 'GaussianNoise', 'GaussianDropout', 'SpatialDropout1D')
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _hard_sigmoid(x):
+    # Keras 3 definition: relu6(x + 3) / 6
+    return np.clip(x / 6.0 + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    None: lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+}
+
+
+class NumpyLSTMModel:
+    """
+    Inference-only LSTM/Dense stack evaluated with NumPy.
+
+    Holds the weights exported from a Keras model by `export_keras_lstm`
+    and reproduces its forward pass (gate order i, f, c, o as in Keras),
+    so serving does not need TensorFlow.
+    """
+
+    def __init__(self, input_shape: Tuple[int, ...], layers: List[Dict[str, Any]], weights: List[Dict[str, np.ndarray]]):
+        self.input_shape = tuple(input_shape)
+        self.layers = layers
+        self.weights = weights
+        for spec in layers:
+            for key in ('activation', 'recurrent_activation'):
+                if key in spec and spec[key] not in ACTIVATIONS:
+                    raise ValueError(f"Unsupported activation: {spec[key]}")
+
+    def signature(self) -> Tuple:
+        """Hashable description of the layer stack; equal signatures can be stacked"""
+        return (self.input_shape, tuple(
+            (spec['type'], spec['units'], spec.get('activation'),
+             spec.get('recurrent_activation'), spec.get('return_sequences'))
+            for spec in self.layers
+        ))
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """(batch, time_steps, features) -> (batch, outputs)"""
+        return forward(self.layers, [{k: v[None] for k, v in w.items()} for w in self.weights],
+                       np.asarray(x, dtype=np.float32)[None])[0]
+
+    def save(self, path: str):
+        """Write the model as a compressed .npz atomically"""
+        arrays = {
+            f"{i}_{name}": value
+            for i, layer_weights in enumerate(self.weights)
+            for name, value in layer_weights.items()
+        }
+        spec = json.dumps({
+            'format_version': FORMAT_VERSION,
+            'input_shape': list(self.input_shape),
+            'layers': self.layers,
+        })
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, spec=np.array(spec), **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyLSTMModel":
+        with np.load(path, allow_pickle=False) as data:
+            spec = json.loads(str(data['spec']))
+            if spec.get('format_version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported LSTM export format: {spec.get('format_version')}")
+            weights = []
+            for i in range(len(spec['layers'])):
+                prefix = f"{i}_"
+                weights.append({
+                    key[len(prefix):]: data[key].astype(np.float32)
+                    for key in data.files if key.startswith(prefix)
+                })
+        return cls(spec['input_shape'], spec['layers'], weights)
+
+
+def forward(layers: List[Dict[str, Any]], weights: List[Dict[str, np.ndarray]], x: np.ndarray) -> np.ndarray:
+    """
+    Forward pass for `n` models of one architecture at once.
+
+    `weights` hold each layer's arrays stacked on a leading model axis and
+    `x` has shape (n, batch, time_steps, features); every time step is one
+    batched matmul over all models.
+    """
+    for spec, w in zip(layers, weights):
+        if spec['type'] == 'LSTM':
+            units = spec['units']
+            activation = ACTIVATIONS[spec['activation']]
+            recurrent_activation = ACTIVATIONS[spec['recurrent_activation']]
+            n, batch, steps, _ = x.shape
+            h = np.zeros((n, batch, units), dtype=np.float32)
+            c = np.zeros((n, batch, units), dtype=np.float32)
+            # Input projection for all time steps in one matmul
+            projected = np.matmul(x.reshape(n, batch * steps, -1), w['kernel']).reshape(n, batch, steps, 4 * units)
+            projected += w['bias'][:, None, None, :]
+            outputs = []
+            for t in range(steps):
+                z = projected[:, :, t, :] + np.matmul(h, w['recurrent_kernel'])
+                i = recurrent_activation(z[..., :units])
+                f = recurrent_activation(z[..., units:2 * units])
+                g = activation(z[..., 2 * units:3 * units])
+                o = recurrent_activation(z[..., 3 * units:])
+                c = f * c + i * g
+                h = o * activation(c)
+                if spec['return_sequences']:
+                    outputs.append(h)
+            x = np.stack(outputs, axis=2) if spec['return_sequences'] else h
+        elif spec['type'] == 'Dense':
+            x = ACTIVATIONS[spec['activation']](np.matmul(x, w['kernel']) + w['bias'][:, None, :])
+        else:
+            raise ValueError(f"Unsupported layer type: {spec['type']}")
+    return x
+
+
+class NumpyLSTMRunner:
+    """
+    Batched NumPy inference for many LSTM models.
+
+    Models sharing an architecture have their weights stacked once (cached
+    per group) and are evaluated together, one matmul per layer and time
+    step for the whole group. Same interface as `LSTMBatchRunner`.
+
+    A cache entry holds the model objects it was stacked from and is only
+    reused for those same objects, so a model the registry reloads or
+    evicts (whose id a new model may then get) is never served stale
+    weights.
+    """
+
+    def __init__(self, max_groups: int = 16):
+        self.max_groups = max_groups
+        self._stacked: "OrderedDict[Tuple[int, ...], Tuple[Tuple[NumpyLSTMModel, ...], List[Dict[str, np.ndarray]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _stacked_weights(self, models: Tuple[NumpyLSTMModel, ...]):
+        key = tuple(id(m) for m in models)
+        with self._lock:
+            entry = self._stacked.get(key)
+            if entry is not None and all(a is b for a, b in zip(entry[0], models)):
+                self._stacked.move_to_end(key)
+                return entry[1]
+
+        stacked = [
+            {name: np.stack([m.weights[i][name] for m in models]) for name in models[0].weights[i]}
+            for i in range(len(models[0].layers))
+        ]
+        with self._lock:
+            self._stacked[key] = (models, stacked)
+            while len(self._stacked) > self.max_groups:
+                self._stacked.popitem(last=False)
+        return stacked
+
+    def predict(self, models: Dict[str, NumpyLSTMModel], windows: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Evaluate each model on its own windows.
+
+        `windows[name]` has shape (batch, time_steps, features); the result
+        for each name is a 1-D array of length batch.
+        """
+        groups: Dict[Tuple, List[str]] = {}
+        for name in windows:
+            key = (models[name].signature(), np.shape(windows[name])[0])
+            groups.setdefault(key, []).append(name)
+
+        outputs: Dict[str, np.ndarray] = {}
+        for names in groups.values():
+            group_models = tuple(models[n] for n in names)
+            x = np.stack([np.asarray(windows[n], dtype=np.float32) for n in names])
+            result = forward(group_models[0].layers, self._stacked_weights(group_models), x)
+            for name, values in zip(names, result):
+                outputs[name] = values[:, 0]
+        return outputs
+
+
+def export_keras_lstm(model) -> NumpyLSTMModel:
+    """Extract the LSTM/Dense weights of a loaded Keras model"""
+    layers, weights = [], []
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        config = layer.get_config()
+        if kind in PASSTHROUGH_LAYERS:
+            continue
+        if kind == 'LSTM':
+            if config.get('go_backwards') or config.get('stateful'):
+                raise ValueError(f"Unsupported LSTM option in layer '{layer.name}'")
+            kernel, recurrent_kernel, *bias = layer.get_weights()
+            units = config['units']
+            layers.append({
+                'type': 'LSTM',
+                'units': units,
+                'activation': config['activation'],
+                'recurrent_activation': config['recurrent_activation'],
+                'return_sequences': bool(config['return_sequences']),
+            })
+            weights.append({
+                'kernel': kernel,
+                'recurrent_kernel': recurrent_kernel,
+                'bias': bias[0] if bias else np.zeros(4 * units, dtype=np.float32),
+            })
+        elif kind == 'Dense':
+            kernel, *bias = layer.get_weights()
+            layers.append({'type': 'Dense', 'units': config['units'], 'activation': config['activation']})
+            weights.append({
+                'kernel': kernel,
+                'bias': bias[0] if bias else np.zeros(config['units'], dtype=np.float32),
+            })
+        else:
+            raise ValueError(f"Unsupported layer type for NumPy export: {kind}")
+
+    weights = [{k: np.asarray(v, dtype=np.float32) for k, v in w.items()} for w in weights]
+    return NumpyLSTMModel(model.input_shape[1:], layers, weights)
+
+
+def parity_error(keras_model, numpy_model: NumpyLSTMModel, samples: int = 256, seed: int = 0) -> float:
+    """Max absolute difference between Keras and NumPy outputs on random scaled windows"""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0.0, 1.0, (samples,) + numpy_model.input_shape).astype(np.float32)
+    expected = np.asarray(keras_model(x, training=False))
+    return float(np.max(np.abs(expected - numpy_model.predict(x))))
+
+
+numpy_lstm_runner = NumpyLSTMRunner()
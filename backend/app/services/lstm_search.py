@@ -0,0 +1,237 @@
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.preprocessing import atomic_write
+from app.services.training import (
+    LSTM_PARAMS,
+    MIN_TRAINING_WEEKS,
+    _cap_tensorflow_threads,
+    _init_training_worker,
+    lstm_trial,
+)
+
+
+# The grid of DemandForecast/scripts/lstm local.py; epochs are the
+# successive-halving budget instead of a searched value
+SEARCH_SPACE = {
+    'dropout': [0.0, 0.1, 0.2, 0.3, 0.4, 0.5],
+    'activation': ['relu', 'tanh', 'sigmoid', 'hard_sigmoid'],
+    'batch_size': [8, 16, 32, 48],
+    'optimizer': ['Adagrad', 'Adadelta', 'Adam', 'Adamax', 'Nadam'],
+}
+
+TRIALS_FILE = 'lstm_search_trials.jsonl'
+BEST_CONFIG_FILE = 'lstm_{name}.search.json'
+BEST_CONFIG_FORMAT_VERSION = 1
+
+
+def search_configs(n_configs: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`n_configs` distinct configs sampled from SEARCH_SPACE, or all of them"""
+    keys = list(SEARCH_SPACE)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    if n_configs >= len(grid):
+        return grid
+    return random.Random(seed).sample(grid, n_configs)
+
+
+def rung_budgets(min_epochs: int, max_epochs: int, eta: int) -> List[int]:
+    """Epoch budget of each rung: min_epochs * eta**k, the last one capped at max_epochs"""
+    budgets = [min_epochs]
+    while budgets[-1] < max_epochs:
+        budgets.append(min(budgets[-1] * eta, max_epochs))
+    return budgets
+
+
+def trial_key(quantities: np.ndarray, config: Dict[str, Any], epochs: int, seed: int) -> str:
+    """Digest of everything a trial's result depends on"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(quantities, dtype=float).tobytes())
+    digest.update(json.dumps({**LSTM_PARAMS, **config, 'epochs': epochs, 'seed': seed},
+                             sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class TrialCache:
+    """
+    Append-only journal of finished trials, keyed by `trial_key`.
+
+    A search run again (after an interruption, with more configs or a
+    larger budget) only trains trials whose series, config or budget is
+    not in the journal yet. A partly written last line is ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.results: Dict[str, Optional[float]] = {}
+        partial = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f.read().splitlines():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        partial = True
+                        continue
+                    partial = False
+                    self.results[record['key']] = record.get('val_mae')
+        self._file = open(path, 'a', encoding='utf-8')
+        if partial:
+            self._file.write('\n')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.results
+
+    def score(self, key: str) -> float:
+        """Validation MAE of a finished trial; inf for failed or diverged ones"""
+        value = self.results[key]
+        return float('inf') if value is None else value
+
+    def record(self, key: str, medicine_name: str, config: Dict[str, Any], epochs: int, result: Dict[str, Any]):
+        self.results[key] = result.get('val_mae')
+        self._file.write(json.dumps({'key': key, 'medicine': medicine_name, 'config': config,
+                                     'epochs': epochs, **result}) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def _trial_task(quantities: np.ndarray, config: Dict[str, Any], epochs: int, seed: int) -> Dict[str, Any]:
+    from app.services import training
+
+    try:
+        _cap_tensorflow_threads(training._worker_threads)
+        val_mae = lstm_trial(quantities, config, epochs, seed)
+    except Exception as e:
+        return {'val_mae': None, 'error': f"{type(e).__name__}: {e}"}
+    # A diverged trial scores inf rather than NaN so it sorts last
+    return {'val_mae': round(val_mae, 4) if math.isfinite(val_mae) else None}
+
+
+def _run_trials(trials: List[Tuple[str, str, np.ndarray, Dict[str, Any], int]], cache: TrialCache, seed: int,
+                executor: Optional[ProcessPoolExecutor], workers: int):
+    """Train (key, medicine, quantities, config, epochs) trials and journal each result as it arrives"""
+    if executor is None:
+        for key, name, quantities, config, epochs in trials:
+            cache.record(key, name, config, epochs, _trial_task(quantities, config, epochs, seed))
+        return
+
+    queue = iter(trials)
+    running = {}
+    while True:
+        for key, name, quantities, config, epochs in queue:
+            running[executor.submit(_trial_task, quantities, config, epochs, seed)] = (key, name, config, epochs)
+            if len(running) >= workers * 4:
+                break
+        if not running:
+            break
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            key, name, config, epochs = running.pop(future)
+            cache.record(key, name, config, epochs, future.result())
+
+
+def successive_halving(series: Dict[str, np.ndarray], cache: TrialCache, n_configs: int = 81, eta: int = 3,
+                       min_epochs: int = 10, max_epochs: int = 250, seed: int = 0, workers: int = 1,
+                       threads_per_worker: int = 1,
+                       on_rung: Optional[Callable[[int, int, int, int], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Search LSTM configs per medicine by successive halving over epochs.
+
+    Every medicine starts with the same `n_configs` sampled configs
+    trained for `min_epochs`; after each rung the best 1/eta by validation
+    MAE (last VALIDATION_WEEKS weeks) move on with eta times the epochs,
+    up to `max_epochs`. All medicines' trials of a rung run together in
+    `workers` processes, and trials already in `cache` are not retrained.
+
+    Returns {medicine_name: best config document} (see
+    `save_best_config`); medicines with too little history are left out.
+    """
+    configs = search_configs(n_configs, seed)
+    budgets = rung_budgets(min_epochs, max_epochs, eta)
+    alive = {name: list(range(len(configs))) for name, q in series.items() if len(q) >= MIN_TRAINING_WEEKS}
+    history = {name: [] for name in alive}
+
+    # One pool for every rung, so workers import TensorFlow once; fork
+    # would copy a possibly initialized TensorFlow runtime
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_training_worker, initargs=(threads_per_worker,))
+    else:
+        _init_training_worker(threads_per_worker)
+
+    try:
+        for rung, epochs in enumerate(budgets):
+            keys = {(name, i): trial_key(series[name], configs[i], epochs, seed)
+                    for name, survivors in alive.items() for i in survivors}
+            pending = [(key, name, series[name], configs[i], epochs)
+                       for (name, i), key in keys.items() if key not in cache]
+            _run_trials(pending, cache, seed, executor, workers)
+            if on_rung:
+                on_rung(rung, epochs, len(keys), len(pending))
+
+            for name, survivors in alive.items():
+                ranked = sorted(survivors, key=lambda i: cache.score(keys[(name, i)]))
+                history[name].append({'epochs': epochs, 'trials': len(ranked),
+                                      'best_val_mae': cache.score(keys[(name, ranked[0])])})
+                last = rung == len(budgets) - 1
+                alive[name] = ranked[:1] if last else ranked[:max(1, len(ranked) // eta)]
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    search = {'n_configs': len(configs), 'eta': eta, 'min_epochs': min_epochs, 'max_epochs': max_epochs,
+              'seed': seed}
+    best = {}
+    for name, (i,) in alive.items():
+        val_mae = cache.score(keys[(name, i)])
+        best[name] = {
+            'format_version': BEST_CONFIG_FORMAT_VERSION,
+            'medicine_name': name,
+            'params': {**configs[i], 'epochs': budgets[-1]},
+            'val_mae': val_mae if math.isfinite(val_mae) else None,
+            'rungs': history[name],
+            'search': search,
+        }
+    return best
+
+
+def best_config_path(model_dir: str, medicine_name: str) -> str:
+    return os.path.join(model_dir, BEST_CONFIG_FILE.format(name=medicine_name))
+
+
+def save_best_config(model_dir: str, document: Dict[str, Any]) -> str:
+    """Write a medicine's best config next to its model, atomically"""
+    path = best_config_path(model_dir, document['medicine_name'])
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(document, f, indent=2)
+
+    atomic_write(path, write)
+    return path
+
+
+def load_best_config(model_dir: str, medicine_name: str) -> Optional[Dict[str, Any]]:
+    """LSTM params found by the search for a medicine, or None when it was not searched"""
+    path = best_config_path(model_dir, medicine_name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        document = json.load(f)
+    if document.get('format_version') != BEST_CONFIG_FORMAT_VERSION:
+        raise ValueError(f"Unsupported LSTM search result format: {document.get('format_version')}")
+    if document.get('val_mae') is None:
+        return None
+    return document['params']
@@ -0,0 +1,302 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+
+
+# File name patterns of the saved models, per family
+MODEL_FILE_PATTERNS = {
+    'xgboost': 'xgboost_{name}.json',
+    'lstm': 'lstm_{name}.keras',
+    'xgboost_global': 'xgboost_global.json',
+    'sarimax': 'sarimax_{name}.json',
+}
+
+# One pooled XGBoost model serving many medicines, with its per-medicine
+# encodings next to it (see global_model.py)
+GLOBAL_MODEL_FAMILY = 'xgboost_global'
+GLOBAL_ENCODINGS_SUFFIX = '.encodings.json'
+
+# Other files a family's model may be saved as (e.g. exported LSTM weights)
+ALTERNATE_FILE_PATTERNS = {
+    'lstm': ['lstm_{name}.npz'],
+}
+
+MANIFEST_FILE = 'model_manifest.json'
+
+
+class ModelEntry(NamedTuple):
+    medicine_name: str
+    family: str
+    path: str
+    version: str
+    medicine_id: Optional[int] = None
+    preprocessing: Optional[str] = None
+
+
+def global_encodings_path(model_path: str) -> str:
+    """Encodings file stored next to a global model"""
+    return os.path.splitext(model_path)[0] + GLOBAL_ENCODINGS_SUFFIX
+
+
+def _file_version(path: str) -> str:
+    try:
+        return str(int(os.path.getmtime(path)))
+    except OSError:
+        return 'missing'
+
+
+class ModelManifest:
+    """
+    Index of which model serves which medicine.
+
+    Read from `model_manifest.json` in the model directory when present,
+    otherwise discovered from the model file names. The index is a dict,
+    so routing a medicine is a single lookup; the source is re-checked at
+    most every `revalidate_seconds` and re-indexed only when its mtime
+    changes, so new models are picked up without a restart.
+
+    Manifest format:
+        {"models": [{"medicine_name": "...", "family": "xgboost",
+                     "path": "xgboost_....json", "version": "3",
+                     "medicine_id": 12, "preprocessing": "..."}]}
+    `path` and `preprocessing` are relative to the model directory;
+    everything but `medicine_name` and `family` is optional. Entries
+    without them (or of an unknown family) are skipped with a warning; a
+    manifest that can't be read keeps the previous index in place.
+
+    Medicines served by the global model ("xgboost_global" family) share
+    one model file; its encodings file takes the place of the
+    preprocessing artifact. When discovering, the global model serves the
+    medicines listed in its encodings, per XGB_GLOBAL_MODEL_MODE.
+    """
+
+    def __init__(self, model_dir: str = settings.MODEL_DIR,
+                 revalidate_seconds: float = settings.MODEL_CACHE_REVALIDATE_SECONDS):
+        self.model_dir = model_dir
+        self.revalidate_seconds = revalidate_seconds
+        self.manifest_path = os.path.join(model_dir, MANIFEST_FILE)
+
+        self._by_name: Dict[str, ModelEntry] = {}
+        self._by_id: Dict[int, ModelEntry] = {}
+        self._source: Optional[str] = None
+        self._signature = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        if os.path.exists(self.manifest_path):
+            return ('manifest', os.stat(self.manifest_path).st_mtime_ns)
+        if os.path.isdir(self.model_dir):
+            return ('discovered', os.stat(self.model_dir).st_mtime_ns)
+        return ('missing', None)
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.revalidate_seconds:
+                return
+            self._checked_at = now
+
+            signature = self._current_signature()
+            if signature == self._signature:
+                return
+
+            if signature[0] == 'manifest':
+                entries = self._read_manifest()
+                if entries is None:
+                    # Keep routing with the previous index until the file is fixed
+                    self._signature = signature
+                    return
+            elif signature[0] == 'discovered':
+                entries = self._discover()
+            else:
+                print(f"⚠️ Model directory not found: {self.model_dir}")
+                entries = []
+
+            self._by_name = {}
+            for entry in entries:
+                if entry.medicine_name in self._by_name:
+                    print(f"⚠️ '{entry.medicine_name}' has more than one model, "
+                          f"using {self._by_name[entry.medicine_name].family}")
+                    continue
+                self._by_name[entry.medicine_name] = entry
+            self._by_id = {e.medicine_id: e for e in self._by_name.values() if e.medicine_id is not None}
+            self._source = signature[0]
+            self._signature = signature
+
+    def _read_manifest(self) -> Optional[List[ModelEntry]]:
+        """Entries of the manifest file, skipping invalid ones; None if the file can't be read"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            items = data.get('models', [])
+            if not isinstance(items, list):
+                raise ValueError("'models' is not a list")
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ Could not read model manifest {self.manifest_path}: {e}")
+            return None
+
+        entries = []
+        for item in items:
+            if not isinstance(item, dict) or not item.get('family') or not isinstance(item.get('medicine_name'), str):
+                print(f"⚠️ Manifest entry without a family or medicine_name skipped: {item!r}")
+                continue
+            family = item['family']
+            if family not in MODEL_FILE_PATTERNS:
+                print(f"⚠️ Unknown model family '{family}' for '{item.get('medicine_name')}' in manifest")
+                continue
+            if family == GLOBAL_MODEL_FAMILY and settings.XGB_GLOBAL_MODEL_MODE == 'off':
+                continue
+            name = item['medicine_name']
+            path = os.path.join(self.model_dir, item.get('path') or MODEL_FILE_PATTERNS[family].format(name=name))
+            preprocessing = item.get('preprocessing')
+            if preprocessing:
+                preprocessing = os.path.join(self.model_dir, preprocessing)
+            elif family == GLOBAL_MODEL_FAMILY:
+                preprocessing = global_encodings_path(path)
+            entries.append(ModelEntry(
+                medicine_name=name,
+                family=family,
+                path=path,
+                version=str(item['version']) if item.get('version') is not None else _file_version(path),
+                medicine_id=item.get('medicine_id'),
+                preprocessing=preprocessing,
+            ))
+        return entries
+
+    def _discover(self) -> List[ModelEntry]:
+        entries = []
+        with os.scandir(self.model_dir) as it:
+            files = sorted(e.name for e in it if e.is_file())
+        global_path = os.path.join(self.model_dir, MODEL_FILE_PATTERNS[GLOBAL_MODEL_FAMILY])
+        global_files = {os.path.basename(global_path), os.path.basename(global_encodings_path(global_path))}
+        for family, pattern in MODEL_FILE_PATTERNS.items():
+            if family == GLOBAL_MODEL_FAMILY:
+                continue
+            found = set()
+            for family_pattern in [pattern] + ALTERNATE_FILE_PATTERNS.get(family, []):
+                prefix, suffix = family_pattern.split('{name}')
+                for file_name in files:
+                    if not (file_name.startswith(prefix) and file_name.endswith(suffix)) or file_name in global_files:
+                        continue
+                    name = file_name[len(prefix):len(file_name) - len(suffix)]
+                    # Preprocessing artifacts share the prefix
+                    if not name or name.endswith('.preprocess') or name in found:
+                        continue
+                    found.add(name)
+                    path = os.path.join(self.model_dir, file_name)
+                    entries.append(ModelEntry(name, family, path, _file_version(path)))
+        return self._discover_global(entries, global_path, set(files))
+
+    def _discover_global(self, entries: List[ModelEntry], global_path: str, files) -> List[ModelEntry]:
+        """Add the global model's medicines to discovered per-medicine entries"""
+        encodings_path = global_encodings_path(global_path)
+        mode = settings.XGB_GLOBAL_MODEL_MODE
+        if mode == 'off' or not {os.path.basename(global_path), os.path.basename(encodings_path)} <= files:
+            return entries
+
+        try:
+            with open(encodings_path, 'r', encoding='utf-8') as f:
+                names = list(json.load(f)['medicines'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not read global model encodings {encodings_path}: {e}")
+            return entries
+
+        version = _file_version(global_path)
+        served = [ModelEntry(name, GLOBAL_MODEL_FAMILY, global_path, version, preprocessing=encodings_path)
+                  for name in names]
+        if mode == 'prefer':
+            covered = set(names)
+            return served + [e for e in entries if e.medicine_name not in covered]
+        own = {e.medicine_name for e in entries}
+        return entries + [e for e in served if e.medicine_name not in own]
+
+    def get(self, medicine_name: str) -> Optional[ModelEntry]:
+        """Model entry of a medicine, or None if no model serves it"""
+        self._refresh()
+        return self._by_name.get(medicine_name)
+
+    def get_by_id(self, medicine_id: int) -> Optional[ModelEntry]:
+        """Model entry by medicine_id (only for manifest entries that declare one)"""
+        self._refresh()
+        return self._by_id.get(medicine_id)
+
+    def family(self, medicine_name: str) -> Optional[str]:
+        entry = self.get(medicine_name)
+        return entry.family if entry else None
+
+    def medicines(self, family: str) -> List[str]:
+        """Medicine names served by a model family, in manifest order"""
+        self._refresh()
+        return [name for name, entry in self._by_name.items() if entry.family == family]
+
+    def file_path(self, model_type: str, medicine_name: str) -> Optional[str]:
+        """
+        Path the manifest assigns to a model or preprocessing file,
+        or None to use the default file name
+        """
+        entry = self.get(medicine_name)
+        if entry is None:
+            return None
+        if model_type == entry.family:
+            return entry.path
+        if model_type == f"{entry.family}_preprocessing":
+            return entry.preprocessing
+        return None
+
+    def describe(self) -> Dict[str, Any]:
+        self._refresh()
+        return {
+            'model_dir': self.model_dir,
+            'source': self._source,
+            'total_models': len(self._by_name),
+            'models': [entry._asdict() for entry in self._by_name.values()],
+        }
+
+
+def upsert_manifest_entries(model_dir: str, entries: List[Dict[str, Any]]) -> bool:
+    """
+    Add or replace entries (by medicine_name) in the model directory's
+    manifest file, written atomically. Returns False when the directory
+    has no manifest file (models are then discovered from file names).
+    """
+    path = os.path.join(model_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return False
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    updated = {e['medicine_name'] for e in entries}
+    data['models'] = [m for m in data.get('models', []) if m['medicine_name'] not in updated] + list(entries)
+
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+_manifests: Dict[str, ModelManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_model_manifest(model_dir: Optional[str] = None) -> ModelManifest:
+    """Return the shared manifest for a model directory, creating it on first use"""
+    model_dir = model_dir or settings.MODEL_DIR
+    key = os.path.abspath(model_dir)
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+        if manifest is None:
+            manifest = ModelManifest(model_dir=model_dir)
+            _manifests[key] = manifest
+        return manifest
@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.model_manifest import (
+    GLOBAL_ENCODINGS_SUFFIX, GLOBAL_MODEL_FAMILY, MODEL_FILE_PATTERNS, ModelManifest, get_model_manifest
+)
+from app.services.preprocessing import ARTIFACT_FILES, PreprocessingArtifact
+from app.services.lstm_numpy import NumpyLSTMModel
+
+
+def load_xgboost_model(path: str):
+    """
+    Deserialize a model saved with `XGBRegressor.save_model` as a bare
+    Booster; serving calls `inplace_predict` without the sklearn wrapper
+    """
+    from xgboost import Booster
+
+    booster = Booster()
+    booster.load_model(path)
+    return booster
+
+
+def xgb_iteration_range(booster) -> Tuple[int, int]:
+    """
+    Trees `XGBRegressor.predict` would use: up to `best_iteration` for
+    models trained with early stopping, otherwise all of them
+    """
+    best_iteration = booster.attr('best_iteration')
+    return (0, int(best_iteration) + 1) if best_iteration is not None else (0, 0)
+
+
+def load_global_encodings(path: str):
+    """Per-medicine encodings of a global XGBoost model"""
+    from app.services.global_model import GlobalModelEncodings
+
+    return GlobalModelEncodings.load(path)
+
+
+def load_sarimax_state(path: str):
+    """Fitted SARIMAX parameters and filter state of one medicine"""
+    from app.services.sarimax_forecast import SarimaxState
+
+    return SarimaxState.load(path)
+
+
+def load_keras_model(path: str):
+    """Deserialize a saved Keras model"""
+    from keras.models import load_model
+
+    return load_model(path)
+
+
+def load_lstm_model(path: str):
+    """Exported NumPy weights (.npz) or a full Keras model, by file extension"""
+    if path.endswith('.npz'):
+        return NumpyLSTMModel.load(path)
+    return load_keras_model(path)
+
+
+class ModelRegistry:
+    """
+    Process-wide in-memory cache of forecasting models.
+
+    Models are keyed by (model_type, medicine_name) and kept in LRU order.
+    A cached entry is reloaded only when the file's path or mtime changes,
+    and both are re-checked at most every `revalidate_seconds`. Paths come
+    from the model manifest when it lists the medicine. A file that fails
+    to load is cached the same way, as its error, so a bad artifact is
+    read once per version instead of on every lookup.
+    """
+
+    MODEL_FILES = {
+        **MODEL_FILE_PATTERNS,
+        'xgboost_preprocessing': ARTIFACT_FILES['xgboost'],
+        'lstm_preprocessing': ARTIFACT_FILES['lstm'],
+        # A global model is cached once under its file stem, not per medicine
+        GLOBAL_MODEL_FAMILY: '{name}.json',
+        f'{GLOBAL_MODEL_FAMILY}_preprocessing': '{name}' + GLOBAL_ENCODINGS_SUFFIX,
+    }
+
+    def __init__(
+        self,
+        model_dir: str = settings.MODEL_DIR,
+        max_size: int = settings.MODEL_CACHE_SIZE,
+        revalidate_seconds: float = settings.MODEL_CACHE_REVALIDATE_SECONDS,
+        loaders: Optional[Dict[str, Callable[[str], Any]]] = None,
+        manifest: Optional[ModelManifest] = None
+    ):
+        self.model_dir = model_dir
+        self.manifest = manifest
+        self.max_size = max_size
+        self.revalidate_seconds = revalidate_seconds
+        self.loaders = loaders or {
+            'xgboost': load_xgboost_model,
+            'lstm': load_lstm_model,
+            'xgboost_preprocessing': PreprocessingArtifact.load,
+            'lstm_preprocessing': PreprocessingArtifact.load,
+            GLOBAL_MODEL_FAMILY: load_xgboost_model,
+            f'{GLOBAL_MODEL_FAMILY}_preprocessing': load_global_encodings,
+            'sarimax': load_sarimax_state,
+        }
+
+        # key -> {"model", "error", "path", "mtime", "checked_at"}
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.failures = 0
+
+    @staticmethod
+    def _cached(entry: Dict[str, Any]):
+        """The entry's model, or its load error raised again"""
+        if entry['error'] is not None:
+            raise entry['error'].with_traceback(None)
+        return entry['model']
+
+    def model_path(self, model_type: str, medicine_name: str) -> str:
+        """Path of the model file for a medicine"""
+        if model_type not in self.MODEL_FILES:
+            raise ValueError(f"Unknown model type: {model_type}")
+        path = None
+        if self.manifest is not None:
+            path = self.manifest.file_path(model_type, medicine_name)
+        if not path:
+            path = os.path.join(self.model_dir, self.MODEL_FILES[model_type].format(name=medicine_name))
+        
+        # Exported LSTM weights run without TensorFlow
+        if model_type == 'lstm' and settings.LSTM_NUMPY_RUNTIME and not path.endswith('.npz'):
+            npz_path = os.path.splitext(path)[0] + '.npz'
+            if os.path.exists(npz_path):
+                return npz_path
+        return path
+
+    def get(self, model_type: str, medicine_name: str):
+        """
+        Return the loaded model, reading it from disk only on a miss
+        or when the file changed since it was cached.
+
+        Raises FileNotFoundError if the model file does not exist, and the
+        loader's error (again, without rereading) while the file that
+        failed to load is unchanged.
+        """
+        key = (model_type, medicine_name)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry['checked_at'] < self.revalidate_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._cached(entry)
+
+        path = self.model_path(model_type, medicine_name)
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['path'] == path and entry['mtime'] == mtime:
+                entry['checked_at'] = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._cached(entry)
+
+            if entry is not None:
+                self.reloads += 1
+            else:
+                self.misses += 1
+
+        model, error = None, None
+        try:
+            model = self.loaders[model_type](path)
+        except Exception as e:
+            error = e
+
+        with self._lock:
+            if error is not None:
+                self.failures += 1
+            self._entries[key] = {
+                'model': model,
+                'error': error,
+                'path': path,
+                'mtime': mtime,
+                'checked_at': now,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        if error is not None:
+            raise error
+        return model
+
+    def invalidate(self, model_type: Optional[str] = None, medicine_name: Optional[str] = None) -> int:
+        """Drop cached entries matching the given type and/or medicine"""
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if (model_type is None or key[0] == model_type)
+                and (medicine_name is None or key[1] == medicine_name)
+            ]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current cache occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.reloads
+            return {
+                'model_dir': self.model_dir,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reloads': self.reloads,
+                'evictions': self.evictions,
+                'failures': self.failures,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'cached_models': [f"{t}:{n}" for (t, n), e in self._entries.items() if e['error'] is None],
+                'failed_models': [f"{t}:{n}" for (t, n), e in self._entries.items() if e['error'] is not None],
+            }
+
+
+_registries: Dict[str, ModelRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(model_dir: Optional[str] = None) -> ModelRegistry:
+    """Return the shared registry for a model directory, creating it on first use"""
+    model_dir = model_dir or settings.MODEL_DIR
+    key = os.path.abspath(model_dir)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = ModelRegistry(model_dir=model_dir, manifest=get_model_manifest(model_dir))
+            _registries[key] = registry
+        return registry
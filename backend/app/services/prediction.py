@@ -1,37 +1,79 @@
+import os
+import time
+import uuid
 import pandas as pd
 import numpy as np
-import os
-from xgboost import XGBRegressor
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from keras.models import load_model
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from app.models import Medicine, Prediction
+from app.core.config import settings
+from app.models import Medicine, Prediction, PredictionHorizon, PredictionRun, RunTrigger
+from app.services.model_registry import ModelRegistry, get_model_registry, xgb_iteration_range
+from app.services.model_manifest import GLOBAL_MODEL_FAMILY, ModelManifest, get_model_manifest
+from app.services.preprocessing import PreprocessingArtifact, transform_rows
+from app.services.global_model import global_features
+from app.services.forecast_pool import get_forecast_pool
+from app.services.lstm_inference import lstm_batch_runner, minmax_params
+from app.services.lstm_numpy import NumpyLSTMModel, numpy_lstm_runner
+from app.services.feature_store import FeatureStore, recent_matrix, serving_buffer
+from app.services.sales_history import SalesHistory
+from app.services.forecast_cache import ForecastKey, forecast_cache, history_digests, input_hash, store_digests
+from app.services.fallback_forecast import FALLBACK_METHODS, fallback_forecast, fallback_version, weekly_matrix
+from app.services.sarimax_forecast import extend_sarimax, week_index
+from app.services.latest_predictions import LatestPredictions
+from app.services.prediction_runs import StageTimer
+from app.services.feature_engine import (
+    LagRingBuffer,
+    build_feature_frame,
+    convert_week_to_datetime,
+    feature_columns,
+    next_week,
+    recent_history,
+    step_features,
+    KNOWN_FEATURE_COLUMNS,
+)
 
 class PredictionService:
-    def __init__(self, model_dir: str = "./DemandForecast/saved models"):
+    def __init__(self, model_dir: str = settings.MODEL_DIR, registry: Optional[ModelRegistry] = None,
+                 manifest: Optional[ModelManifest] = None):
         self.model_dir = model_dir
         
-        # Define which medicines use which model
-        self.xgb_medicines = [
-            'CLINMISKIN GEL', 
-            'DESWIN  TAB', 
-            'K GLIM-M 1MG', 
-            'MONTEMAC FX TAB'
-        ]
+        # Loaded models and the model manifest are shared across service instances
+        self.registry = registry or get_model_registry(model_dir)
+        self.manifest = manifest or get_model_manifest(model_dir)
         
-        self.lstm_medicines = [
-            'AJAY SENSITIVE PLUS  --40',
-            'AMOCARE CV 625',
-            'MEFORNIX-P TAB',
-            'MEFTAL-P TAB'
-        ]
+        # Medicine -> error of forecasts that failed in the last run
+        self.forecast_failures: Dict[str, str] = {}
         
-        # All selected medicines
-        self.selected_medicines = self.xgb_medicines + self.lstm_medicines
+        # Time per stage of the last run, and its prediction_runs id
+        self.timer = StageTimer()
+        self.last_run_id: Optional[str] = None
+    
+    # Which medicines use which model comes from the manifest, so new
+    # models are served without a code change or restart
+    @property
+    def xgb_medicines(self):
+        """Medicines served by their own XGBoost model or the global one"""
+        return self.manifest.medicines('xgboost') + self.manifest.medicines(GLOBAL_MODEL_FAMILY)
+    
+    @property
+    def lstm_medicines(self):
+        return self.manifest.medicines('lstm')
+    
+    @property
+    def sarimax_medicines(self):
+        return self.manifest.medicines('sarimax')
+    
+    @property
+    def selected_medicines(self):
+        """All selected medicines"""
+        return self.xgb_medicines + self.lstm_medicines + self.sarimax_medicines
     
     def convert_week_to_datetime(self, series):
         """Convert Week strings like '2024-W31' to datetime (Mon of that ISO week)."""
-        return pd.to_datetime(series + '-1', format='%Y-W%W-%w', errors='coerce')
+        return convert_week_to_datetime(series)
     
     def next_week_label_from_row(self, row):
         """Compute (year, week) for next week given a row with Year, Week_Number."""
@@ -42,193 +84,623 @@ class PredictionService:
             yr += 1
         return yr, wk, f"{yr}-W{wk:02d}"
     
-    def forecast_medicine_next_week_xgb(self, medicine_name: str, df: pd.DataFrame):
-        """Generate next week forecast for a single medicine using XGBoost"""
+    def forecast_xgb_batch(self, medicine_names, df: pd.DataFrame, pool=None, horizon: int = 1):
+        """
+        Generate forecasts for many XGBoost medicines at once from an uploaded
+        sales frame.
+        
+        Features for every medicine are built in one vectorized pass and
+        handed to `predict_xgb` as plain arrays, either in this process or
+        split across the worker pool. With `horizon` > 1 the forecast is
+        recursive: each predicted week is pushed into every medicine's lag
+        ring buffer and the next week's features are rebuilt for all
+        medicines together, one `predict_xgb` call per week.
+        """
+        df_xgb = df[df['Product_Name'].isin(medicine_names)]
+        found = set(df_xgb['Product_Name'].unique())
+        for medicine_name in medicine_names:
+            if medicine_name not in found:
+                print(f"⚠️  '{medicine_name}' not found in dataset. Skipping...")
+        
+        features = build_feature_frame(df_xgb)
+        if features.empty:
+            for medicine_name in found:
+                print(f"⚠️ Not enough history for '{medicine_name}'. Skipping...")
+            return {}
+        
+        buffer, last_rows = recent_history(features)
+        for medicine_name in medicine_names:
+            if medicine_name in found and medicine_name not in last_rows.index:
+                print(f"⚠️ Not enough history for '{medicine_name}'. Skipping...")
+        
+        names = list(last_rows.index)
+        
+        # Legacy models without a saved scaler refit it on the uploaded history
+        feature_cols = feature_columns(features)
+        history_rows = features.groupby('Product_Name', sort=False).indices
+        legacy_train = {
+            name: features.iloc[history_rows[name]][feature_cols].to_numpy(dtype=float)
+            for name in names
+            if self.needs_legacy_scaler(name)
+        }
         
-        if medicine_name not in df['Product_Name'].unique():
-            print(f"⚠️  '{medicine_name}' not found in dataset. Skipping...")
-            return None
+        return self._forecast_xgb_recursive(names, buffer, last_rows, legacy_train, feature_cols, horizon, pool)
+    
+    def forecast_xgb_from_store(self, medicine_names, db: Session, pool=None, horizon: int = 1):
+        """
+        Same as `forecast_xgb_batch`, reading each medicine's next-week input
+        vector and lag history from the feature store (one row per medicine)
+        instead of rebuilding them from the raw history. Models without a
+        preprocessing artifact need the full training matrix and are skipped.
+        """
+        rows = FeatureStore.latest(db, medicine_names)
+        rows = rows[rows['next_features'].notna()]
+        
+        names = []
+        for medicine_name in medicine_names:
+            if medicine_name not in rows.index:
+                print(f"⚠️ Not enough history in feature store for '{medicine_name}'. Skipping...")
+            elif self.needs_legacy_scaler(medicine_name):
+                print(f"⚠️ No preprocessing artifact for '{medicine_name}', feature store not used")
+            else:
+                names.append(medicine_name)
+        
+        if not names:
+            return {}
+        
+        rows = rows.loc[names]
+        first_rows = np.array(rows['next_features'].tolist(), dtype=float)
+        buffer = serving_buffer(recent_matrix(rows['recent_quantities']), rows['weeks_observed'].to_numpy())
+        
+        return self._forecast_xgb_recursive(names, buffer, rows, {}, KNOWN_FEATURE_COLUMNS, horizon, pool,
+                                            first_rows=first_rows)
+    
+    def _forecast_xgb_recursive(self, names, buffer: LagRingBuffer, last_rows: pd.DataFrame, legacy_train: dict,
+                                feature_cols, horizon: int, pool=None, first_rows: Optional[np.ndarray] = None):
+        """
+        Recursive XGBoost forecast for all medicines stepping together.
         
-        df_med = df[df['Product_Name'] == medicine_name].copy()
-        df_med = df_med.sort_values('Week').reset_index(drop=True)
+        `first_rows`, when given, is the already built input of the first
+        week; later weeks are rebuilt from the lag ring buffer.
+        """
+        year = last_rows['Year'].to_numpy()
+        week = last_rows['Week_Number'].to_numpy()
+        preds = np.full((len(names), horizon), np.nan)
+        weeks = []
+        for step in range(horizon):
+            year, week = next_week(year, week)
+            weeks.append((year, week))
+            if step == 0 and first_rows is not None:
+                X_rows = first_rows
+            else:
+                X_rows = step_features(buffer, year, week)
+            
+            preds[:, step] = self._predict(pool, 'predict_xgb', names, X_rows, legacy_train, feature_cols)
+            buffer.push(preds[:, step])
         
-        # Convert Week strings to datetime
-        df_med['Week'] = self.convert_week_to_datetime(df_med['Week'])
+        return self._horizon_results(names, last_rows, preds, weeks, 'XGBoost')
+    
+    def _predict(self, pool, method: str, *args) -> np.ndarray:
+        """
+        Run `predict_xgb`/`predict_lstm` in the worker pool, or in this
+        process without one or once the pool has broken
+        """
+        if pool is not None and not pool.broken:
+            try:
+                with self.timer('inference'):
+                    return getattr(pool, method)(*args)
+            except BrokenProcessPool as e:
+                print(f"⚠️ Forecast worker pool broke ({e}); forecasting in this process")
+        return getattr(self, method)(*args)
+    
+    def _horizon_results(self, names, last_rows: pd.DataFrame, preds: np.ndarray, weeks, model_type: str):
+        """Result dict per medicine; medicines whose model failed are left out"""
+        # Columns are read once; per-row .loc lookups dominate large catalogs
+        last_rows = last_rows.loc[list(names)]
+        last_year = last_rows['Year'].to_numpy()
+        last_week = last_rows['Week_Number'].to_numpy()
+        last_qty = last_rows['Total_Quantity'].to_numpy()
+        
+        results = {}
+        for i, medicine_name in enumerate(names):
+            if np.isnan(preds[i, 0]):
+                continue
+            forecast = [
+                {
+                    'Horizon': step + 1,
+                    'Week': f"{int(year[i])}-W{int(week[i]):02d}",
+                    'Predicted_Quantity': int(round(float(preds[i, step])))
+                }
+                for step, (year, week) in enumerate(weeks)
+            ]
+            
+            results[medicine_name] = {
+                'Product': medicine_name,
+                'Last_Actual_Week': f"{int(last_year[i])}-W{int(last_week[i]):02d}",
+                'Last_Actual_Quantity': int(round(float(last_qty[i]))),
+                'Next_Predicted_Week': forecast[0]['Week'],
+                'Next_Predicted_Quantity': forecast[0]['Predicted_Quantity'],
+                'Model_Type': model_type,
+                'Forecast': forecast
+            }
+        
+        return results
+    
+    def predict_xgb(self, names, X_rows: np.ndarray, legacy_train: dict, feature_cols) -> np.ndarray:
+        """
+        Run the XGBoost models on prepared next-week feature rows.
         
-        # Feature Engineering
-        df_med['Month'] = np.ceil(df_med['Week_Number'] / 4.33).astype(int).clip(upper=12)
-        df_med['Quarter'] = ((df_med['Month'] - 1) // 3 + 1).astype(int)
-        df_med['Is_Year_Start'] = (df_med['Week_Number'] <= 4).astype(int)
-        df_med['Is_Year_End'] = (df_med['Week_Number'] >= 48).astype(int)
-        df_med['Sin_Week'] = np.sin(2 * np.pi * df_med['Week_Number'] / 52)
-        df_med['Cos_Week'] = np.cos(2 * np.pi * df_med['Week_Number'] / 52)
+        `X_rows` holds one row per name in KNOWN_FEATURE_COLUMNS order;
+        `legacy_train` maps medicines without a preprocessing artifact to
+        their training feature matrix (in `feature_cols` order). Returns
+        NaN for medicines whose model could not be loaded.
         
-        # Lag features
-        for lag in range(1, 13):
-            df_med[f'lag_{lag}'] = df_med['Total_Quantity'].shift(lag)
+        Rows sharing an input layout are scaled together into one float32
+        matrix and each booster predicts its rows with `inplace_predict`,
+        so no DMatrix or DataFrame is built per medicine.
+        """
+        X_rows = np.asarray(X_rows, dtype=float)
+        preds = np.full(len(names), np.nan)
+        
+        # Medicines on the global model are predicted together
+        global_models = {}
+        for i, medicine_name in enumerate(names):
+            entry = self.manifest.get(medicine_name)
+            if entry is not None and entry.family == GLOBAL_MODEL_FAMILY:
+                global_models.setdefault(entry.path, []).append(i)
+        for path, rows in global_models.items():
+            preds[rows] = self.predict_xgb_global(path, [names[i] for i in rows], X_rows[rows])
+        global_rows = {i for rows in global_models.values() for i in rows}
+        
+        boosters = {}
+        layouts = {}
+        for i, medicine_name in enumerate(names):
+            if i in global_rows:
+                continue
+            
+            # Load model (cached across requests)
+            try:
+                boosters[i] = self.load_model('xgboost', medicine_name)
+            except Exception as e:
+                self._model_failed(medicine_name, 'XGBoost', e)
+                continue
+            
+            artifact = self.load_preprocessing('xgboost', medicine_name)
+            if artifact is not None:
+                key = (artifact.scaler, tuple(artifact.feature_columns))
+            else:
+                key = (None, tuple(feature_cols))
+            layouts.setdefault(key, []).append((i, artifact))
+        
+        for (scaler, columns), members in layouts.items():
+            rows = [i for i, _ in members]
+            X_layout = X_rows[np.ix_(rows, [KNOWN_FEATURE_COLUMNS.index(c) for c in columns])]
+            
+            if scaler is not None:
+                # Saved scaler and feature order
+                X_input = transform_rows([artifact for _, artifact in members], X_layout)
+            else:
+                # Legacy models: recreate scaler from the uploaded history
+                from sklearn.preprocessing import StandardScaler
+                
+                X_input = np.empty_like(X_layout)
+                for j, i in enumerate(rows):
+                    print(f"⚠️ No preprocessing artifact for '{names[i]}', refitting scaler on upload")
+                    legacy_scaler = StandardScaler().fit(legacy_train[names[i]])
+                    X_input[j] = legacy_scaler.transform(X_layout[j:j + 1])[0]
+            
+            X_input = np.ascontiguousarray(X_input, dtype=np.float32)
+            
+            # One call per distinct booster (a shared model gets all its rows at once)
+            by_booster = {}
+            for j, i in enumerate(rows):
+                by_booster.setdefault(id(boosters[i]), []).append(j)
+            for positions in by_booster.values():
+                booster = boosters[rows[positions[0]]]
+                X_group = X_input[positions[0]:positions[0] + 1] if len(positions) == 1 else X_input[positions]
+                with self.timer('inference'):
+                    preds[[rows[j] for j in positions]] = booster.inplace_predict(
+                        X_group, iteration_range=xgb_iteration_range(booster)
+                    )
         
-        # Rolling statistics
-        df_med['rolling_mean_3'] = df_med['Total_Quantity'].shift(1).rolling(window=3).mean()
-        df_med['rolling_mean_5'] = df_med['Total_Quantity'].shift(1).rolling(window=5).mean()
-        df_med['rolling_mean_6'] = df_med['Total_Quantity'].shift(1).rolling(window=6).mean()
-        df_med['rolling_std_6'] = df_med['Total_Quantity'].shift(1).rolling(window=6).std()
-        df_med['rolling_mean_8'] = df_med['Total_Quantity'].shift(1).rolling(window=8).mean()
-        df_med['rolling_std_4'] = df_med['Total_Quantity'].shift(1).rolling(window=4).std()
+        return preds
+    
+    def predict_xgb_global(self, path: str, names, X_rows: np.ndarray) -> np.ndarray:
+        """
+        Run a global XGBoost model on feature rows (KNOWN_FEATURE_COLUMNS
+        order) of the medicines it serves: one `inplace_predict` call for
+        all of them. Returns NaN where the model or a medicine's encodings
+        are missing.
+        """
+        preds = np.full(len(names), np.nan)
         
-        df_med = df_med.dropna().reset_index(drop=True)
+        # Cached once per model file, however many medicines share it
+        stem = os.path.splitext(os.path.relpath(path, self.model_dir))[0]
+        try:
+            booster = self.load_model(GLOBAL_MODEL_FAMILY, stem)
+            encodings = self.load_model(f'{GLOBAL_MODEL_FAMILY}_preprocessing', stem)
+        except Exception as e:
+            print(f"❌ Global XGBoost model not found at '{path}': {e}")
+            return preds
+        
+        scale, cv, category = encodings.lookup(names)
+        known = ~np.isnan(scale)
+        for i in np.flatnonzero(~known):
+            print(f"⚠️ '{names[i]}' has no encodings in the global model. Skipping...")
+        if known.any():
+            X_input = global_features(X_rows[known], scale[known], cv[known], category[known])
+            with self.timer('inference'):
+                preds[known] = booster.inplace_predict(
+                    X_input, iteration_range=xgb_iteration_range(booster)
+                ) * scale[known]
+        return preds
+    
+    def forecast_medicine_next_week_xgb(self, medicine_name: str, df: pd.DataFrame):
+        """Generate next week forecast for a single medicine using XGBoost"""
+        return self.forecast_xgb_batch([medicine_name], df).get(medicine_name)
+    
+    def forecast_lstm_batch(self, medicine_names, df: pd.DataFrame, pool=None, horizon: int = 1):
+        """
+        Generate forecasts for many LSTM medicines at once from an uploaded
+        sales frame.
+        
+        Windows (time_steps=4 unless the saved artifact says otherwise) for all
+        medicines are scaled together, evaluated with one graph call per model
+        architecture and inverse-scaled together. With `horizon` > 1 each
+        prediction is pushed into the medicines' window ring buffer and the
+        windows slide forward one week per step.
+        """
+        df_lstm = df[df['Product_Name'].isin(medicine_names)]
+        found = set(df_lstm['Product_Name'].unique())
+        for medicine_name in medicine_names:
+            if medicine_name not in found:
+                print(f"⚠️  '{medicine_name}' not found in dataset. Skipping...")
         
-        if df_med.empty:
-            print(f"⚠️ Not enough history for '{medicine_name}'. Skipping...")
-            return None
+        # Aggregate if multiple rows per week exist
+        df_lstm = (df_lstm
+                   .groupby(['Product_Name', 'Year', 'Week_Number', 'Week'], as_index=False)['Total_Quantity']
+                   .sum())
+        df_lstm = df_lstm.sort_values(['Product_Name', 'Year', 'Week_Number']).reset_index(drop=True)
+        
+        artifacts = self._lstm_artifacts(df_lstm.groupby('Product_Name', sort=False).size())
+        if not artifacts:
+            return {}
+        
+        names = list(artifacts)
+        df_lstm = df_lstm[df_lstm['Product_Name'].isin(names)]
+        grouped = df_lstm.groupby('Product_Name', sort=False)
+        
+        # Legacy scalers refit on the same trailing window the stored history provides
+        window = grouped.tail(settings.FORECAST_HISTORY_WEEKS) if settings.FORECAST_HISTORY_WEEKS > 0 else df_lstm
+        qty_stats = window.groupby('Product_Name', sort=False)['Total_Quantity'].agg(['min', 'max']).reindex(names)
+        scale, offset = self._lstm_scaling(
+            names, artifacts,
+            qty_stats['min'].to_numpy(dtype=float),
+            qty_stats['max'].to_numpy(dtype=float)
+        )
+        
+        # Last `window_size` points per medicine, right-aligned in one matrix
+        window_sizes = np.array([self._lstm_window_size(artifacts[n]) for n in names])
+        max_steps = int(window_sizes.max())
+        tail = grouped.tail(max_steps)
+        position = tail.groupby('Product_Name', sort=False).cumcount(ascending=False).to_numpy()
+        row = pd.Index(names).get_indexer(tail['Product_Name'])
+        last_qty = np.zeros((len(names), max_steps))
+        last_qty[row, max_steps - 1 - position] = tail['Total_Quantity'].to_numpy(dtype=float)
         
-        # Load model
-        model = XGBRegressor()
-        model_path = os.path.join(self.model_dir, f"xgboost_{medicine_name}.json")
+        # Last actual info
+        last_rows = grouped.tail(1).set_index('Product_Name').reindex(names)
         
-        try:
-            model.load_model(model_path)
-            print(f"✅ XGBoost model loaded: {medicine_name}")
-        except Exception as e:
-            print(f"❌ XGBoost model not found for '{medicine_name}': {e}")
-            return None
+        return self._forecast_lstm_recursive(names, last_qty, window_sizes, scale, offset, last_rows, horizon, pool)
+    
+    def forecast_lstm_from_store(self, medicine_names, db: Session, pool=None, horizon: int = 1):
+        """
+        Same as `forecast_lstm_batch`, reading each medicine's last window
+        from the feature store (one row per medicine). Models without a
+        preprocessing artifact refit their scaler on the last
+        FORECAST_HISTORY_WEEKS weeks, which the store does not keep, and
+        are skipped.
+        """
+        rows = FeatureStore.latest(db, medicine_names)
+        for medicine_name in medicine_names:
+            if medicine_name not in rows.index:
+                print(f"⚠️  '{medicine_name}' not found in feature store. Skipping...")
+        
+        artifacts = self._lstm_artifacts(rows['weeks_observed'])
+        for medicine_name in [n for n, artifact in artifacts.items() if artifact is None]:
+            print(f"⚠️ No preprocessing artifact for '{medicine_name}', feature store not used")
+            del artifacts[medicine_name]
+        if not artifacts:
+            return {}
+        
+        names = list(artifacts)
+        rows = rows.loc[names]
+        scale, offset = self._lstm_scaling(
+            names, artifacts,
+            rows['min_quantity'].to_numpy(dtype=float),
+            rows['max_quantity'].to_numpy(dtype=float)
+        )
+        
+        # Stored most recent first; windows are read oldest first
+        window_sizes = np.array([self._lstm_window_size(artifacts[n]) for n in names])
+        max_steps = int(window_sizes.max())
+        recent = recent_matrix(rows['recent_quantities'])
+        last_qty = np.nan_to_num(recent[:, :max_steps][:, ::-1], nan=0.0)
+        
+        return self._forecast_lstm_recursive(names, last_qty, window_sizes, scale, offset, rows, horizon, pool)
+    
+    def _lstm_window_size(self, artifact: Optional[PreprocessingArtifact]) -> int:
+        return artifact.window_size if artifact is not None else 4
+    
+    def _lstm_artifacts(self, counts: pd.Series) -> dict:
+        """Saved scalers of the medicines with enough weeks for their window"""
+        artifacts = {}
+        for medicine_name in counts.index:
+            artifact = self.load_preprocessing('lstm', medicine_name)
+            time_steps = self._lstm_window_size(artifact)
+            if counts[medicine_name] < time_steps + 1:
+                print(f"⚠️ Not enough history (<{time_steps + 1} weeks) for '{medicine_name}'. Skipping...")
+                continue
+            artifacts[medicine_name] = artifact
+        return artifacts
+    
+    def _lstm_scaling(self, names, artifacts: dict, data_min: np.ndarray, data_max: np.ndarray):
+        """
+        Per-medicine MinMax parameters: saved with the model, or refit on
+        the history min/max for legacy models without an artifact
+        """
+        scale, offset = minmax_params(data_min, data_max)
+        for i, medicine_name in enumerate(names):
+            artifact = artifacts[medicine_name]
+            if artifact is not None:
+                scale[i] = artifact.params['scale'][0]
+                offset[i] = artifact.params['min'][0]
+            else:
+                print(f"⚠️ No preprocessing artifact for '{medicine_name}', refitting scaler on upload")
+        return scale, offset
+    
+    def _forecast_lstm_recursive(self, names, last_qty: np.ndarray, window_sizes: np.ndarray, scale: np.ndarray,
+                                 offset: np.ndarray, last_rows: pd.DataFrame, horizon: int, pool=None):
+        """Recursive LSTM forecast for all medicines stepping together"""
+        windows = LagRingBuffer(last_qty[:, ::-1], window_sizes)
+        preds = np.full((len(names), horizon), np.nan)
+        for step in range(horizon):
+            preds[:, step] = self._predict(pool, 'predict_lstm', names, windows.oldest_first(),
+                                           window_sizes, scale, offset)
+            windows.push(preds[:, step])
+        
+        year = last_rows['Year'].to_numpy()
+        week = last_rows['Week_Number'].to_numpy()
+        weeks = []
+        for step in range(horizon):
+            year, week = next_week(year, week)
+            weeks.append((year, week))
+        
+        return self._horizon_results(names, last_rows, preds, weeks, 'LSTM')
+    
+    def predict_lstm(self, names, last_qty: np.ndarray, window_sizes: np.ndarray,
+                     scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+        """
+        Run the LSTM models on raw quantity windows.
         
-        # Recreate scaler
-        feature_cols = [c for c in df_med.columns 
-                        if c not in ['Total_Quantity', 'Week', 'Product_Name']]
-        X_train = df_med[feature_cols]
-        scaler = StandardScaler()
-        scaler.fit(X_train)
-        
-        # Prepare for forecasting
-        last_12_quantities = list(df_med['Total_Quantity'].astype(float).values[-12:][::-1])
-        last_row = df_med.iloc[-1].copy()
-        yr, wk, next_label = self.next_week_label_from_row(last_row)
-        
-        # Build features
-        month = int(np.ceil(wk / 4.33))
-        month = min(month, 12)
-        quarter = ((month - 1) // 3) + 1
-        is_year_start = int(wk <= 4)
-        is_year_end = int(wk >= 48)
-        sin_week = np.sin(2 * np.pi * wk / 52)
-        cos_week = np.cos(2 * np.pi * wk / 52)
-        
-        # Lag features
-        lags = {f'lag_{j}': (last_12_quantities[j-1] if j-1 < len(last_12_quantities) else 0.0) 
-                for j in range(1, 13)}
-        
-        # Rolling statistics helpers
-        def safe_mean(arr, k):
-            if len(arr) < k:
-                return float(np.mean(arr)) if len(arr) > 0 else 0.0
-            return float(np.mean(arr[:k]))
-        
-        def safe_std(arr, k):
-            if len(arr) < 2 or k < 2:
-                return 0.0
-            return float(np.std(arr[:k], ddof=1))
-        
-        row = {
-            'Year': yr,
-            'Week_Number': wk,
-            'Month': month,
-            'Quarter': quarter,
-            'Is_Year_Start': is_year_start,
-            'Is_Year_End': is_year_end,
-            'Sin_Week': sin_week,
-            'Cos_Week': cos_week,
-            **lags,
-            'rolling_mean_3': safe_mean(last_12_quantities, 3),
-            'rolling_mean_5': safe_mean(last_12_quantities, 5),
-            'rolling_mean_6': safe_mean(last_12_quantities, 6),
-            'rolling_std_6': safe_std(last_12_quantities, 6),
-            'rolling_mean_8': safe_mean(last_12_quantities, 8),
-            'rolling_std_4': safe_std(last_12_quantities, 4)
+        `last_qty` is right-aligned with one row per name; each model reads
+        its last `window_sizes[i]` columns. Scaling and inverse scaling use
+        the per-medicine MinMax `scale`/`offset`. Returns NaN for medicines
+        whose model could not be loaded.
+        """
+        next_qty = np.full(len(names), np.nan)
+        
+        # Load LSTM models (cached across requests)
+        models = {}
+        for medicine_name in names:
+            try:
+                models[medicine_name] = self.load_model('lstm', medicine_name)
+            except Exception as e:
+                self._model_failed(medicine_name, 'LSTM', e)
+        
+        if not models:
+            return next_qty
+        
+        max_steps = last_qty.shape[1]
+        scaled_windows = last_qty * scale[:, None] + offset[:, None]
+        windows = {
+            name: scaled_windows[i, max_steps - window_sizes[i]:].reshape(1, window_sizes[i], 1)
+            for i, name in enumerate(names)
+            if name in models
         }
         
-        row_df = pd.DataFrame([row])
-        row_df = row_df[feature_cols]
+        # Exported weights run on NumPy, remaining Keras models on TensorFlow
+        numpy_windows = {n: w for n, w in windows.items() if isinstance(models[n], NumpyLSTMModel)}
+        keras_windows = {n: w for n, w in windows.items() if n not in numpy_windows}
+        with self.timer('inference'):
+            next_scaled = numpy_lstm_runner.predict(models, numpy_windows) if numpy_windows else {}
+            if keras_windows:
+                next_scaled.update(lstm_batch_runner.predict(models, keras_windows))
         
-        # Predict
-        X_input = scaler.transform(row_df)
-        pred = model.predict(X_input)[0]
+        for i, medicine_name in enumerate(names):
+            if medicine_name in next_scaled:
+                next_qty[i] = (float(next_scaled[medicine_name][0]) - offset[i]) / scale[i]
         
-        return {
-            'Product': medicine_name,
-            'Last_Actual_Week': f"{int(last_row['Year'])}-W{int(last_row['Week_Number']):02d}",
-            'Last_Actual_Quantity': int(last_row['Total_Quantity']),
-            'Next_Predicted_Week': next_label,
-            'Next_Predicted_Quantity': int(round(pred)),
-            'Model_Type': 'XGBoost'
-        }
+        return next_qty
     
     def forecast_medicine_next_week_lstm(self, medicine_name: str, df: pd.DataFrame):
         """Generate next week forecast for a single medicine using LSTM (time_steps=4)"""
+        return self.forecast_lstm_batch([medicine_name], df).get(medicine_name)
+    
+    def forecast_fallback_batch(self, medicine_names, df: pd.DataFrame, horizon: int = 1):
+        """
+        Statistical forecasts for medicines without a trained model.
         
-        if medicine_name not in df['Product_Name'].unique():
-            print(f"⚠️  '{medicine_name}' not found in dataset. Skipping...")
-            return None
-        
-        df_med = df[df['Product_Name'] == medicine_name].copy()
-        
-        # Aggregate if multiple rows per week exist
-        df_med = (df_med
-                  .groupby(['Year', 'Week_Number', 'Week'], as_index=False)['Total_Quantity']
-                  .sum())
-        df_med = df_med.sort_values(['Year', 'Week_Number']).reset_index(drop=True)
-        
-        # Convert Week to datetime
-        df_med['Week_dt'] = self.convert_week_to_datetime(df_med['Week'])
-        
-        if len(df_med) < 5:
-            print(f"⚠️ Not enough history (<5 weeks) for '{medicine_name}'. Skipping...")
-            return None
-        
-        # Prepare scaler on Total_Quantity
-        scaler = MinMaxScaler()
-        qty = df_med[['Total_Quantity']].values.astype(float)
-        scaled = scaler.fit_transform(qty)
-        
-        # Need last 4 points as input (time_steps=4)
-        time_steps = 4
-        last_seq = scaled[-time_steps:].reshape(1, time_steps, 1)
-        
-        # Load LSTM model
-        model_path = os.path.join(self.model_dir, f"lstm_{medicine_name}.keras")
+        All medicines are scored together on one SKU x week matrix; each
+        gets seasonal naive, EWMA or Croston (see `fallback_forecast`), and
+        the chosen method is reported as its Model_Type.
+        """
+        names, Q, last_rows = weekly_matrix(df, medicine_names)
+        found = set(names)
+        for medicine_name in medicine_names:
+            if medicine_name not in found:
+                print(f"⚠️  '{medicine_name}' not found in dataset. Skipping...")
+        if not names:
+            return {}
+        
+        with self.timer('inference'):
+            preds, methods = fallback_forecast(Q, horizon)
+        year = last_rows['Year'].to_numpy()
+        week = last_rows['Week_Number'].to_numpy()
+        weeks = []
+        for _ in range(preds.shape[1]):
+            year, week = next_week(year, week)
+            weeks.append((year, week))
+        
+        results = {}
+        for method, model_type in enumerate(FALLBACK_METHODS):
+            rows = np.flatnonzero(methods == method)
+            if len(rows):
+                results.update(self._horizon_results(
+                    [names[i] for i in rows], last_rows, preds[rows],
+                    [(year[rows], week[rows]) for year, week in weeks], model_type
+                ))
+        return results
+    
+    def forecast_sarimax_batch(self, medicine_names, df: pd.DataFrame, horizon: int = 1):
+        """
+        SARIMAX forecasts from each medicine's saved state.
+        
+        Weeks of the upload after the state's last week are filtered into
+        the state with its saved parameters (no re-estimation) and the
+        advanced state is written back, so the next run only filters what
+        is new; full refits run on a schedule (refit_sarimax.py). A
+        medicine that fails is recorded in `forecast_failures` and left
+        out, without stopping the others.
+        """
+        names, Q, last_rows = weekly_matrix(df, medicine_names)
+        found = set(names)
+        for medicine_name in medicine_names:
+            if medicine_name not in found:
+                self.forecast_failures[medicine_name] = "SARIMAX: not found in dataset"
+        if not names:
+            return {}
+        
+        width = Q.shape[1]
+        last_index = week_index(last_rows['Year'].to_numpy(), last_rows['Week_Number'].to_numpy())
+        # New observations are sliced by week distance, so each row's weeks must be consecutive columns
+        part = df[df['Product_Name'].isin(names)]
+        first_index = pd.Series(
+            week_index(part['Year'].to_numpy(), part['Week_Number'].to_numpy()), index=part['Product_Name'].to_numpy()
+        ).groupby(level=0).min().reindex(names).to_numpy()
+        observed_weeks = (~np.isnan(Q)).sum(axis=1)
+        preds = np.full((len(names), horizon), np.nan)
+        for i, medicine_name in enumerate(names):
+            try:
+                if observed_weeks[i] != last_index[i] - first_index[i] + 1:
+                    raise ValueError(f"{observed_weeks[i]} weekly columns for a span of "
+                                     f"{int(last_index[i] - first_index[i]) + 1} weeks")
+                state = self.load_model('sarimax', medicine_name)
+                new_weeks = int(last_index[i]) - state.week_index
+                if new_weeks < 0:
+                    raise ValueError(f"sales end at {last_rows['Year'].iat[i]}-W{last_rows['Week_Number'].iat[i]:02d}, "
+                                     f"before the model's last week {state.last_year}-W{state.last_week:02d}")
+                # Weeks missing between the state and the upload are filtered as NaN
+                new_obs = Q[i, max(width - new_weeks, 0):]
+                if new_weeks > width:
+                    new_obs = np.concatenate([np.full(new_weeks - width, np.nan), new_obs])
+                with self.timer('inference'):
+                    preds[i], extended = extend_sarimax(state, new_obs, horizon)
+                if new_weeks:
+                    extended.save(self.registry.model_path('sarimax', medicine_name))
+                    self.registry.invalidate('sarimax', medicine_name)
+            except Exception as e:
+                self.forecast_failures[medicine_name] = f"SARIMAX: {type(e).__name__}: {e}"
+        
+        year = last_rows['Year'].to_numpy()
+        week = last_rows['Week_Number'].to_numpy()
+        weeks = []
+        for _ in range(horizon):
+            year, week = next_week(year, week)
+            weeks.append((year, week))
+        return self._horizon_results(names, last_rows, preds, weeks, 'SARIMAX')
+    
+    def _model_failed(self, medicine_name: str, model_type: str, error: Exception):
+        """Record a model that could not be loaded in `forecast_failures`, logging it once"""
+        if medicine_name not in self.forecast_failures:
+            print(f"❌ {model_type} model could not be loaded for '{medicine_name}': {error}")
+            self.forecast_failures[medicine_name] = f"{model_type}: {type(error).__name__}: {error}"
+    
+    def load_model(self, model_type: str, medicine_name: str):
+        """Model or preprocessing artifact from the shared registry, timed as model loading"""
+        with self.timer('model_load'):
+            return self.registry.get(model_type, medicine_name)
+    
+    def needs_legacy_scaler(self, medicine_name: str) -> bool:
+        """Per-medicine XGBoost model saved without a preprocessing artifact"""
+        return (self.manifest.family(medicine_name) != GLOBAL_MODEL_FAMILY
+                and self.load_preprocessing('xgboost', medicine_name) is None)
+    
+    def load_preprocessing(self, model_type: str, medicine_name: str) -> Optional[PreprocessingArtifact]:
+        """Saved scaler/feature schema for a model, or None for legacy models"""
         try:
-            model = load_model(model_path)
-            print(f"✅ LSTM model loaded: {medicine_name}")
-        except Exception as e:
-            print(f"❌ LSTM model not found for '{medicine_name}': {e}")
+            return self.load_model(f'{model_type}_preprocessing', medicine_name)
+        except FileNotFoundError:
             return None
-        
-        # Predict 1 week ahead
-        next_scaled = model.predict(last_seq, verbose=0)[0, 0]
-        next_qty = scaler.inverse_transform(np.array([[next_scaled]])).flatten()[0]
-        
-        # Last actual info
-        last_row = df_med.iloc[-1]
-        yr, wk, next_label = self.next_week_label_from_row(last_row)
-        
-        return {
-            'Product': medicine_name,
-            'Last_Actual_Week': f"{int(last_row['Year'])}-W{int(last_row['Week_Number']):02d}",
-            'Last_Actual_Quantity': int(round(float(last_row['Total_Quantity']))),
-            'Next_Predicted_Week': next_label,
-            'Next_Predicted_Quantity': int(round(float(next_qty))),
-            'Model_Type': 'LSTM'
-        }
     
     def forecast_medicine_next_week(self, medicine_name: str, df: pd.DataFrame):
-        """Route to appropriate model based on medicine name"""
-        if medicine_name in self.xgb_medicines:
+        """Route to appropriate model based on the model manifest"""
+        family = self.manifest.family(medicine_name)
+        if family in ('xgboost', GLOBAL_MODEL_FAMILY):
             return self.forecast_medicine_next_week_xgb(medicine_name, df)
-        elif medicine_name in self.lstm_medicines:
+        elif family == 'lstm':
             return self.forecast_medicine_next_week_lstm(medicine_name, df)
+        elif family == 'sarimax':
+            return self.forecast_sarimax_batch([medicine_name], df).get(medicine_name)
+        elif settings.FALLBACK_FORECAST_ENABLED:
+            return self.forecast_fallback_batch([medicine_name], df).get(medicine_name)
         else:
-            print(f"⚠️ '{medicine_name}' not in XGB or LSTM lists. Skipping...")
+            print(f"⚠️ '{medicine_name}' has no model in the manifest. Skipping...")
             return None
     
+    def model_version(self, medicine_name: str) -> Optional[str]:
+        """
+        Manifest version of a medicine's model plus the mtimes of the model
+        file and preprocessing artifact actually served, so a model
+        retrained in place counts as a new version. Medicines without a
+        model get the statistical fallback's version.
+        """
+        entry = self.manifest.get(medicine_name)
+        if entry is None:
+            return fallback_version() if settings.FALLBACK_FORECAST_ENABLED else None
+        mtimes = []
+        for model_type in (entry.family, f'{entry.family}_preprocessing'):
+            if model_type not in self.registry.MODEL_FILES:
+                continue
+            try:
+                mtimes.append(str(os.stat(self.registry.model_path(model_type, medicine_name)).st_mtime_ns))
+            except OSError:
+                mtimes.append('-')
+        return ':'.join([entry.version] + mtimes)
+    
+    def forecast_cache_keys(self, medicine_names, df: pd.DataFrame, db: Session, horizon: int) -> Dict[str, ForecastKey]:
+        """
+        Cache key of each medicine's forecast for this run.
+        
+        The input hash covers the horizon, the medicine's rows in the upload
+        and (with the feature store on) its latest store state, i.e.
+        everything a forecast reads besides the model.
+        """
+        uploaded = history_digests(df, medicine_names)
+        stored = store_digests(FeatureStore.latest(db, medicine_names)) if settings.FEATURE_STORE_ENABLED else {}
+        
+        keys = {}
+        for medicine_name in medicine_names:
+            version = self.model_version(medicine_name)
+            if version is None:
+                continue
+            keys[medicine_name] = ForecastKey(
+                model_type=self.manifest.family(medicine_name) or 'fallback',
+                model_version=version,
+                input_hash=input_hash(horizon, uploaded.get(medicine_name, '-'), stored.get(medicine_name, '-'))
+            )
+        return keys
+    
     def calculate_reorder_level(self, predicted_demand: int, safety_stock: int, lead_time_days: int) -> int:
         """Calculate reorder level based on predicted demand"""
         # Weekly demand * lead time in weeks + safety stock
@@ -255,9 +727,28 @@ class PredictionService:
         # Return the most recent quantity
         return int(medicine_df.iloc[0]['Total_Quantity'])
     
-    def generate_predictions(self, df: pd.DataFrame, db: Session):
-        """Generate predictions for all selected medicines and save to DB"""
+    def generate_predictions(self, df: pd.DataFrame, db: Session, progress_callback=None,
+                             horizon: int = settings.FORECAST_HORIZON_WEEKS, medicine_ids=None,
+                             trigger: RunTrigger = RunTrigger.upload, job_id: Optional[str] = None):
+        """
+        Generate predictions for all selected medicines and save to DB
+        
+        The next week goes to the predictions table; the full `horizon`-week
+        path goes to prediction_horizons. `progress_callback(processed, total)`
+        is called as medicines finish. `medicine_ids`, when given, limits the
+        run to those medicines (e.g. the ones whose sales just changed).
+        `df` may be a partial upload: the last FORECAST_HISTORY_WEEKS stored
+        weeks of each medicine are merged in.
+        
+        Each call is recorded in prediction_runs with its `trigger`, SKU
+        count and time per stage (RUN_STAGES); its rows are written with
+        one bulk insert per table, tagged with the run id (`last_run_id`).
+        """
         all_predictions = []
+        self.forecast_failures = {}
+        self.timer = StageTimer()
+        started_at = datetime.now(timezone.utc)
+        stage_start = time.perf_counter()
         
         # Validate required columns
         required_cols = {'Product_Name', 'Week', 'Year', 'Week_Number', 'Total_Quantity'}
@@ -265,52 +756,214 @@ class PredictionService:
         if missing:
             raise ValueError(f"Missing required columns in data: {missing}")
         
-        print(f"\n🔍 Processing {len(self.selected_medicines)} medicines...")
-        
-        for medicine_name in self.selected_medicines:
-            print(f"\n📄 Processing: {medicine_name}")
+        # One snapshot of the manifest for the whole run
+        xgb_medicines = self.xgb_medicines
+        lstm_medicines = self.lstm_medicines
+        sarimax_medicines = self.sarimax_medicines
+        if medicine_ids is not None:
+            dirty = {
+                name for (name,) in db.query(Medicine.medicine_name).filter(
+                    Medicine.medicine_id.in_(list(medicine_ids))
+                ).all()
+            } if medicine_ids else set()
+            xgb_medicines = [n for n in xgb_medicines if n in dirty]
+            lstm_medicines = [n for n in lstm_medicines if n in dirty]
+            sarimax_medicines = [n for n in sarimax_medicines if n in dirty]
+        
+        # Medicines no model serves get a statistical forecast
+        fallback_medicines = []
+        if settings.FALLBACK_FORECAST_ENABLED:
+            query = db.query(Medicine.medicine_name)
+            if medicine_ids is not None:
+                query = query.filter(Medicine.medicine_id.in_(list(medicine_ids)))
+            fallback_medicines = [
+                name for (name,) in query.order_by(Medicine.medicine_id).all()
+                if self.manifest.get(name) is None
+            ] if medicine_ids is None or medicine_ids else []
+        selected_medicines = xgb_medicines + lstm_medicines + sarimax_medicines + fallback_medicines
+        
+        print(f"\n🔍 Processing {len(selected_medicines)} medicines...")
+        
+        # Stored weeks fill in the history a small incremental upload lacks
+        if settings.FORECAST_HISTORY_WEEKS > 0:
+            df = SalesHistory.merge(SalesHistory.load(db, selected_medicines), df)
+        
+        total = len(selected_medicines)
+        report_progress = progress_callback or (lambda processed, total: None)
+        horizon = max(1, horizon)
+        
+        # Medicines whose model and inputs are unchanged reuse their last forecast
+        cache_keys = {}
+        cached = {}
+        if settings.FORECAST_CACHE_ENABLED:
+            cache_keys = self.forecast_cache_keys(selected_medicines, df, db, horizon)
+            cached = forecast_cache.lookup(db, cache_keys)
+            if cached:
+                print(f"♻️ {len(cached)} forecasts served from cache")
+        xgb_pending = [n for n in xgb_medicines if n not in cached]
+        lstm_pending = [n for n in lstm_medicines if n not in cached]
+        sarimax_pending = [n for n in sarimax_medicines if n not in cached]
+        fallback_pending = [n for n in fallback_medicines if n not in cached]
+        
+        # Large catalogs are split across the worker pool when enabled
+        pool = None
+        if len(xgb_pending) + len(lstm_pending) > settings.FORECAST_CHUNK_SIZE:
+            pool = get_forecast_pool(self.model_dir, xgb_medicines, lstm_medicines)
+        
+        self.timer.add('data_prep', time.perf_counter() - stage_start)
+        stage_start = time.perf_counter()
+        
+        # Each model family is forecast for all its medicines in one batched pass
+        if settings.FEATURE_STORE_ENABLED:
+            # Latest state comes from the feature store; medicines it cannot
+            # serve (no rows yet, legacy XGBoost scaler) use the upload
+            batch_results = self.forecast_xgb_from_store(xgb_pending, db, pool=pool, horizon=horizon)
+            remaining = [n for n in xgb_pending if n not in batch_results]
+            if remaining:
+                batch_results.update(self.forecast_xgb_batch(remaining, df, pool=pool, horizon=horizon))
+            report_progress(len(cached) + len(xgb_pending), total)
             
-            prediction_result = self.forecast_medicine_next_week(medicine_name, df)
+            lstm_results = self.forecast_lstm_from_store(lstm_pending, db, pool=pool, horizon=horizon)
+            remaining = [n for n in lstm_pending if n not in lstm_results]
+            if remaining:
+                lstm_results.update(self.forecast_lstm_batch(remaining, df, pool=pool, horizon=horizon))
+            batch_results.update(lstm_results)
+        else:
+            batch_results = self.forecast_xgb_batch(xgb_pending, df, pool=pool, horizon=horizon)
+            report_progress(len(cached) + len(xgb_pending), total)
+            batch_results.update(self.forecast_lstm_batch(lstm_pending, df, pool=pool, horizon=horizon))
+        if sarimax_pending:
+            batch_results.update(self.forecast_sarimax_batch(sarimax_pending, df, horizon=horizon))
+        if fallback_pending:
+            batch_results.update(self.forecast_fallback_batch(fallback_pending, df, horizon=horizon))
+        report_progress(total, total)
+        # Pool workers keep their own failure records; note what got no forecast
+        for model_type, pending in (('XGBoost', xgb_pending), ('LSTM', lstm_pending)):
+            for medicine_name in pending:
+                if medicine_name not in batch_results:
+                    self.forecast_failures.setdefault(medicine_name, f"{model_type}: no forecast produced")
+        self.timer.split_forecast(time.perf_counter() - stage_start)
+        stage_start = time.perf_counter()
+        fresh_results = list(batch_results)
+        batch_results.update(cached)
+        
+        # One lookup for every medicine that got a forecast
+        medicines = {
+            m.medicine_name: m
+            for m in db.query(Medicine).filter(Medicine.medicine_name.in_(list(batch_results))).all()
+        } if batch_results else {}
+        
+        if settings.FORECAST_CACHE_ENABLED:
+            forecast_cache.store(db, {
+                name: (medicines[name].medicine_id, cache_keys[name], batch_results[name])
+                for name in fresh_results
+                if name in medicines and name in cache_keys
+            })
+        
+        today = datetime.now(timezone.utc).date()
+        
+        run = PredictionRun(
+            run_id=str(uuid.uuid4()),
+            job_id=job_id,
+            trigger=trigger,
+            sku_count=total,
+            cached_forecasts=len(cached),
+            failed_forecasts=len(self.forecast_failures),
+            horizon_weeks=horizon,
+            started_at=started_at
+        )
+        db.add(run)
+        db.flush()
+        
+        prediction_rows = []
+        horizon_rows = []
+        for medicine_name in selected_medicines:
+            prediction_result = batch_results.get(medicine_name)
+            if not prediction_result:
+                continue
             
-            if prediction_result:
-                # Get medicine from DB
-                medicine = db.query(Medicine).filter(
-                    Medicine.medicine_name == medicine_name
-                ).first()
-                
-                if medicine:
-                    predicted_demand = prediction_result['Next_Predicted_Quantity']
-                    last_actual_qty = prediction_result['Last_Actual_Quantity']
-                    
-                    # Calculate reorder level
-                    reorder_level = self.calculate_reorder_level(
-                        predicted_demand,
-                        medicine.safety_stock,
-                        medicine.lead_time_days
-                    )
-                    
-                    # ✅ UPDATE: Store last_actual_quantity in Medicine table
-                    medicine.last_actual_quantity = last_actual_qty
-                    
-                    # Save to predictions table
-                    prediction = Prediction(
-                        medicine_id=medicine.medicine_id,
-                        predicted_demand=predicted_demand,
-                        reorder_level=reorder_level
-                    )
-                    db.add(prediction)
-                    
-                    prediction_result['reorder_level'] = reorder_level
-                    all_predictions.append(prediction_result)
-                    
-                    print(f"   ✅ Prediction: {predicted_demand} units for {prediction_result['Next_Predicted_Week']}")
-                    print(f"   📊 Reorder Level: {reorder_level}")
-                    print(f"   📈 Last Actual Quantity: {last_actual_qty}")
-                else:
-                    print(f"   ⚠️ Medicine '{medicine_name}' not found in database")
+            medicine = medicines.get(medicine_name)
+            if not medicine:
+                print(f"⚠️ Medicine '{medicine_name}' not found in database")
+                continue
+            
+            predicted_demand = prediction_result['Next_Predicted_Quantity']
+            
+            # Calculate reorder level
+            reorder_level = self.calculate_reorder_level(
+                predicted_demand,
+                medicine.safety_stock,
+                medicine.lead_time_days
+            )
+            
+            # ✅ UPDATE: Store last_actual_quantity in Medicine table
+            medicine.last_actual_quantity = prediction_result['Last_Actual_Quantity']
+            
+            prediction_rows.append({
+                'medicine_id': medicine.medicine_id,
+                'predicted_demand': predicted_demand,
+                'reorder_level': reorder_level,
+                'prediction_date': today,
+                'run_id': run.run_id,
+            })
+            horizon_rows.extend(
+                {
+                    'medicine_id': medicine.medicine_id,
+                    'model_type': prediction_result['Model_Type'],
+                    'horizon_week': step['Horizon'],
+                    'target_week': step['Week'],
+                    'predicted_demand': step['Predicted_Quantity'],
+                    'prediction_date': today,
+                    'run_id': run.run_id,
+                }
+                for step in prediction_result['Forecast']
+            )
+            
+            prediction_result['reorder_level'] = reorder_level
+            all_predictions.append(prediction_result)
+        
+        # Re-running on the same day replaces that day's rows instead of adding
+        # more, only for medicines that get a new row: the others keep theirs,
+        # which latest_predictions may point at (ON DELETE CASCADE)
+        written_ids = [row['medicine_id'] for row in prediction_rows]
+        if written_ids:
+            db.query(Prediction).filter(
+                Prediction.medicine_id.in_(written_ids),
+                Prediction.prediction_date == today
+            ).delete(synchronize_session=False)
+            db.query(PredictionHorizon).filter(
+                PredictionHorizon.medicine_id.in_(written_ids),
+                PredictionHorizon.prediction_date == today
+            ).delete(synchronize_session=False)
+        
+        # One bulk insert per table; the new ids feed the latest-prediction rows
+        if prediction_rows:
+            prediction_ids = dict(db.execute(
+                insert(Prediction).returning(Prediction.medicine_id, Prediction.prediction_id),
+                prediction_rows
+            ).all())
+            db.execute(insert(PredictionHorizon), horizon_rows)
+            
+            # Latest row per medicine, committed together with the history rows
+            LatestPredictions.upsert(db, [
+                {**row, 'prediction_id': prediction_ids[row['medicine_id']]} for row in prediction_rows
+            ])
+        
+        run.predictions_written = len(prediction_rows)
+        written = time.perf_counter() - stage_start
+        self.timer.add('db_write', written)
+        run.stage_timings = self.timer.report()
+        db.commit()
         
+        # The commit itself is part of the write
+        self.timer.add('db_write', time.perf_counter() - stage_start - written)
+        run.stage_timings = self.timer.report()
+        run.duration_seconds = round(sum(run.stage_timings.values()), 4)
+        run.finished_at = datetime.now(timezone.utc)
         db.commit()
-
+        self.last_run_id = run.run_id
+        
         print(f"\n✅ Successfully generated {len(all_predictions)} predictions!")
+        print(f"⏱️ Run {run.run_id}: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in run.stage_timings.items()))
         
         return all_predictions
\ No newline at end of file
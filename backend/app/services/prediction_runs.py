@@ -0,0 +1,40 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+
+
+# Stages of a prediction run, in order, as recorded in prediction_runs
+RUN_STAGES = ['data_prep', 'feature_build', 'model_load', 'inference', 'db_write']
+
+
+class StageTimer:
+    """
+    Wall time per stage, accumulated over every block timed with it.
+
+    Blocks must not nest: model loading and inference are timed where they
+    happen inside the forecast, and feature building is what remains of
+    the forecast stage (see `split_forecast`).
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def __call__(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] += seconds
+
+    def split_forecast(self, forecast_seconds: float):
+        """Book the part of the forecast not spent loading models or predicting as feature building"""
+        other = self.seconds['model_load'] + self.seconds['inference']
+        self.seconds['feature_build'] += max(forecast_seconds - other, 0.0)
+
+    def report(self) -> Dict[str, float]:
+        return {stage: round(self.seconds.get(stage, 0.0), 4) for stage in RUN_STAGES}
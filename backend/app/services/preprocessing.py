@@ -0,0 +1,204 @@
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+ARTIFACT_FILES = {
+    'xgboost': 'xgboost_{name}.preprocess.json',
+    'lstm': 'lstm_{name}.preprocess.json',
+}
+
+
+class PreprocessingArtifact:
+    """
+    Fitted scaler parameters and input schema stored next to a model.
+
+    `transform` applies the saved parameters with the same arithmetic as
+    sklearn's StandardScaler ("standard": (X - mean) / std) and
+    MinMaxScaler ("minmax": X * scale + min), so no refit is needed.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(
+        self,
+        model_type: str,
+        scaler: str,
+        params: Dict[str, List[float]],
+        feature_columns: List[str],
+        window_size: int,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.model_type = model_type
+        if scaler not in ('standard', 'minmax'):
+            raise ValueError(f"Unknown scaler type: {scaler}")
+        self.scaler = scaler
+        self.params = {k: np.asarray(v, dtype=float) for k, v in params.items()}
+        self.feature_columns = list(feature_columns)
+        self.window_size = int(window_size)
+        self.metadata = metadata or {}
+
+    def transform(self, X) -> np.ndarray:
+        """Scale raw model inputs"""
+        X = np.asarray(X, dtype=float)
+        if self.scaler == 'standard':
+            return (X - self.params['mean']) / self.params['std']
+        return X * self.params['scale'] + self.params['min']
+
+    def inverse_transform(self, X) -> np.ndarray:
+        """Map scaled values back to the original units"""
+        X = np.asarray(X, dtype=float)
+        if self.scaler == 'standard':
+            return X * self.params['std'] + self.params['mean']
+        return (X - self.params['min']) / self.params['scale']
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format_version': self.FORMAT_VERSION,
+            'model_type': self.model_type,
+            'scaler': self.scaler,
+            'params': {k: v.tolist() for k, v in self.params.items()},
+            'feature_columns': self.feature_columns,
+            'window_size': self.window_size,
+            'metadata': self.metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PreprocessingArtifact":
+        if data.get('format_version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported preprocessing format: {data.get('format_version')}")
+        return cls(
+            model_type=data['model_type'],
+            scaler=data['scaler'],
+            params=data['params'],
+            feature_columns=data['feature_columns'],
+            window_size=data['window_size'],
+            metadata=data.get('metadata'),
+        )
+
+    def save(self, path: str):
+        """Write the artifact atomically so readers never see a partial file"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "PreprocessingArtifact":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def atomic_write(path: str, write):
+    """Call `write(tmp_path)` on a temporary file next to `path`, then move it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    # Keep the extension last: XGBoost and Keras pick the save format from it
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp' + os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def transform_rows(artifacts: List[PreprocessingArtifact], X) -> np.ndarray:
+    """
+    Scale row i of `X` with `artifacts[i]`, all rows at once.
+
+    The artifacts must share a scaler type; the arithmetic is the same as
+    calling each artifact's `transform` on its own row.
+    """
+    X = np.asarray(X, dtype=float)
+    scaler = artifacts[0].scaler
+    if any(a.scaler != scaler for a in artifacts):
+        raise ValueError("transform_rows needs artifacts with the same scaler type")
+    if scaler == 'standard':
+        mean = np.stack([a.params['mean'] for a in artifacts])
+        std = np.stack([a.params['std'] for a in artifacts])
+        return (X - mean) / std
+    scale = np.stack([a.params['scale'] for a in artifacts])
+    offset = np.stack([a.params['min'] for a in artifacts])
+    return X * scale + offset
+
+
+def artifact_path(model_dir: str, model_type: str, medicine_name: str) -> str:
+    """Path of the preprocessing artifact stored next to a model"""
+    return os.path.join(model_dir, ARTIFACT_FILES[model_type].format(name=medicine_name))
+
+
+def fit_xgb_artifact(X_train, feature_columns: List[str], window_size: int = 12) -> PreprocessingArtifact:
+    """Fit the StandardScaler used by the XGBoost models on their training features"""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler().fit(np.asarray(X_train, dtype=float))
+    return PreprocessingArtifact(
+        model_type='xgboost',
+        scaler='standard',
+        params={'mean': scaler.mean_, 'std': scaler.scale_},
+        feature_columns=feature_columns,
+        window_size=window_size,
+        metadata={'n_samples': int(scaler.n_samples_seen_)},
+    )
+
+
+def fit_lstm_artifact(quantities, window_size: int = 4) -> PreprocessingArtifact:
+    """Fit the MinMaxScaler used by the LSTM models on Total_Quantity"""
+    from sklearn.preprocessing import MinMaxScaler
+
+    scaler = MinMaxScaler().fit(np.asarray(quantities, dtype=float).reshape(-1, 1))
+    return PreprocessingArtifact(
+        model_type='lstm',
+        scaler='minmax',
+        params={'scale': scaler.scale_, 'min': scaler.min_},
+        feature_columns=['Total_Quantity'],
+        window_size=window_size,
+        metadata={
+            'data_min': float(scaler.data_min_[0]),
+            'data_max': float(scaler.data_max_[0]),
+            'n_samples': int(scaler.n_samples_seen_),
+        },
+    )
+
+
+def export_artifacts(df, model_dir: str, xgb_medicines: List[str], lstm_medicines: List[str]) -> Dict[str, str]:
+    """
+    Fit and save preprocessing artifacts for existing models from a weekly dataset.
+
+    `df` has the upload columns (Product_Name, Week, Year, Week_Number,
+    Total_Quantity), normally the dataset the models were trained on.
+    Returns {medicine_name: artifact path} for every artifact written.
+    """
+    from app.services.feature_engine import build_feature_frame, feature_columns
+
+    written = {}
+
+    features = build_feature_frame(df[df['Product_Name'].isin(xgb_medicines)])
+    feature_cols = feature_columns(features)
+    for medicine_name, X_train in features.groupby('Product_Name', sort=False):
+        artifact = fit_xgb_artifact(X_train[feature_cols], feature_cols)
+        path = artifact_path(model_dir, 'xgboost', medicine_name)
+        artifact.save(path)
+        written[medicine_name] = path
+
+    weekly = (df[df['Product_Name'].isin(lstm_medicines)]
+              .groupby(['Product_Name', 'Year', 'Week_Number'], as_index=False)['Total_Quantity']
+              .sum())
+    for medicine_name, history in weekly.groupby('Product_Name', sort=False):
+        artifact = fit_lstm_artifact(history['Total_Quantity'].to_numpy())
+        path = artifact_path(model_dir, 'lstm', medicine_name)
+        artifact.save(path)
+        written[medicine_name] = path
+
+    return written
@@ -0,0 +1,93 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Medicine, SalesData
+
+
+# Upload columns a forecast reads
+UPLOAD_COLUMNS = ['Product_Name', 'Week', 'Year', 'Week_Number', 'Total_Quantity']
+WEEK_KEY_COLUMNS = ['Product_Name', 'Year', 'Week_Number']
+
+
+class SalesHistory:
+    """
+    Weekly sales history of many medicines read from `sales_data`, in the
+    upload's frame format.
+
+    Lets a small incremental upload be forecast with the full trailing
+    window that is already stored.
+    """
+
+    @staticmethod
+    def load(db: Session, medicine_names: List[str], weeks: int = settings.FORECAST_HISTORY_WEEKS) -> pd.DataFrame:
+        """
+        Last `weeks` weeks of each medicine, ordered by (medicine, year, week).
+
+        One Core query (weekly sums ranked per medicine with a window
+        function) whose integer rows go straight into NumPy columns; no ORM
+        objects are built.
+        """
+        if not medicine_names or weeks <= 0:
+            return pd.DataFrame(columns=UPLOAD_COLUMNS)
+
+        names = dict(db.execute(
+            select(Medicine.medicine_id, Medicine.medicine_name).where(Medicine.medicine_name.in_(medicine_names))
+        ).all())
+        if not names:
+            return pd.DataFrame(columns=UPLOAD_COLUMNS)
+
+        weekly = select(
+            SalesData.medicine_id,
+            SalesData.year,
+            SalesData.week_number,
+            func.sum(SalesData.quantity_sold).label('quantity'),
+            func.row_number().over(
+                partition_by=SalesData.medicine_id,
+                order_by=(SalesData.year.desc(), SalesData.week_number.desc())
+            ).label('recency')
+        ).where(
+            SalesData.medicine_id.in_(list(names))
+        ).group_by(SalesData.medicine_id, SalesData.year, SalesData.week_number).subquery()
+
+        rows = db.execute(
+            select(weekly.c.medicine_id, weekly.c.year, weekly.c.week_number, weekly.c.quantity)
+            .where(weekly.c.recency <= weeks)
+            .order_by(weekly.c.medicine_id, weekly.c.year, weekly.c.week_number)
+        ).all()
+        if not rows:
+            return pd.DataFrame(columns=UPLOAD_COLUMNS)
+
+        data = np.array(rows, dtype=np.int64)
+        medicine_id, year, week_number, quantity = data.T
+        ids, positions = np.unique(medicine_id, return_inverse=True)
+        return pd.DataFrame({
+            'Product_Name': np.array([names[i] for i in ids], dtype=object)[positions],
+            'Week': [f"{y}-W{w:02d}" for y, w in zip(year, week_number)],
+            'Year': year,
+            'Week_Number': week_number,
+            'Total_Quantity': quantity,
+        })
+
+    @staticmethod
+    def merge(history: pd.DataFrame, upload: pd.DataFrame) -> pd.DataFrame:
+        """
+        Stored history plus an uploaded frame; where both have a product's
+        week, the uploaded rows win. Keeps the upload's column order.
+        """
+        columns = [c for c in upload.columns if c in UPLOAD_COLUMNS]
+        upload = upload[columns]
+        if history.empty:
+            return upload
+
+        uploaded = pd.MultiIndex.from_frame(upload[WEEK_KEY_COLUMNS].astype({'Year': int, 'Week_Number': int}))
+        stored = pd.MultiIndex.from_frame(history[WEEK_KEY_COLUMNS])
+        history = history.loc[~stored.isin(uploaded), columns]
+
+        return pd.concat([history, upload], ignore_index=True).sort_values(
+            WEEK_KEY_COLUMNS, kind='mergesort'
+        ).reset_index(drop=True)
@@ -0,0 +1,255 @@
+import csv
+import io
+from typing import Any, Dict, List, Set, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, case, desc, func, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+from app.models import Medicine, SalesData
+
+
+# Rows per INSERT statement when COPY is not available
+STAGING_CHUNK_ROWS = 1000
+
+UNIQUE_WEEK_INDEX = "uq_sales_data_medicine_week"
+
+# Per-transaction scratch table; kept out of Base.metadata so create_all skips it
+_staging_metadata = MetaData()
+sales_staging = Table(
+    "sales_staging", _staging_metadata,
+    Column("row_no", Integer, nullable=False),  # position in the file, later rows win
+    Column("product_name", Text, nullable=False),
+    Column("year", Integer, nullable=False),
+    Column("week_number", Integer, nullable=False),
+    Column("week_identifier", String(10), nullable=False),
+    Column("quantity", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+)
+STAGING_COLUMNS = [c.name for c in sales_staging.columns]
+
+
+def _dialect_insert(db: Session):
+    """INSERT construct with ON CONFLICT support for the session's database"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+class SalesIngest:
+    """
+    Set-based upload of weekly sales.
+
+    The cleaned frame is bulk-loaded into a temporary staging table
+    (PostgreSQL COPY, multi-row INSERTs elsewhere) and applied with a
+    fixed number of statements however many rows the file has: one
+    classification query, one INSERT ... ON CONFLICT merge into
+    sales_data and one aggregated UPDATE of the medicines' stock.
+    """
+
+    @staticmethod
+    def stage(db: Session, df) -> int:
+        """
+        Load (Product_Name, Year, Week_Number, Total_Quantity) rows, already
+        validated as numeric, into a fresh staging table on the session's
+        connection. Returns the number of rows staged.
+        """
+        conn = db.connection()
+        conn.execute(text(f"DROP TABLE IF EXISTS {sales_staging.name}"))
+        sales_staging.create(conn)
+
+        year = df["Year"].astype(int)
+        week_number = df["Week_Number"].astype(int)
+        columns = [
+            range(len(df)),
+            df["Product_Name"].astype(str).str.strip().tolist(),
+            year.tolist(),
+            week_number.tolist(),
+            (year.astype(str) + "-W" + week_number.astype(str).str.zfill(2)).tolist(),
+            df["Total_Quantity"].astype(int).tolist(),
+        ]
+        rows = list(zip(*columns))
+        if not rows:
+            return 0
+
+        column_list = ", ".join(STAGING_COLUMNS)
+        if conn.dialect.name == "postgresql":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            with conn.connection.dbapi_connection.cursor() as cursor:
+                cursor.copy_expert(f"COPY {sales_staging.name} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            # Plain DBAPI statements; compiling a Core insert per chunk costs more than running it
+            marker = "%s" if conn.dialect.paramstyle in ("format", "pyformat") else "?"
+            values = "(" + ", ".join([marker] * len(STAGING_COLUMNS)) + ")"
+            for start in range(0, len(rows), STAGING_CHUNK_ROWS):
+                chunk = rows[start:start + STAGING_CHUNK_ROWS]
+                conn.exec_driver_sql(
+                    f"INSERT INTO {sales_staging.name} ({column_list}) VALUES {', '.join([values] * len(chunk))}",
+                    tuple(value for row in chunk for value in row)
+                )
+        return len(rows)
+
+    @staticmethod
+    def merge(db: Session) -> Dict[str, Any]:
+        """
+        Apply the staged rows: upsert one sales_data row per medicine and
+        week (the last one in the file wins), decrement each medicine's
+        stock by all of its staged quantities (not below 0) and set its
+        last actual quantity to its latest week. Products without a
+        medicine are skipped. The caller commits.
+        """
+        staging = sales_staging
+
+        skipped = [name for (name,) in db.execute(
+            select(staging.c.product_name).distinct()
+            .outerjoin(Medicine, Medicine.medicine_name == staging.c.product_name)
+            .where(Medicine.medicine_id.is_(None))
+            .order_by(staging.c.product_name)
+        )]
+        stock_rows = db.execute(
+            select(func.count()).select_from(staging)
+            .join(Medicine, Medicine.medicine_name == staging.c.product_name)
+        ).scalar()
+
+        # One row per medicine and week, the file's last
+        rank = func.row_number().over(
+            partition_by=(staging.c.product_name, staging.c.week_identifier),
+            order_by=desc(staging.c.row_no)
+        ).label("rank")
+        ranked = select(staging, rank).subquery()
+        weekly = select(
+            Medicine.medicine_id,
+            ranked.c.quantity.label("quantity_sold"),
+            ranked.c.week_identifier,
+            ranked.c.year,
+            ranked.c.week_number,
+        ).join(Medicine, Medicine.medicine_name == ranked.c.product_name).where(ranked.c.rank == 1).subquery()
+
+        # Weeks that are new or change quantity, before the merge overwrites them
+        changed = db.execute(
+            select(weekly.c.medicine_id, weekly.c.year, weekly.c.week_number, SalesData.sales_id)
+            .outerjoin(SalesData, (SalesData.medicine_id == weekly.c.medicine_id)
+                       & (SalesData.week_identifier == weekly.c.week_identifier))
+            .where(SalesData.sales_id.is_(None) | (SalesData.quantity_sold != weekly.c.quantity_sold))
+        ).all()
+        changed_weeks: Set[Tuple[int, int, int]] = {(m, y, w) for m, y, w, _ in changed}
+        inserted = [m for m, _, _, sales_id in changed if sales_id is None]
+        updated = [m for m, _, _, sales_id in changed if sales_id is not None]
+
+        insert = _dialect_insert(db)
+        merge = insert(SalesData).from_select(
+            ["medicine_id", "quantity_sold", "week_identifier", "year", "week_number"],
+            # SQLite needs a WHERE here to tell ON CONFLICT from a join constraint
+            select(weekly).where(weekly.c.medicine_id.is_not(None))
+        )
+        merge = merge.on_conflict_do_update(
+            index_elements=["medicine_id", "week_identifier"],
+            set_={"quantity_sold": merge.excluded.quantity_sold},
+            where=SalesData.quantity_sold != merge.excluded.quantity_sold
+        )
+        db.execute(merge)
+
+        # Stock moves by every row of the file; the last actual quantity is the latest week's
+        latest = func.row_number().over(
+            partition_by=staging.c.product_name,
+            order_by=(desc(staging.c.year), desc(staging.c.week_number), desc(staging.c.row_no))
+        ).label("latest")
+        per_product = select(
+            staging.c.product_name,
+            staging.c.quantity,
+            func.sum(staging.c.quantity).over(partition_by=staging.c.product_name).label("total"),
+            latest
+        ).subquery()
+        totals = select(per_product).where(per_product.c.latest == 1).subquery()
+        remaining = func.coalesce(Medicine.current_stock, 0) - totals.c.total
+        stock_ids = [medicine_id for (medicine_id,) in db.execute(
+            update(Medicine)
+            .where(Medicine.medicine_name == totals.c.product_name)
+            .values(
+                current_stock=case((remaining < 0, 0), else_=remaining),
+                last_actual_quantity=totals.c.quantity
+            )
+            .returning(Medicine.medicine_id),
+            execution_options={"synchronize_session": False}
+        )]
+
+        db.execute(text(f"DROP TABLE IF EXISTS {staging.name}"))
+
+        return {
+            "sales_inserted": len(inserted),
+            "sales_updated": len(updated),
+            "stock_updated": stock_rows,
+            "skipped_products": skipped,
+            "changed_weeks": changed_weeks,
+            "inserted_ids": set(inserted),
+            "updated_ids": set(updated),
+            "stock_ids": set(stock_ids),
+        }
+
+    @staticmethod
+    def ingest(db: Session, df) -> Dict[str, Any]:
+        """Stage and merge an upload in the session's transaction. The caller commits."""
+        SalesIngest.stage(db, df)
+        return SalesIngest.merge(db)
+
+
+def _has_unique_sales_weeks(engine) -> bool:
+    inspector = inspect(engine)
+    unique = [c["column_names"] for c in inspector.get_unique_constraints(SalesData.__tablename__)]
+    unique += [i["column_names"] for i in inspector.get_indexes(SalesData.__tablename__) if i["unique"]]
+    return any(set(columns) == {"medicine_id", "week_identifier"} for columns in unique)
+
+
+def _duplicate_sales_weeks():
+    """sales_data rows that are not the newest row of their medicine and week"""
+    newest = select(func.max(SalesData.sales_id)).group_by(SalesData.medicine_id, SalesData.week_identifier)
+    return SalesData.sales_id.not_in(newest.scalar_subquery())
+
+
+def find_duplicate_sales_weeks(conn) -> List[Dict[str, Any]]:
+    """Duplicate week rows the unique index would not allow, oldest first"""
+    return [dict(row) for row in conn.execute(
+        select(SalesData.__table__).where(_duplicate_sales_weeks()).order_by(SalesData.sales_id)
+    ).mappings()]
+
+
+def remove_duplicate_sales_weeks(engine) -> List[Dict[str, Any]]:
+    """
+    Delete duplicate weeks left by the old row-by-row upload, keeping the
+    newest row (highest sales_id) of each medicine and week. Returns the
+    deleted rows.
+    """
+    with engine.begin() as conn:
+        removed = find_duplicate_sales_weeks(conn)
+        if removed:
+            conn.execute(SalesData.__table__.delete().where(_duplicate_sales_weeks()))
+    return removed
+
+
+def ensure_unique_sales_weeks(engine) -> bool:
+    """
+    Give sales_data tables created before the (medicine_id,
+    week_identifier) unique constraint a unique index, which ON CONFLICT
+    needs. Returns True if the index was added. Tables that still hold
+    duplicate weeks are not changed: a RuntimeError names the script that
+    removes them (dedupe_sales_weeks.py), with a backup.
+    """
+    if not inspect(engine).has_table(SalesData.__tablename__) or _has_unique_sales_weeks(engine):
+        return False
+
+    with engine.begin() as conn:
+        duplicates = conn.execute(
+            select(func.count()).select_from(SalesData.__table__).where(_duplicate_sales_weeks())
+        ).scalar()
+        if duplicates:
+            raise RuntimeError(
+                f"sales_data has {duplicates} duplicate (medicine_id, week_identifier) rows; run "
+                f"DemandForecast/scripts/dedupe_sales_weeks.py to review and remove them before starting"
+            )
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX {UNIQUE_WEEK_INDEX} ON {SalesData.__tablename__} (medicine_id, week_identifier)"
+        ))
+    return True
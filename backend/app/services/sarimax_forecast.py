@@ -0,0 +1,276 @@
+import json
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.model_manifest import MODEL_FILE_PATTERNS
+from app.services.preprocessing import atomic_write
+
+
+# Same specification as DemandForecast/scripts/forecast_data.py
+SARIMAX_ORDER = (1, 1, 1)
+SARIMAX_SEASONAL_ORDER = (1, 1, 1, 12)
+SARIMAX_MIN_WEEKS = 26
+
+# Journal of scheduled refits; not a model file, so discovery skips it
+REFIT_JOURNAL = 'sarimax_refits.jsonl'
+
+
+def week_index(year, week_number):
+    """Running week number, 52 weeks a year as in `next_week`"""
+    return np.asarray(year, dtype=int) * 52 + np.asarray(week_number, dtype=int) - 1
+
+
+def _sarimax(endog: np.ndarray, order, seasonal_order):
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    return SARIMAX(endog, order=tuple(order), seasonal_order=tuple(seasonal_order),
+                   enforce_stationarity=False, enforce_invertibility=False)
+
+
+class SarimaxState:
+    """
+    A medicine's fitted SARIMAX model, saved as sarimax_<name>.json.
+
+    Holds the estimated parameters and the Kalman filter's predicted state
+    (mean and covariance) for the week after `last_week`. New weeks are
+    absorbed by filtering only those weeks from that state with the same
+    parameters, as statsmodels' `extend` does, so serving never
+    re-estimates; `fitted_at` records the last full fit.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(
+        self,
+        params: Dict[str, float],
+        state: np.ndarray,
+        state_cov: np.ndarray,
+        last_year: int,
+        last_week: int,
+        nobs: int,
+        fitted_at: str,
+        fitted_nobs: int,
+        order=SARIMAX_ORDER,
+        seasonal_order=SARIMAX_SEASONAL_ORDER,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.params = {k: float(v) for k, v in params.items()}
+        self.state = np.asarray(state, dtype=float)
+        self.state_cov = np.asarray(state_cov, dtype=float)
+        self.last_year = int(last_year)
+        self.last_week = int(last_week)
+        self.nobs = int(nobs)
+        self.fitted_at = fitted_at
+        self.fitted_nobs = int(fitted_nobs)
+        self.order = tuple(order)
+        self.seasonal_order = tuple(seasonal_order)
+        self.metadata = metadata or {}
+
+    @property
+    def week_index(self) -> int:
+        return int(week_index(self.last_year, self.last_week))
+
+    def age_days(self, now: Optional[datetime] = None) -> float:
+        """Days since the parameters were last estimated"""
+        now = now or datetime.now(timezone.utc)
+        return (now - datetime.fromisoformat(self.fitted_at)).total_seconds() / 86400
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format_version': self.FORMAT_VERSION,
+            'order': list(self.order),
+            'seasonal_order': list(self.seasonal_order),
+            'params': self.params,
+            'state': self.state.tolist(),
+            'state_cov': self.state_cov.tolist(),
+            'last_year': self.last_year,
+            'last_week': self.last_week,
+            'nobs': self.nobs,
+            'fitted_at': self.fitted_at,
+            'fitted_nobs': self.fitted_nobs,
+            'metadata': self.metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SarimaxState":
+        if data.get('format_version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported SARIMAX state format: {data.get('format_version')}")
+        return cls(
+            params=data['params'],
+            state=data['state'],
+            state_cov=data['state_cov'],
+            last_year=data['last_year'],
+            last_week=data['last_week'],
+            nobs=data['nobs'],
+            fitted_at=data['fitted_at'],
+            fitted_nobs=data['fitted_nobs'],
+            order=data['order'],
+            seasonal_order=data['seasonal_order'],
+            metadata=data.get('metadata'),
+        )
+
+    def save(self, path: str):
+        """Write the state atomically so readers never see a partial file"""
+        def write(tmp_path):
+            with open(tmp_path, 'w') as f:
+                json.dump(self.to_dict(), f)
+
+        atomic_write(path, write)
+
+    @classmethod
+    def load(cls, path: str) -> "SarimaxState":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def fit_sarimax(series: np.ndarray, last_year: int, last_week: int,
+                order=SARIMAX_ORDER, seasonal_order=SARIMAX_SEASONAL_ORDER) -> SarimaxState:
+    """
+    Estimate a SARIMAX model on weekly quantities (oldest first, ending at
+    `last_year`/`last_week`; leading NaN are dropped, inner NaN are
+    missing weeks). Raises ValueError for too short a series.
+    """
+    series = np.asarray(series, dtype=float)
+    observed = np.flatnonzero(~np.isnan(series))
+    if len(observed) < SARIMAX_MIN_WEEKS:
+        raise ValueError(f"{len(observed)} weeks of history, need {SARIMAX_MIN_WEEKS}")
+    series = series[observed[0]:]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results = _sarimax(series, order, seasonal_order).fit(disp=False)
+    if not np.isfinite(results.params).all():
+        raise ValueError("estimation did not converge to finite parameters")
+
+    return SarimaxState(
+        params=dict(zip(results.model.param_names, results.params)),
+        state=results.predicted_state[:, -1],
+        state_cov=results.predicted_state_cov[:, :, -1],
+        last_year=last_year,
+        last_week=last_week,
+        nobs=len(series),
+        fitted_at=datetime.now(timezone.utc).isoformat(),
+        fitted_nobs=len(series),
+        order=order,
+        seasonal_order=seasonal_order,
+        metadata={'aic': float(results.aic)},
+    )
+
+
+def extend_sarimax(state: SarimaxState, new_obs: np.ndarray, horizon: int = 1) -> Tuple[np.ndarray, SarimaxState]:
+    """
+    Forecast `horizon` weeks after `new_obs`, the weeks that followed the
+    state's last week (NaN for missing ones).
+
+    Only `new_obs` is filtered, starting from the saved state with the
+    saved parameters; the forecast weeks are filtered as missing values,
+    whose one-step predictions are the multi-step forecast. Returns
+    (forecast, state advanced past `new_obs`).
+    """
+    from statsmodels.tsa.statespace.initialization import Initialization
+
+    new_obs = np.asarray(new_obs, dtype=float)
+    k = len(new_obs)
+    model = _sarimax(np.concatenate([new_obs, np.full(horizon, np.nan)]), state.order, state.seasonal_order)
+    model.ssm.initialization = Initialization(model.k_states, 'known', constant=state.state,
+                                              stationary_cov=state.state_cov)
+    params = np.array([state.params[name] for name in model.param_names])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        results = model.filter(params)
+
+    year, week = divmod(state.week_index + k, 52)
+    extended = SarimaxState(
+        params=state.params,
+        state=results.predicted_state[:, k],
+        state_cov=results.predicted_state_cov[:, :, k],
+        last_year=year,
+        last_week=week + 1,
+        nobs=state.nobs + k,
+        fitted_at=state.fitted_at,
+        fitted_nobs=state.fitted_nobs,
+        order=state.order,
+        seasonal_order=state.seasonal_order,
+        metadata=state.metadata,
+    )
+    return np.asarray(results.predict(start=k, end=k + horizon - 1), dtype=float), extended
+
+
+def sarimax_path(model_dir: str, medicine_name: str) -> str:
+    return os.path.join(model_dir, MODEL_FILE_PATTERNS['sarimax'].format(name=medicine_name))
+
+
+def refit_due(model_dir: str, medicine_name: str, max_age_days: float = settings.SARIMAX_REFIT_DAYS) -> bool:
+    """True when a medicine has no SARIMAX state yet or its last full fit is older than `max_age_days`"""
+    path = sarimax_path(model_dir, medicine_name)
+    if not os.path.exists(path):
+        return True
+    try:
+        return SarimaxState.load(path).age_days() >= max_age_days
+    except (OSError, ValueError, KeyError):
+        return True
+
+
+def _refit_task(medicine_name: str, series: np.ndarray, last_year: int, last_week: int,
+                model_dir: str) -> Dict[str, Any]:
+    try:
+        state = fit_sarimax(series, last_year, last_week)
+        state.save(sarimax_path(model_dir, medicine_name))
+    except Exception as e:
+        return {'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+    return {'status': 'fitted', 'nobs': state.nobs, 'aic': round(state.metadata['aic'], 3)}
+
+
+def refit_sarimax_models(tasks: List[Tuple[str, np.ndarray, int, int]], model_dir: str, workers: int = 1,
+                         on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Fully re-estimate (medicine_name, series, last_year, last_week) tasks
+    in `workers` spawned processes and save each state as it finishes.
+
+    A medicine whose fit fails keeps its previous state and is reported in
+    the result ({'status': 'failed', 'error': ...}) and in the refit
+    journal; it never stops the others. Returns results per medicine.
+    """
+    from app.services.training import _init_training_worker
+
+    results = {}
+    journal = open(os.path.join(model_dir, REFIT_JOURNAL), 'a', encoding='utf-8')
+
+    def finish(medicine_name, result):
+        results[medicine_name] = result
+        journal.write(json.dumps({'medicine': medicine_name, 'at': datetime.now(timezone.utc).isoformat(),
+                                  **result}) + '\n')
+        journal.flush()
+        if on_result:
+            on_result(medicine_name, result)
+
+    try:
+        if workers <= 1:
+            for name, series, last_year, last_week in tasks:
+                finish(name, _refit_task(name, series, last_year, last_week, model_dir))
+            return results
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_training_worker, initargs=(1,)) as executor:
+            queue = iter(tasks)
+            running = {}
+            while True:
+                for name, series, last_year, last_week in queue:
+                    running[executor.submit(_refit_task, name, series, last_year, last_week, model_dir)] = name
+                    if len(running) >= workers * 4:
+                        break
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish(running.pop(future), future.result())
+        return results
+    finally:
+        journal.close()
@@ -0,0 +1,348 @@
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.feature_engine import KNOWN_FEATURE_COLUMNS, build_feature_frame
+from app.services.model_manifest import MODEL_FILE_PATTERNS
+from app.services.preprocessing import artifact_path, atomic_write, fit_lstm_artifact, fit_xgb_artifact
+
+
+UPLOAD_COLUMNS = ['Product_Name', 'Week', 'Year', 'Week_Number', 'Total_Quantity']
+CHECKPOINT_FILE = 'training_checkpoint.jsonl'
+
+# Validation weeks pick the number of boosting rounds / epochs; the saved
+# model is then refit on every week
+VALIDATION_WEEKS = 8
+
+XGB_PARAMS = {
+    'n_estimators': 500,
+    'max_depth': 4,
+    'learning_rate': 0.05,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'early_stopping_rounds': 50,
+}
+LSTM_PARAMS = {
+    'window_size': 4,
+    'units': 64,
+    'dropout': 0.1,
+    'activation': 'relu',
+    'optimizer': 'Adam',
+    'epochs': 100,
+    'batch_size': 16,
+    'patience': 10,
+    'learning_rate': 0.001,
+}
+MIN_TRAINING_WEEKS = 26
+
+
+def xgb_training_sets(df: pd.DataFrame, medicine_names: List[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    (X, y) per medicine, features in KNOWN_FEATURE_COLUMNS order built in
+    one pass over the dataset with the serving feature code
+    """
+    features = build_feature_frame(df[df['Product_Name'].isin(medicine_names)][UPLOAD_COLUMNS])
+    X = features[KNOWN_FEATURE_COLUMNS].to_numpy(dtype=float)
+    y = features['Total_Quantity'].to_numpy(dtype=float)
+    return {
+        name: (X[rows], y[rows])
+        for name, rows in features.groupby('Product_Name', sort=False).indices.items()
+    }
+
+
+def lstm_training_series(df: pd.DataFrame, medicine_names: List[str]) -> Dict[str, np.ndarray]:
+    """Weekly quantities per medicine, oldest first, aggregated as the LSTM serving path does"""
+    weekly = (df[df['Product_Name'].isin(medicine_names)]
+              .groupby(['Product_Name', 'Year', 'Week_Number'], as_index=False)['Total_Quantity']
+              .sum()
+              .sort_values(['Product_Name', 'Year', 'Week_Number']))
+    quantity = weekly['Total_Quantity'].to_numpy(dtype=float)
+    return {
+        name: quantity[rows]
+        for name, rows in weekly.groupby('Product_Name', sort=False).indices.items()
+    }
+
+
+def lstm_windows(series: np.ndarray, window_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(samples, window_size, 1) input windows and the value following each"""
+    windows = np.lib.stride_tricks.sliding_window_view(series[:-1], window_size)
+    return windows[..., None].astype(np.float32), series[window_size:].astype(np.float32)
+
+
+def train_xgb_medicine(medicine_name: str, X: np.ndarray, y: np.ndarray, model_dir: str,
+                       params: Optional[Dict[str, Any]] = None, threads: int = 1) -> Dict[str, Any]:
+    """
+    Fit one medicine's XGBoost model and save it with its preprocessing
+    artifact, in the files PredictionService serves. Returns metrics.
+    """
+    from xgboost import XGBRegressor
+
+    params = {**XGB_PARAMS, **(params or {})}
+    if len(X) < MIN_TRAINING_WEEKS:
+        return {'status': 'skipped', 'reason': f"{len(X)} feature rows, need {MIN_TRAINING_WEEKS}"}
+
+    artifact = fit_xgb_artifact(X, KNOWN_FEATURE_COLUMNS)
+    X_scaled = artifact.transform(X)
+    split = len(X) - VALIDATION_WEEKS
+
+    model = XGBRegressor(**params, n_jobs=threads)
+    model.fit(X_scaled[:split], y[:split], eval_set=[(X_scaled[split:], y[split:])], verbose=False)
+    rounds = model.best_iteration + 1
+    val_mae = float(np.abs(model.predict(X_scaled[split:], iteration_range=(0, rounds)) - y[split:]).mean())
+
+    refit_params = {k: v for k, v in params.items() if k != 'early_stopping_rounds'}
+    model = XGBRegressor(**{**refit_params, 'n_estimators': rounds}, n_jobs=threads)
+    model.fit(X_scaled, y, verbose=False)
+
+    # Artifact first: a reader that sees the new model also sees its scaler
+    artifact.save(artifact_path(model_dir, 'xgboost', medicine_name))
+    atomic_write(os.path.join(model_dir, MODEL_FILE_PATTERNS['xgboost'].format(name=medicine_name)),
+                 model.save_model)
+    return {'status': 'trained', 'rows': int(len(X)), 'rounds': int(rounds), 'val_mae': round(val_mae, 3)}
+
+
+def _lstm_model(params: Dict[str, Any]):
+    import keras
+
+    model = keras.Sequential([
+        keras.Input((int(params['window_size']), 1)),
+        keras.layers.LSTM(int(params['units']), activation=params['activation']),
+        keras.layers.Dropout(float(params['dropout'])),
+        keras.layers.Dense(1),
+    ])
+    optimizer = getattr(keras.optimizers, params['optimizer'])(learning_rate=float(params['learning_rate']))
+    model.compile(optimizer=optimizer, loss='mse')
+    return model
+
+
+def _lstm_dataset(quantities: np.ndarray, window_size: int):
+    """Scaler artifact, scaled windows/targets and the index where validation weeks start"""
+    artifact = fit_lstm_artifact(quantities, window_size=window_size)
+    scaled = artifact.transform(quantities.reshape(-1, 1))[:, 0]
+    X, y = lstm_windows(scaled, window_size)
+    return artifact, X, y, len(X) - VALIDATION_WEEKS
+
+
+def lstm_trial(quantities: np.ndarray, params: Dict[str, Any], epochs: int, seed: int = 0) -> float:
+    """
+    Validation MAE (original units) of an LSTM config trained for exactly
+    `epochs` epochs on all but the last VALIDATION_WEEKS weeks
+    """
+    import keras
+
+    params = {**LSTM_PARAMS, **params}
+    artifact, X, y, split = _lstm_dataset(quantities, int(params['window_size']))
+    # Trials run back to back in one worker; drop the previous trial's graphs
+    keras.backend.clear_session()
+    keras.utils.set_random_seed(seed)
+    model = _lstm_model(params)
+    model.fit(X[:split], y[:split], epochs=epochs, batch_size=int(params['batch_size']), shuffle=False, verbose=0)
+    predicted = artifact.inverse_transform(model.predict(X[split:], verbose=0))[:, 0]
+    return float(np.abs(predicted - quantities[int(params['window_size']) + split:]).mean())
+
+
+def train_lstm_medicine(medicine_name: str, quantities: np.ndarray, model_dir: str,
+                        params: Optional[Dict[str, Any]] = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Fit one medicine's LSTM and save its .keras model, exported .npz
+    weights and preprocessing artifact. Returns metrics.
+    """
+    import keras
+    from app.services.lstm_numpy import export_keras_lstm, parity_error
+
+    params = {**LSTM_PARAMS, **(params or {})}
+    window_size = int(params['window_size'])
+    if len(quantities) < MIN_TRAINING_WEEKS:
+        return {'status': 'skipped', 'reason': f"{len(quantities)} weeks, need {MIN_TRAINING_WEEKS}"}
+
+    artifact, X, y, split = _lstm_dataset(quantities, window_size)
+
+    keras.utils.set_random_seed(seed)
+    model = _lstm_model(params)
+    stop = keras.callbacks.EarlyStopping(patience=int(params['patience']), restore_best_weights=True)
+    history = model.fit(X[:split], y[:split], validation_data=(X[split:], y[split:]),
+                        epochs=int(params['epochs']), batch_size=int(params['batch_size']),
+                        shuffle=False, callbacks=[stop], verbose=0)
+    epochs = int(np.argmin(history.history['val_loss'])) + 1
+    predicted = artifact.inverse_transform(model.predict(X[split:], verbose=0))[:, 0]
+    val_mae = float(np.abs(predicted - quantities[window_size + split:]).mean())
+
+    keras.utils.set_random_seed(seed)
+    model = _lstm_model(params)
+    model.fit(X, y, epochs=epochs, batch_size=int(params['batch_size']), shuffle=False, verbose=0)
+
+    numpy_model = export_keras_lstm(model)
+    error = parity_error(model, numpy_model)
+    if error > 1e-4:
+        raise ValueError(f"NumPy export differs from Keras by {error:.2e}")
+
+    keras_path = os.path.join(model_dir, MODEL_FILE_PATTERNS['lstm'].format(name=medicine_name))
+    artifact.save(artifact_path(model_dir, 'lstm', medicine_name))
+    atomic_write(keras_path, model.save)
+    numpy_model.save(os.path.splitext(keras_path)[0] + '.npz')
+    return {'status': 'trained', 'weeks': int(len(quantities)), 'epochs': epochs, 'val_mae': round(val_mae, 3)}
+
+
+def run_fingerprint(df: pd.DataFrame, config: Dict[str, Any]) -> str:
+    """Digest of the dataset and training configuration a checkpoint belongs to"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pd.util.hash_pandas_object(df[UPLOAD_COLUMNS], index=False).to_numpy().tobytes())
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class TrainingCheckpoint:
+    """
+    Append-only journal of finished medicines, so an interrupted run
+    resumes where it stopped.
+
+    The first line records the run fingerprint; every later line is one
+    finished (family, medicine). A journal for another dataset or config
+    is started over, and a partly written last line is ignored.
+    Failed medicines are retried on resume.
+    """
+
+    def __init__(self, path: str, fingerprint: str, restart: bool = False):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.done: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        if not restart and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            header = self._parse(lines[0]) if lines else None
+            if header and header.get('fingerprint') == fingerprint:
+                for line in lines[1:]:
+                    record = self._parse(line)
+                    if record and record['status'] != 'failed':
+                        self.done[(record['family'], record['medicine'])] = record
+                self._file = open(path, 'a', encoding='utf-8')
+                if self._parse(lines[-1]) is None:
+                    self._file.write('\n')
+                return
+            print("⚠️ Checkpoint is for another dataset or configuration, starting over")
+
+        self._file = open(path, 'w', encoding='utf-8')
+        self._write({'fingerprint': fingerprint})
+
+    @staticmethod
+    def _parse(line: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def is_done(self, family: str, medicine_name: str) -> bool:
+        return (family, medicine_name) in self.done
+
+    def record(self, family: str, medicine_name: str, result: Dict[str, Any]):
+        entry = {'family': family, 'medicine': medicine_name, **result}
+        if result['status'] != 'failed':
+            self.done[(family, medicine_name)] = entry
+        self._write(entry)
+
+    def close(self):
+        self._file.close()
+
+
+_worker_threads = 1
+
+
+def _init_training_worker(threads: int):
+    """Pool initializer: cap BLAS/OpenMP/TensorFlow threads so workers don't oversubscribe"""
+    global _worker_threads
+    _worker_threads = threads
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        os.environ[var] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+
+def _cap_tensorflow_threads(threads: int):
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        # Runtime already initialized in this process; the caps still hold from the env
+        pass
+
+
+def _train_task(family: str, medicine_name: str, data, model_dir: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        if family == 'xgboost':
+            X, y = data
+            return train_xgb_medicine(medicine_name, X, y, model_dir, params, threads=_worker_threads)
+        _cap_tensorflow_threads(_worker_threads)
+        return train_lstm_medicine(medicine_name, data, model_dir, params)
+    except Exception as e:
+        return {'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+
+
+def train_models(tasks: List[Tuple[str, str, Any]], model_dir: str, checkpoint: TrainingCheckpoint,
+                 params: Dict[str, Dict[str, Any]], workers: int = 1, threads_per_worker: int = 1,
+                 on_result: Optional[Callable[[str, str, Dict[str, Any]], None]] = None,
+                 overrides: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None) -> Dict[str, int]:
+    """
+    Train (family, medicine_name, data) tasks not yet in the checkpoint,
+    in `workers` spawned processes (in this process when workers is 1).
+
+    `overrides` maps (family, medicine_name) to parameters that replace
+    the family's `params` for that medicine, e.g. a searched LSTM config.
+    Every result is journaled as soon as it arrives. Returns counts per
+    status.
+    """
+    overrides = overrides or {}
+    task_params = lambda family, name: {**params[family], **overrides.get((family, name), {})}
+    pending = [t for t in tasks if not checkpoint.is_done(t[0], t[1])]
+    counts = {'resumed': len(tasks) - len(pending), 'trained': 0, 'skipped': 0, 'failed': 0}
+
+    def finish(family, medicine_name, result):
+        checkpoint.record(family, medicine_name, result)
+        counts[result['status']] += 1
+        if on_result:
+            on_result(family, medicine_name, result)
+
+    if workers <= 1:
+        _init_training_worker(threads_per_worker)
+        for family, medicine_name, data in pending:
+            finish(family, medicine_name, _train_task(family, medicine_name, data, model_dir,
+                                                task_params(family, medicine_name)))
+        return counts
+
+    # fork would copy a possibly initialized TensorFlow runtime
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_training_worker, initargs=(threads_per_worker,)) as executor:
+        # A bounded number of tasks in flight keeps pickled inputs small
+        queue = iter(pending)
+        running = {}
+        while True:
+            for family, medicine_name, data in queue:
+                future = executor.submit(_train_task, family, medicine_name, data, model_dir,
+                                         task_params(family, medicine_name))
+                running[future] = (family, medicine_name)
+                if len(running) >= workers * 4:
+                    break
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                family, medicine_name = running.pop(future)
+                finish(family, medicine_name, future.result())
+    return counts
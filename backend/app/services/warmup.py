@@ -0,0 +1,225 @@
+import importlib
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+
+# Reported as loaded/not loaded so cold starts can be checked
+HEAVY_MODULES = ['numpy', 'pandas', 'sklearn', 'xgboost', 'tensorflow', 'keras']
+
+
+def memory_footprint() -> Dict[str, Optional[float]]:
+    """Resident and peak memory of this process in MB (None where the platform does not report it)"""
+    rss_mb = peak_mb = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss_mb = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+
+        # kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+    except ImportError:
+        pass
+    return {
+        'rss_mb': round(rss_mb, 1) if rss_mb is not None else None,
+        'peak_rss_mb': round(peak_mb, 1) if peak_mb is not None else None,
+    }
+
+
+def warm_lstm(predictor, service, names) -> int:
+    """
+    Push one window of zeros per medicine through `predictor.predict_lstm`
+    (the service itself or the worker pool). With Keras models this
+    traces the batched graph of each architecture among `names`, the same
+    graph uploads use whatever medicines they forecast. Returns how many
+    models produced a prediction.
+    """
+    import numpy as np
+
+    if not names:
+        return 0
+    window_sizes = np.array([
+        service._lstm_window_size(service.load_preprocessing('lstm', n)) for n in names
+    ])
+    last_qty = np.zeros((len(names), int(window_sizes.max())))
+    ones, zeros = np.ones(len(names)), np.zeros(len(names))
+    preds = predictor.predict_lstm(names, last_qty, window_sizes, ones, zeros)
+    return int((~np.isnan(preds)).sum())
+
+
+class MLWarmup:
+    """
+    Imports the forecasting stack and loads the models off the request path.
+
+    The API imports pandas, XGBoost and friends only inside the code that
+    needs them; this runs those imports in a background thread after
+    startup, then loads the manifest's models into the shared registry and
+    runs one dummy batch per model family, so the first upload does not pay
+    for file reads, booster initialization or tracing the LSTM graphs of
+    the warmed models' architectures (an architecture only found among
+    medicines past the registry's size is traced on first use). Records
+    how long each step took; `ready` turns true once everything ran.
+    """
+
+    def __init__(self, modules: Optional[List[str]] = None, preload_models: Optional[bool] = None):
+        self.modules = modules
+        self.preload_models = preload_models
+        self.timings: Dict[str, float] = {}
+        self.status = 'pending'  # pending | running | done | failed
+        self.error: Optional[str] = None
+        # Family -> models loaded, and the error of families whose warm-up failed
+        self.models_loaded: Dict[str, int] = {}
+        self.model_errors: Dict[str, str] = {}
+        self.memory: Dict[str, Dict[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def default_modules(self) -> List[str]:
+        modules = ['numpy', 'pandas', 'xgboost', 'app.services.prediction']
+        if not settings.LSTM_NUMPY_RUNTIME:
+            modules.append('keras')
+        return modules
+
+    def record(self, name: str, seconds: float):
+        self.timings[name] = round(seconds, 3)
+
+    @property
+    def ready(self) -> bool:
+        return self.status == 'done'
+
+    def run(self):
+        """Import every module now, in order, then warm the models; already loaded modules cost nothing"""
+        with self._lock:
+            if self.status in ('running', 'done'):
+                return
+            self.status = 'running'
+
+        started = time.perf_counter()
+        self.memory['before'] = memory_footprint()
+        try:
+            for name in self.modules or self.default_modules():
+                start = time.perf_counter()
+                importlib.import_module(name)
+                self.record(name, time.perf_counter() - start)
+            preload = settings.ML_WARMUP_MODELS if self.preload_models is None else self.preload_models
+            if preload:
+                self.warm_models()
+            self.record('warmup_total', time.perf_counter() - started)
+            self.memory['after'] = memory_footprint()
+            self.status = 'done'
+            print(f"🔥 ML stack warmed up in {self.timings['warmup_total']:.2f}s "
+                  f"({sum(self.models_loaded.values())} models loaded)")
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+            print(f"❌ ML warm-up failed: {e}")
+
+    def warm_models(self, model_dir: Optional[str] = None):
+        """
+        Load the manifest's models (as many as the registry holds) and push
+        one batch of zeros through each family, the way an upload would:
+        in this process, or through the forecast worker pool when the
+        catalog is large enough for uploads to use it. A family that fails
+        is reported in `model_errors` and does not stop the others.
+        """
+        import numpy as np
+
+        from app.services.forecast_pool import get_forecast_pool
+        from app.services.prediction import PredictionService
+
+        service = PredictionService(model_dir=model_dir or settings.MODEL_DIR)
+        # Room for each medicine's model and its preprocessing artifact
+        budget = max(1, service.registry.max_size // 2)
+        xgb_medicines = sorted(service.xgb_medicines)[:budget]
+        lstm_medicines = sorted(service.lstm_medicines)[:budget]
+        sarimax_medicines = sorted(service.sarimax_medicines)[:budget]
+
+        pool = None
+        if len(service.xgb_medicines) + len(service.lstm_medicines) > settings.FORECAST_CHUNK_SIZE:
+            pool = get_forecast_pool(service.model_dir, service.xgb_medicines, service.lstm_medicines)
+        predictor = pool or service
+
+        def warm(family, names, batch):
+            if not names:
+                return
+            start = time.perf_counter()
+            try:
+                self.models_loaded[family] = batch(names)
+            except Exception as e:
+                self.model_errors[family] = f"{type(e).__name__}: {e}"
+                print(f"⚠️ {family} warm-up failed: {e}")
+            self.record(f'models_{family}', time.perf_counter() - start)
+
+        def xgb_batch(names):
+            from app.services.feature_engine import KNOWN_FEATURE_COLUMNS
+
+            # Legacy models refit their scaler on the upload, so they are
+            # only loaded; the rest (and global models) predict on zeros
+            legacy = [n for n in names if service.needs_legacy_scaler(n)]
+            if pool is None:
+                for medicine_name in legacy:
+                    service.registry.get('xgboost', medicine_name)
+            names = [n for n in names if n not in legacy]
+            if names:
+                X_rows = np.zeros((len(names), len(KNOWN_FEATURE_COLUMNS)))
+                preds = predictor.predict_xgb(names, X_rows, {}, KNOWN_FEATURE_COLUMNS)
+                legacy += [n for n, p in zip(names, preds) if not np.isnan(p)]
+            return len(legacy)
+
+        def lstm_batch(names):
+            return warm_lstm(predictor, service, names)
+
+        def sarimax_batch(names):
+            from app.services.sarimax_forecast import extend_sarimax
+
+            states = []
+            for medicine_name in names:
+                try:
+                    states.append(service.registry.get('sarimax', medicine_name))
+                except FileNotFoundError:
+                    pass
+            # The filter itself is the same code for every medicine
+            if states:
+                extend_sarimax(states[0], np.empty(0), 1)
+            return len(states)
+
+        warm('xgboost', xgb_medicines, xgb_batch)
+        warm('lstm', lstm_medicines, lstm_batch)
+        warm('sarimax', sarimax_medicines, sarimax_batch)
+
+    def start(self):
+        """Run the warm-up in a daemon thread (once)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name='ml-warmup', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.status == 'done'
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'status': self.status,
+            'ready': self.ready,
+            'warmup_seconds': self.timings.get('warmup_total'),
+            'timings_seconds': dict(self.timings),
+            'error': self.error,
+            'models_loaded': dict(self.models_loaded),
+            'model_errors': dict(self.model_errors),
+            'memory_mb': {**self.memory, 'current': memory_footprint()},
+            'loaded_modules': {name: name in sys.modules for name in HEAVY_MODULES},
+        }
+
+
+ml_warmup = MLWarmup()
@@ -1,3 +1,9 @@
+import sys
+import time
+from contextlib import asynccontextmanager
+
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -7,12 +13,60 @@ from fastapi.staticfiles import StaticFiles
 
 load_dotenv()
 
-from app.database import Base, engine
-from app.routers import auth, medicine, sales, prediction,  alert
+from app.database import Base, engine, add_missing_columns
+from app.models import ForecastJob, Prediction, PredictionHorizon
+from app.routers import auth, medicine, sales, prediction,  alert, jobs, health
+from app.services.jobs import JobRunner, get_job_runner
+from app.services.warmup import ml_warmup
+from app.services.latest_predictions import LatestPredictions
+from app.services.sales_ingest import ensure_unique_sales_weeks
+from app.core.config import settings
+from app.database import SessionLocal
 
 Base.metadata.create_all(bind=engine)
+# Columns added since older versions created these tables: run ids on
+# prediction rows, pending feature store work on jobs
+add_missing_columns(Prediction.__table__, PredictionHorizon.__table__, ForecastJob.__table__)
+# One sales row per medicine and week, which the upload's ON CONFLICT merge relies on;
+# refuses to start while older duplicates remain (see dedupe_sales_weeks.py)
+ensure_unique_sales_weeks(engine)
+
+
+def warm_up_ml_stack():
+    # Imports, model loading and one dummy batch per model family run in
+    # the background; /health/ready reports 503 until they finish
+    if settings.ML_WARMUP_ON_STARTUP:
+        ml_warmup.start()
+
+
+def recover_jobs():
+    # Jobs whose process stopped (this one's previous run, or a dead worker
+    # sharing the table) will never finish
+    db = SessionLocal()
+    try:
+        JobRunner.fail_interrupted_jobs(db)
+        # Databases with predictions from before latest_predictions existed
+        LatestPredictions.backfill_if_empty(db)
+    finally:
+        db.close()
+
 
-app = FastAPI(title="Pharmacy Inventory System")
+def stop_forecast_pool():
+    get_job_runner().shutdown()
+    # Only loaded if a forecast ever ran
+    if 'app.services.forecast_pool' in sys.modules:
+        sys.modules['app.services.forecast_pool'].shutdown_forecast_pool()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up_ml_stack()
+    recover_jobs()
+    yield
+    stop_forecast_pool()
+
+
+app = FastAPI(title="Pharmacy Inventory System", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,11 +82,11 @@ app.include_router(medicine.router)
 app.include_router(sales.router)
 app.include_router(prediction.router)
 app.include_router(alert.router)
+app.include_router(jobs.router)
+app.include_router(health.router)
 
 
-
-
-
+ml_warmup.record('main', time.perf_counter() - _import_started)
 
 
 def custom_openapi():
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+
+from app.services.lstm_numpy import NumpyLSTMModel, NumpyLSTMRunner
+from app.services.model_registry import ModelRegistry
+
+
+def make_model(seed: int) -> NumpyLSTMModel:
+    rng = np.random.default_rng(seed)
+    layers = [
+        {'type': 'LSTM', 'units': 8, 'activation': 'tanh', 'recurrent_activation': 'sigmoid',
+         'return_sequences': False},
+        {'type': 'Dense', 'units': 1, 'activation': 'linear'},
+    ]
+    weights = [
+        {'kernel': rng.normal(size=(1, 32)), 'recurrent_kernel': rng.normal(size=(8, 32)), 'bias': rng.normal(size=32)},
+        {'kernel': rng.normal(size=(8, 1)), 'bias': rng.normal(size=1)},
+    ]
+    return NumpyLSTMModel((4, 1), layers, [{k: v.astype(np.float32) for k, v in w.items()} for w in weights])
+
+
+def test_reloaded_model_is_not_served_stale_stacked_weights(tmp_path):
+    registry = ModelRegistry(model_dir=str(tmp_path), revalidate_seconds=0)
+    runner = NumpyLSTMRunner()
+    path = os.path.join(tmp_path, 'lstm_MED.npz')
+    window = {'MED': np.linspace(0.1, 0.9, 4, dtype=np.float32).reshape(1, 4, 1)}
+
+    make_model(0).save(path)
+    before = runner.predict({'MED': registry.get('lstm', 'MED')}, window)['MED']
+
+    # Retrained weights; the registry drops the old model on reload
+    retrained = make_model(1)
+    retrained.save(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    model = registry.get('lstm', 'MED')
+    after = runner.predict({'MED': model}, window)['MED']
+
+    assert registry.reloads == 1
+    assert not np.allclose(before, after)
+    np.testing.assert_allclose(after, retrained.predict(window['MED'])[:, 0], rtol=1e-5)
@@ -32,6 +32,11 @@ const PredictionsWidget = ({ predictions, onUploadSuccess }) => {
       
       const result = await predictionService.uploadPredictionData(selectedFile);
       
+      // Forecasting runs in the background; wait for it before refreshing
+      if (result.job_id) {
+        await predictionService.waitForJob(result.job_id);
+      }
+      
       setShowUploadModal(false);
       setSelectedFile(null);
       
@@ -87,6 +87,45 @@ const predictionService = {
     }
   },
 
+  // Get status of a background forecasting job
+  getJobStatus: async (jobId) => {
+    try {
+      const timestamp = new Date().getTime();
+      const response = await fetch(
+        `${API_BASE_URL}/api/jobs/${jobId}?_t=${timestamp}`, 
+        {
+          method: 'GET',
+          headers: API_HEADERS,
+          cache: 'no-cache'
+        }
+      );
+      
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || 'Failed to fetch job status');
+      }
+      
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching job status:', error);
+      throw error;
+    }
+  },
+
+  // Poll a forecasting job until it completes or fails
+  waitForJob: async (jobId, { intervalMs = 2000, timeoutMs = 600000 } = {}) => {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      const job = await predictionService.getJobStatus(jobId);
+      if (job.status === 'completed') return job;
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Forecasting job failed');
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+    throw new Error('Timed out waiting for forecasting job');
+  },
+
   // Get predictions for specific medicine
   getMedicinePredictions: async (medicineId) => {
     try {